@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 from decouple import config
+from django.core.exceptions import ImproperlyConfigured
 from celery.schedules import crontab
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,6 +46,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # outermost, so its latency covers every other middleware
+    "loan_app.middleware.PerformanceMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -58,6 +61,20 @@ MIDDLEWARE = [
     
 ]
 
+# Local memory by default; set REDIS_CACHE_URL (e.g. redis://localhost:6379/1) to share the
+# cache (portfolio facts, versioned loan reads) across processes
+REDIS_CACHE_URL = config("REDIS_CACHE_URL", default="")
+if REDIS_CACHE_URL:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": REDIS_CACHE_URL}}
+else:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+# PerformanceMiddleware: log requests over these budgets (0 disables a budget) and
+# requests that run one SQL statement this many times or more (likely N+1)
+PERF_QUERY_BUDGET = config("PERF_QUERY_BUDGET", default=0, cast=int)
+PERF_LATENCY_BUDGET_MS = config("PERF_LATENCY_BUDGET_MS", default=0, cast=int)
+PERF_REPEATED_QUERY_THRESHOLD = config("PERF_REPEATED_QUERY_THRESHOLD", default=5, cast=int)
+
 CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:5173",  # vite dev
     "http://localhost:5173",
@@ -69,6 +86,9 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticatedOrReadOnly",  # reads open, writes need JWT
     ),
+    # lists are cursor-paged on (created_at, id): ?cursor=...&page_size=N (max 500)
+    "DEFAULT_PAGINATION_CLASS": "loan_app.pagination.CreatedAtCursorPagination",
+    "PAGE_SIZE": 50,
 }
 
 ROOT_URLCONF = 'backend.urls'
@@ -94,12 +114,68 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+# Pick a profile with DB_PROFILE:
+#   sqlite        (default) WAL, synchronous=NORMAL, busy timeout, mmap and IMMEDIATE
+#                 write transactions -- concurrent writers queue instead of failing
+#   sqlite-plain  stock Django SQLite settings (what the tuned profile is measured against)
+#   postgres      persistent or pooled (DB_POOL) connections; .iterator() reads such as the
+#                 exports and reconcile commands stream through server-side cursors
+# `python manage.py benchmark_db` compares payment-processing write throughput per profile.
+DB_PROFILE = config("DB_PROFILE", default="sqlite")
+DB_CONN_MAX_AGE = config("DB_CONN_MAX_AGE", default=60, cast=int)  # seconds; 0 closes per request
+DB_POOL = config("DB_POOL", default=False, cast=bool)
+
+DATABASE_PROFILES = {
+    "sqlite": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": config("SQLITE_PATH", default=str(BASE_DIR / "db.sqlite3")),
+        "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+        # take the write lock at BEGIN so the busy timeout applies (a deferred transaction
+        # that upgrades to a writer gets "database is locked" without waiting)
+        "OPTIONS": {"transaction_mode": "IMMEDIATE"},
+    },
+    "sqlite-plain": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": config("SQLITE_PATH", default=str(BASE_DIR / "db.sqlite3")),
+    },
+    "postgres": {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": config("POSTGRES_DB", default="loan_app"),
+        "USER": config("POSTGRES_USER", default="postgres"),
+        "PASSWORD": config("POSTGRES_PASSWORD", default=""),
+        "HOST": config("POSTGRES_HOST", default="localhost"),
+        "PORT": config("POSTGRES_PORT", default="5432"),
+        # psycopg's pool replaces persistent connections (Django refuses both at once)
+        "CONN_MAX_AGE": 0 if DB_POOL else DB_CONN_MAX_AGE,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": (
+            {"pool": {
+                "min_size": config("DB_POOL_MIN_SIZE", default=2, cast=int),
+                "max_size": config("DB_POOL_MAX_SIZE", default=10, cast=int),
+                "timeout": config("DB_POOL_TIMEOUT", default=10, cast=int),
+            }}
+            if DB_POOL else {}
+        ),
+        # server-side cursors break behind a transaction-pooling PgBouncer; set this there
+        "DISABLE_SERVER_SIDE_CURSORS": config("DB_DISABLE_SERVER_SIDE_CURSORS", default=False, cast=bool),
+    },
 }
+if DB_PROFILE not in DATABASE_PROFILES:
+    raise ImproperlyConfigured(f"DB_PROFILE must be one of {', '.join(DATABASE_PROFILES)}, not {DB_PROFILE!r}")
+
+DATABASES = {"default": DATABASE_PROFILES[DB_PROFILE]}
+
+# Applied to every new SQLite connection by loan_app.database.apply_sqlite_pragmas
+SQLITE_PRAGMAS = (
+    {
+        "journal_mode": "WAL",  # readers no longer block the writer (and vice versa)
+        "synchronous": "NORMAL",  # fsync at checkpoints only; safe with WAL
+        "busy_timeout": config("SQLITE_BUSY_TIMEOUT_MS", default=20000, cast=int),
+        "mmap_size": config("SQLITE_MMAP_SIZE", default=256 * 1024 * 1024, cast=int),
+        "temp_store": "MEMORY",
+    }
+    if DB_PROFILE == "sqlite" else {}
+)
 
 
 
@@ -145,34 +221,31 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
-}
-
 # Celery Configuration
-CELERY_BROKER_URL = "redis://localhost:6379/0"
-CELERY_RESULT_BACKEND = "redis://localhost:6379/0"
-CELERY_ACCEPT_CONTENT = ["json"]
-CELERY_TASK_SERIALIZER = "json"
-CELERY_TIMEZONE = "UTC"
-CELERY_BEAT_SCHEDULE = {}
-
-
-
-CELERY_BROKER_URL = "redis://localhost:6379/0"
-CELERY_RESULT_BACKEND = "redis://localhost:6379/0"
+CELERY_BROKER_URL = config("CELERY_BROKER_URL", default="redis://localhost:6379/0")
+CELERY_RESULT_BACKEND = config("CELERY_RESULT_BACKEND", default="redis://localhost:6379/0")
 CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_TIMEZONE = "UTC"
+# Run tasks (and chords) in-process, e.g. for tests or a laptop without Redis
+CELERY_TASK_ALWAYS_EAGER = config("CELERY_TASK_ALWAYS_EAGER", default=False, cast=bool)
 
 # Demo: run every 2 minutes so see it live
 CELERY_BEAT_SCHEDULE = {
     "daily-emi-demo": {
         "task": "loan_app.tasks.process_daily_emi",
         "schedule": crontab(minute="*/2"),
+        "kwargs": {"batch_size": 500},  # batched mode: bulk INSERT/UPDATE per 500 loans
+    },
+    # end-of-day row for the trend API (EMI runs also refresh today's row)
+    "portfolio-snapshot": {
+        "task": "loan_app.tasks.snapshot_portfolio",
+        "schedule": crontab(hour=23, minute=55),
+    },
+    # month-end balance checkpoints for point-in-time lookups (/api/loans/<id>/as_of/)
+    "loan-checkpoints": {
+        "task": "loan_app.tasks.checkpoint_loans",
+        "schedule": crontab(day_of_month="1", hour=0, minute=30),  # checkpoints the last day of the month
     },
 }
 # Monthly run on 1st of each month at midnight UTC
@@ -182,5 +255,13 @@ CELERY_BEAT_SCHEDULE = {
 #         "schedule": crontab(day_of_month="1", hour=0, minute=0),  # 1st of each month 00:00 UTC
 #     },
 # }
+# Same run fanned out across workers (one shard per CPU by default, safe to retry)
+# CELERY_BEAT_SCHEDULE = {
+#     "monthly-emi-sharded": {
+#         "task": "loan_app.tasks.process_daily_emi_sharded",
+#         "schedule": crontab(day_of_month="1", hour=0, minute=0),
+#         "kwargs": {"shards": 8},
+#     },
+# }
 
 
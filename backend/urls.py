@@ -10,6 +10,19 @@ from loan_app.views import (
     PaymentViewSet,
     me,
     ai_query,
+    amortization_preview,
+    amortization_schedules,
+    export_data,
+    metrics_view,
+    portfolio_forecast,
+    portfolio_snapshots,
+    collections_report,
+)
+from loan_app.async_views import (
+    async_me,
+    async_ai_query,
+    async_loan_summary,
+    async_amortization_preview,
 )
 
 router = DefaultRouter()
@@ -24,6 +37,27 @@ urlpatterns = [
     path("api/auth/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("api/me/", me, name="me"),
     path("api/ai/query/", ai_query, name="ai_query"),
+    path("api/metrics/", metrics_view, name="metrics"),
+    # before the router, whose loans/<pk>/ route would otherwise swallow these
+    path("api/loans/amortization/", amortization_schedules, name="amortization_schedules"),
+    path("api/exports/<str:resource>/", export_data, name="export_data"),
+    path("api/portfolio/forecast/", portfolio_forecast, name="portfolio_forecast"),
+    path("api/portfolio/snapshots/", portfolio_snapshots, name="portfolio_snapshots"),
+    path("api/reports/collections/", collections_report, name="collections_report"),
+    path(
+        "api/loans/<int:loan_id>/amortization_preview/",
+        amortization_preview,
+        name="amortization_preview",
+    ),
+    # async twins of the read endpoints (see loan_app.async_views); best served under ASGI
+    path("api/async/me/", async_me, name="async_me"),
+    path("api/async/ai/query/", async_ai_query, name="async_ai_query"),
+    path("api/async/loans/<int:loan_id>/summary/", async_loan_summary, name="async_loan_summary"),
+    path(
+        "api/async/loans/<int:loan_id>/amortization_preview/",
+        async_amortization_preview,
+        name="async_amortization_preview",
+    ),
     path("api/", include(router.urls)),
     
 ]
@@ -39,6 +73,19 @@ from loan_app.views import (
     PaymentViewSet,
     me,
     ai_query,
+    amortization_preview,
+    amortization_schedules,
+    export_data,
+    metrics_view,
+    portfolio_forecast,
+    portfolio_snapshots,
+    collections_report,
+)
+from loan_app.async_views import (
+    async_me,
+    async_ai_query,
+    async_loan_summary,
+    async_amortization_preview,
 )
 
 router = DefaultRouter()
@@ -53,5 +100,26 @@ urlpatterns = [
     path("api/auth/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("api/me/", me, name="me"),
     path("api/ai/query/", ai_query, name="ai_query"),
+    path("api/metrics/", metrics_view, name="metrics"),
+    # before the router, whose loans/<pk>/ route would otherwise swallow these
+    path("api/loans/amortization/", amortization_schedules, name="amortization_schedules"),
+    path("api/exports/<str:resource>/", export_data, name="export_data"),
+    path("api/portfolio/forecast/", portfolio_forecast, name="portfolio_forecast"),
+    path("api/portfolio/snapshots/", portfolio_snapshots, name="portfolio_snapshots"),
+    path("api/reports/collections/", collections_report, name="collections_report"),
+    path(
+        "api/loans/<int:loan_id>/amortization_preview/",
+        amortization_preview,
+        name="amortization_preview",
+    ),
+    # async twins of the read endpoints (see loan_app.async_views); best served under ASGI
+    path("api/async/me/", async_me, name="async_me"),
+    path("api/async/ai/query/", async_ai_query, name="async_ai_query"),
+    path("api/async/loans/<int:loan_id>/summary/", async_loan_summary, name="async_loan_summary"),
+    path(
+        "api/async/loans/<int:loan_id>/amortization_preview/",
+        async_amortization_preview,
+        name="async_amortization_preview",
+    ),
     path("api/", include(router.urls)),
 ]
\ No newline at end of file
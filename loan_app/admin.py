@@ -2,12 +2,17 @@ from django.contrib import admin
 
 # Register your models here.
 from django.contrib import admin
-from .models import Customer, Loan, Payment, EscrowAccount
+from .models import Customer, Loan, Payment, EscrowAccount, EscrowTransaction, LoanCheckpoint, PortfolioSnapshot
 
 admin.site.register(Customer)
 admin.site.register(Loan)
 admin.site.register(Payment)
-admin.site.register(EscrowAccount)
-
+admin.site.register(EscrowTransaction)
+admin.site.register(PortfolioSnapshot)
+admin.site.register(LoanCheckpoint)
 
 
+@admin.register(EscrowAccount)
+class EscrowAccountAdmin(admin.ModelAdmin):
+    # the balance is the sum of the ledger: change it with a deposit/disbursement (loan_app.escrow)
+    readonly_fields = ("balance",)
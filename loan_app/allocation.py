@@ -0,0 +1,87 @@
+# loan_app/allocation.py
+"""
+Splitting a received payment into interest and principal and applying it to its loan.
+
+process_payment() is safe to call concurrently and repeatedly for the same payment:
+
+- the payment is claimed with a conditional UPDATE (processed_at IS NULL), so exactly one
+  caller applies it and every other call is a no-op;
+- the loan row is locked (SELECT ... FOR UPDATE) only to read the balance the interest
+  is charged on, and the balances are then moved by one UPDATE of F() expressions
+  (LoanQuerySet.apply_allocation), never by saving a stale in-memory copy.
+
+SQLite has no row locks; writers serialize on the database lock instead, and a writer
+that gives up waiting ("database is locked") is retried a few times.
+"""
+import time
+from decimal import Decimal
+
+from django.db import OperationalError, connection, transaction
+from django.utils import timezone
+
+from . import amortization, checkpoints
+from .models import Loan, Payment
+
+LOCK_RETRIES = 5
+LOCK_RETRY_DELAY = 0.05  # seconds, grows linearly per attempt
+
+BALANCE_FIELDS = ["outstanding_principal", "total_interest_paid", "status", "paid_off_date"]
+
+
+def processed_note(principal_component: Decimal, interest_component: Decimal) -> str:
+    return f"Processed | Principal: {principal_component:.2f}, Interest: {interest_component:.2f}"
+
+
+def _apply(payment_id: int):
+    with transaction.atomic():
+        claimed = Payment.objects.filter(pk=payment_id, processed_at__isnull=True).update(
+            processed_at=timezone.now()
+        )
+        if not claimed:
+            return None
+
+        payment = Payment.objects.only("id", "loan_id", "amount", "payment_date").get(pk=payment_id)
+        loan = (
+            Loan.objects.select_for_update()
+            .only("id", "outstanding_principal", "annual_interest_rate")
+            .get(pk=payment.loan_id)
+        )
+
+        interest_component = amortization.interest_for(loan.outstanding_principal, loan.annual_interest_rate)
+        # an overpayment clears the balance; only what was owed is recorded as principal
+        principal_component = min(
+            max(Decimal(payment.amount) - interest_component, Decimal("0.00")), loan.outstanding_principal
+        )
+
+        Loan.objects.filter(pk=loan.pk).apply_allocation(principal_component, interest_component)
+        Payment.objects.filter(pk=payment_id).update(
+            principal_component=principal_component,
+            interest_component=interest_component,
+            note=processed_note(principal_component, interest_component),
+        )
+        # a backdated payment also moves the loan's checkpoints from its date on
+        checkpoints.adjust(loan.pk, payment.payment_date, principal_component, interest_component)
+
+        loan.refresh_from_db(fields=BALANCE_FIELDS)
+    return {
+        "principal_applied": principal_component,
+        "interest_applied": interest_component,
+        "loan": loan,
+    }
+
+
+def process_payment(payment_id: int):
+    """
+    Apply payment `payment_id` to its loan once.
+
+    Returns {"principal_applied", "interest_applied", "loan"} (loan refreshed with its new
+    balances), or None when the payment had already been processed.
+    """
+    for attempt in range(1, LOCK_RETRIES + 1):
+        try:
+            return _apply(payment_id)
+        except OperationalError as exc:
+            # inside a caller's transaction the whole transaction has to be retried, not us
+            if "locked" not in str(exc) or connection.in_atomic_block or attempt == LOCK_RETRIES:
+                raise
+            time.sleep(LOCK_RETRY_DELAY * attempt)
@@ -0,0 +1,102 @@
+# loan_app/amortization.py
+"""
+Single home for the loan money math (EMI, monthly interest, payment splits).
+
+The expensive part of the annuity formula is (1 + r) ** n in Decimal. It only depends
+on (annual_rate, term_months), and a book has a handful of distinct rate/term products,
+so the factor r(1+r)^n / ((1+r)^n - 1) is memoized in a bounded LRU cache and every EMI
+becomes a single multiply + quantize.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+
+CENT = Decimal("0.01")
+ZERO = Decimal("0.00")
+
+# Distinct (rate, term) pairs kept in memory; each entry is one Decimal.
+ANNUITY_CACHE_SIZE = 4096
+
+
+def to_cents(value) -> Decimal:
+    """Round half-up to cents, the rounding every schedule in this app uses."""
+    return Decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def _normalize(annual_rate, term_months):
+    return Decimal(str(annual_rate or 0)), max(1, int(term_months or 0))
+
+
+def monthly_rate(annual_rate) -> Decimal:
+    """Annual % -> monthly decimal rate, e.g. 6.50 -> 0.065/12"""
+    return (Decimal(str(annual_rate or 0)) / Decimal("100")) / Decimal("12")
+
+
+@lru_cache(maxsize=ANNUITY_CACHE_SIZE)
+def _annuity_factor(annual_rate: Decimal, term_months: int) -> Decimal:
+    r = monthly_rate(annual_rate)
+    growth = (1 + r) ** term_months
+    return (r * growth) / (growth - 1)
+
+
+def annuity_factor(annual_rate, term_months) -> Decimal:
+    """
+    EMI per unit of principal: r(1+r)^n / ((1+r)^n - 1), memoized per (annual_rate, term_months).
+    Only meaningful for r > 0; zero-rate loans amortize linearly (see emi()).
+    """
+    return _annuity_factor(*_normalize(annual_rate, term_months))
+
+
+def emi(principal, annual_rate, term_months) -> Decimal:
+    """
+    Classic amortization formula (P * r * (1+r)^n) / ((1+r)^n - 1), rounded to cents.
+    If r == 0 → principal/term.
+    """
+    principal = Decimal(principal or 0)
+    annual_rate, term_months = _normalize(annual_rate, term_months)
+    if annual_rate == 0:
+        return to_cents(principal / Decimal(term_months))
+    return to_cents(principal * _annuity_factor(annual_rate, term_months))
+
+
+def interest_for(balance, annual_rate) -> Decimal:
+    """One month of interest on `balance`, rounded to cents."""
+    return to_cents(Decimal(balance or 0) * monthly_rate(annual_rate))
+
+
+def split_payment(balance, annual_rate, term_months):
+    """
+    Next period for a loan re-amortized on its current balance.
+    Returns (emi, principal_component, interest_component); principal never goes negative.
+    """
+    payment = emi(balance, annual_rate, term_months)
+    interest = interest_for(balance, annual_rate)
+    principal = to_cents(payment - interest)
+    if principal < 0:
+        principal = ZERO
+    return payment, principal, interest
+
+
+# ----------------------------
+# Batch helpers
+# ----------------------------
+def emi_many(rows):
+    """EMI for many loans at once; `rows` yields (principal, annual_rate, term_months)."""
+    return [emi(principal, rate, term) for principal, rate, term in rows]
+
+
+def split_many(rows):
+    """split_payment() for many loans; `rows` yields (balance, annual_rate, term_months)."""
+    return [split_payment(balance, rate, term) for balance, rate, term in rows]
+
+
+def scheduled_payments(loans):
+    """{loan.id: scheduled EMI on original principal} for an iterable of Loan instances."""
+    return {
+        loan.id: emi(loan.principal_amount, loan.annual_interest_rate, loan.term_months)
+        for loan in loans
+    }
+
+
+def cache_info():
+    """Hit/miss statistics of the annuity-factor cache."""
+    return _annuity_factor.cache_info()
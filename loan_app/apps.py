@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 class LoanAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
@@ -6,4 +7,6 @@ class LoanAppConfig(AppConfig):
 
     def ready(self):
         from . import signals  # Ensure signals are loaded
+        from .database import apply_sqlite_pragmas
 
+        connection_created.connect(apply_sqlite_pragmas, dispatch_uid="loan_app.sqlite_pragmas")
@@ -0,0 +1,125 @@
+# loan_app/async_views.py
+"""
+Async twins of the read endpoints (me, ai_query, loan summary, amortization preview),
+routed under /api/async/ and built on Django's async ORM, so under ASGI a slow
+aggregate waits on the event loop instead of holding a worker thread.
+
+DRF's APIView is sync-only, so these are plain Django async views: authentication goes
+through the API's DEFAULT_AUTHENTICATION_CLASSES (JWT) and responses are rendered with
+DRF's JSONRenderer, so the bodies match the sync endpoints'. Lookups that do not
+depend on each other -- the user and the loan's version, the facts an ai_query
+question needs -- are awaited together with asyncio.gather.
+
+Under WSGI these still work (Django runs them through async_to_sync), just without the
+benefit; `manage.py benchmark_asgi` compares the two deployments.
+"""
+import asyncio
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from . import intents, loan_cache
+from .loan_cache import json_response
+from .models import Loan
+from .summaries import build_loan_summary, summary_queryset
+from .intents import AI_EMPTY_ANSWER
+from .views import amortization_preview_data
+
+
+def _api_errors(view):
+    """Render Http404 / DRF API exceptions the way DRF's exception handler does."""
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            return await view(request, *args, **kwargs)
+        except Http404 as exc:
+            return json_response({"detail": str(exc) or "Not found."}, status=404)
+        except exceptions.APIException as exc:
+            detail = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+            response = json_response(detail, status=exc.status_code)
+            if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                response["WWW-Authenticate"] = 'Bearer realm="api"'
+            return response
+
+    return wrapper
+
+
+async def authenticated_user(request):
+    """The request's user via the API authentication classes; raises NotAuthenticated if anonymous."""
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    # JWTAuthentication loads the user with the sync ORM
+    user = await sync_to_async(lambda: drf_request.user)()
+    if not user or not user.is_authenticated:
+        raise exceptions.NotAuthenticated()
+    return user
+
+
+async def _loan_or_404(queryset, loan_id):
+    try:
+        return await queryset.aget(pk=loan_id)
+    except Loan.DoesNotExist:
+        raise Http404("No Loan matches the given query.")
+
+
+@require_GET
+@_api_errors
+async def async_me(request):
+    u = await authenticated_user(request)
+    return json_response({
+        "id": u.id,
+        "username": u.username,
+        "email": u.email or "",
+        "is_staff": u.is_staff,
+        "is_superuser": u.is_superuser,
+        "first_name": u.first_name or "",
+        "last_name": u.last_name or "",
+    })
+
+
+@csrf_exempt  # token-authenticated, like the DRF views
+@require_POST
+@_api_errors
+async def async_ai_query(request):
+    """POST /api/async/ai/query/ -- same questions and answers as ai_query."""
+    await authenticated_user(request)
+    try:
+        body = json.loads(request.body or b"{}")
+    except ValueError:
+        raise exceptions.ParseError()
+    text = (str(body.get("question") or "") if isinstance(body, dict) else "").strip().lower()
+    if not text:
+        return json_response({"answer": AI_EMPTY_ANSWER})
+
+    return json_response(await intents.aanswer(text))
+
+
+@require_GET
+@_api_errors
+async def async_loan_summary(request, loan_id: int):
+    """GET /api/async/loans/<loan_id>/summary/ -- versioned-cache twin of loan_summary."""
+    _, current = await asyncio.gather(authenticated_user(request), loan_cache.acurrent_version(loan_id))
+
+    async def build():
+        return build_loan_summary(await _loan_or_404(summary_queryset(), loan_id))
+
+    return await loan_cache.aversioned_response(request, loan_id, "summary", build, current)
+
+
+@require_GET
+@_api_errors
+async def async_amortization_preview(request, loan_id: int):
+    """GET /api/async/loans/<loan_id>/amortization_preview/?n=6 (or ?schedule=full)."""
+    _, current = await asyncio.gather(authenticated_user(request), loan_cache.acurrent_version(loan_id))
+
+    async def build():
+        return amortization_preview_data(await _loan_or_404(Loan.objects.all(), loan_id), request.GET)
+
+    return await loan_cache.aversioned_response(request, loan_id, "preview", build, current)
@@ -0,0 +1,402 @@
+# loan_app/benchmarks.py
+"""
+Microbenchmarks for the money math and the hot endpoints (run by `manage.py benchmark`).
+
+Every case reports wall time (median and min over `repeat` runs, in ms) together with the
+number of SQL queries one run issues, so a report can be diffed against another commit's:
+a query count that grows with the data size is an N+1, a slower median is a regression.
+
+run_suite() works on whatever database is connected; the command runs it inside a
+throwaway test database, and every case's data is rolled back afterwards.
+
+bench_payment_writes() (run by `manage.py benchmark_db`, once per DB_PROFILE) times
+concurrent writer threads processing payments, and bench_concurrent_reads() (run by
+`manage.py benchmark_asgi`) the read endpoints under concurrent load, served the WSGI way
+(a thread per request) and the ASGI way (async views on one event loop). Their data is
+committed -- requests and threads have their own connections -- so they run in
+throwaway_database().
+"""
+import asyncio
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+from decimal import Decimal
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from . import allocation, amortization, forecast
+from .models import Customer, Loan, Payment
+from .serializers import LoanSerializer
+from .tasks import _emi, process_daily_emi
+from .views import calculate_emi
+
+DEFAULT_EMI_SIZES = (1_000, 10_000, 100_000)
+PREVIEW_PERIODS = (6, 60, 360)
+# the row-by-row EMI loop is only timed up to this many loans (it is O(n) queries)
+LEGACY_EMI_MAX_LOANS = 10_000
+SERIALIZER_ROWS = 500
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def measure(name, func, repeat=5, number=1, setup=None, **params):
+    """
+    Time `func` `repeat` times (each run calls it `number` times; `setup` runs untimed
+    before each run) and count the queries of the last run.
+    """
+    timings = []
+    counter = _QueryCounter()
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        counter.count = 0
+        with connection.execute_wrapper(counter):
+            started = time.perf_counter()
+            for _ in range(number):
+                func()
+            timings.append((time.perf_counter() - started) * 1000 / number)
+    return {
+        "name": name,
+        "params": params,
+        "median_ms": round(statistics.median(timings), 4),
+        "min_ms": round(min(timings), 4),
+        "runs": repeat,
+        "queries": counter.count // number,
+    }
+
+
+@contextmanager
+def _rolled_back():
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def _loan(customer, principal="250000.00", rate="6.50", term=360):
+    return Loan(
+        customer=customer,
+        principal_amount=Decimal(principal),
+        annual_interest_rate=Decimal(rate),
+        term_months=term,
+        start_date=date(2024, 1, 1),
+        # bulk_create skips the first-save initialisation in Loan.save()
+        outstanding_principal=Decimal(principal),
+    )
+
+
+def _seed_loans(count, customer):
+    return Loan.objects.bulk_create(
+        [_loan(customer, f"{10_000 + (i % 500) * 100}.00", f"{4 + (i % 8) * 0.75:.2f}", 12 * (1 + i % 30))
+         for i in range(count)],
+        batch_size=1000,
+    )
+
+
+def bench_emi(repeat):
+    loan = _loan(None)
+    args = (Decimal("250000.00"), Decimal("6.50"), 360)
+    return [
+        measure("views.calculate_emi", lambda: calculate_emi(*args), repeat, number=1000),
+        measure("tasks._emi", lambda: _emi(*args), repeat, number=1000),
+        measure("Loan.refresh_scheduled_payment", loan.refresh_scheduled_payment, repeat, number=1000),
+        measure(
+            "amortization.emi (cold cache)", lambda: calculate_emi(*args), repeat, number=1,
+            setup=amortization._annuity_factor.cache_clear,
+        ),
+    ]
+
+
+def bench_endpoints(client, customer, repeat):
+    results = []
+    with _rolled_back():
+        loan = Loan.objects.create(
+            customer=customer, principal_amount=Decimal("250000.00"),
+            annual_interest_rate=Decimal("6.50"), term_months=360,
+        )
+        # cold versioned cache on every run, so the schedule/summary is computed, not served
+        for n in PREVIEW_PERIODS:
+            url = f"/api/loans/{loan.pk}/amortization_preview/?n={n}"
+            results.append(measure(
+                "amortization_preview", lambda url=url: client.get(url), repeat, setup=cache.clear, n=n,
+            ))
+        results.append(measure(
+            "amortization_preview", lambda: client.get(f"/api/loans/{loan.pk}/amortization_preview/?schedule=full"),
+            repeat, setup=cache.clear, schedule="full",
+        ))
+
+        _seed_loans(SERIALIZER_ROWS, customer)
+        results.append(measure(
+            "loan_summary", lambda: client.get(f"/api/loans/{loan.pk}/summary/"), repeat, setup=cache.clear,
+        ))
+        results.append(measure(
+            "loan_summaries", lambda: client.get(f"/api/loans/summaries/?limit={SERIALIZER_ROWS}"),
+            repeat, loans=SERIALIZER_ROWS,
+        ))
+        queryset = Loan.objects.order_by("id")[:SERIALIZER_ROWS]
+        results.append(measure(
+            "LoanSerializer(many=True)", lambda: LoanSerializer(list(queryset), many=True).data,
+            repeat, loans=SERIALIZER_ROWS,
+        ))
+        results.append(measure(
+            "loan_list", lambda: client.get(f"/api/loans/?page_size={SERIALIZER_ROWS}"), repeat, loans=SERIALIZER_ROWS,
+        ))
+    return results
+
+
+def bench_process_daily_emi(customer, sizes, repeat, batch_size=500):
+    results = []
+    for size in sizes:
+        # one seeded table per size; each run charges the same fresh balances
+        with _rolled_back():
+            _seed_loans(size, customer)
+            modes = [("batched", lambda: process_daily_emi(batch_size=batch_size))]
+            if size <= LEGACY_EMI_MAX_LOANS:
+                modes.append(("row_by_row", lambda: process_daily_emi()))
+            for mode, run in modes:
+                def run_and_undo(run=run):
+                    with _rolled_back():
+                        run()
+                results.append(measure("process_daily_emi", run_and_undo, repeat, loans=size, mode=mode))
+    return results
+
+
+def bench_forecast(customer, sizes, repeat, months=forecast.MAX_MONTHS):
+    results = []
+    for size in sizes:
+        with _rolled_back():
+            _seed_loans(size, customer)
+            for group_by in ("portfolio", "origination_month"):
+                results.append(measure(
+                    "portfolio_forecast", lambda: forecast.forecast(months, group_by, as_of=date(2026, 1, 1)),
+                    repeat, loans=size, months=months, group_by=group_by,
+                ))
+    return results
+
+
+@contextmanager
+def throwaway_database():
+    """A migrated test database that other threads can use too (a file for SQLite, not :memory:)."""
+    tmpdir = None
+    if connection.vendor == "sqlite":
+        # journal mode, fsyncs and file locking are part of what is measured
+        tmpdir = tempfile.mkdtemp(prefix="loan_app_bench_")
+        connection.settings_dict["TEST"]["NAME"] = os.path.join(tmpdir, "bench.sqlite3")
+    setup_test_environment()
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def bench_payment_writes(payments=2_000, writers=8, loans=200):
+    """
+    Process `payments` fresh payments (spread round-robin over `loans` loans) with
+    `writers` threads calling allocation.process_payment, and report the throughput.
+    A payment whose processing raises (e.g. "database is locked" after the retries) is
+    counted as failed, not retried.
+    """
+    customer = Customer.objects.create(full_name="Write benchmark", email="writes@example.com")
+    seeded = _seed_loans(loans, customer)
+    created = Payment.objects.bulk_create(
+        [Payment(loan=seeded[i % loans], amount=Decimal("250.00"), payment_date=date(2024, 2, 1))
+         for i in range(payments)],
+        batch_size=1000,
+    )
+    ids = [p.pk for p in created]
+
+    failed = []
+    lock = threading.Lock()
+
+    def writer(chunk):
+        try:
+            for payment_id in chunk:
+                try:
+                    allocation.process_payment(payment_id)
+                except Exception as exc:  # noqa: BLE001 -- counted and reported, not fatal
+                    with lock:
+                        failed.append(type(exc).__name__ + ": " + str(exc))
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=writer, args=(ids[i::writers],)) for i in range(writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    processed = Payment.objects.filter(pk__in=ids, processed_at__isnull=False).count()
+    return {
+        "name": "payment_writes",
+        "params": {"payments": payments, "writers": writers, "loans": loans},
+        "seconds": round(elapsed, 3),
+        "processed": processed,
+        "failed": len(failed),
+        "payments_per_s": round(processed / elapsed, 1) if elapsed else None,
+        "sample_errors": sorted(set(failed))[:3],
+    }
+
+
+def _wsgi_run(urls, headers, concurrency):
+    """GET every url from `concurrency` threads (a threaded WSGI server); returns the status codes."""
+    from django.test import Client
+
+    codes = []
+    lock = threading.Lock()
+
+    def worker(chunk):
+        client = Client(headers=headers)
+        try:
+            seen = [client.get(url).status_code for url in chunk]
+        finally:
+            connections.close_all()
+        with lock:
+            codes.extend(seen)
+
+    threads = [threading.Thread(target=worker, args=(urls[i::concurrency],)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return codes
+
+
+async def _asgi_run(urls, headers, concurrency):
+    """GET every url from one event loop with at most `concurrency` requests in flight."""
+    from asgiref.sync import ThreadSensitiveContext
+    from django.test import AsyncClient
+
+    client = AsyncClient()
+    slots = asyncio.Semaphore(concurrency)
+
+    async def fetch(url):
+        async with slots:
+            # like django.core.handlers.asgi: sync work of one request stays on one thread
+            async with ThreadSensitiveContext():
+                return (await client.get(url, headers=headers)).status_code
+
+    return await asyncio.gather(*(fetch(url) for url in urls))
+
+
+def bench_concurrent_reads(requests=400, concurrency=32, loans=100):
+    """
+    Throughput of the summary / amortization preview / me endpoints with `concurrency`
+    requests in flight: the sync DRF views on threads (WSGI) against their async twins on
+    one event loop (ASGI). The versioned cache is cleared before each run; requests cycle
+    over `loans` loans, so both modes see the same mix of misses and hits.
+    """
+    from django.contrib.auth import get_user_model
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    customer = Customer.objects.create(full_name="Read benchmark", email="reads@example.com")
+    ids = [loan.pk for loan in _seed_loans(loans, customer)]
+    user = get_user_model().objects.create_user("read-bench")
+    headers = {"Authorization": f"Bearer {AccessToken.for_user(user)}"}
+    # the sync views hold connections open (CONN_MAX_AGE); start each run from none
+    connections.close_all()
+
+    endpoints = {
+        "summary": ("/api/loans/{}/summary/", "/api/async/loans/{}/summary/"),
+        "amortization_preview": (
+            "/api/loans/{}/amortization_preview/?n=12", "/api/async/loans/{}/amortization_preview/?n=12",
+        ),
+        "me": ("/api/me/", "/api/async/me/"),
+    }
+    results = []
+    for endpoint, (sync_url, async_url) in endpoints.items():
+        for mode, url in (("wsgi", sync_url), ("asgi", async_url)):
+            urls = [url.format(ids[i % loans]) for i in range(requests)]
+            cache.clear()
+            started = time.perf_counter()
+            if mode == "wsgi":
+                codes = _wsgi_run(urls, headers, concurrency)
+            else:
+                codes = asyncio.run(_asgi_run(urls, headers, concurrency))
+            elapsed = time.perf_counter() - started
+            connections.close_all()
+            results.append({
+                "name": "concurrent_reads",
+                "params": {"endpoint": endpoint, "mode": mode, "requests": requests, "concurrency": concurrency},
+                "seconds": round(elapsed, 3),
+                "requests_per_s": round(requests / elapsed, 1) if elapsed else None,
+                "errors": sum(code != 200 for code in codes),
+            })
+    return results
+
+
+def run_suite(
+    sizes=DEFAULT_EMI_SIZES, repeat=5, include=("emi", "endpoints", "process_daily_emi", "forecast"), emi_repeat=None
+):
+    """
+    Run the selected benchmark groups and return the JSON-serializable report.
+    `emi_repeat` (default: `repeat`) sets the runs per process_daily_emi and forecast size,
+    which dominate the suite's run time at 100k loans.
+    """
+    from rest_framework.test import APIClient
+
+    results = []
+    with _rolled_back():
+        customer = Customer.objects.create(full_name="Benchmark", email="bench@example.com")
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user("bench", is_staff=True))
+        if "emi" in include:
+            results += bench_emi(repeat)
+        if "endpoints" in include:
+            results += bench_endpoints(client, customer, repeat)
+        if "process_daily_emi" in include:
+            results += bench_process_daily_emi(customer, sizes, emi_repeat or repeat)
+        if "forecast" in include:
+            results += bench_forecast(customer, sizes, emi_repeat or repeat)
+
+    return {
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def result_key(result):
+    return result["name"] + "".join(f" {k}={v}" for k, v in sorted(result["params"].items()))
+
+
+def compare(report, baseline, max_slowdown=0.25):
+    """
+    Regressions of `report` against `baseline`: cases whose query count grew or whose
+    median is more than `max_slowdown` (a fraction) slower. Returns a list of strings.
+    """
+    before = {result_key(r): r for r in baseline.get("results", [])}
+    problems = []
+    for result in report["results"]:
+        old = before.get(result_key(result))
+        if old is None:
+            continue
+        if result["queries"] > old["queries"]:
+            problems.append(f"{result_key(result)}: queries {old['queries']} -> {result['queries']}")
+        if old["median_ms"] and result["median_ms"] > old["median_ms"] * (1 + max_slowdown):
+            problems.append(f"{result_key(result)}: median {old['median_ms']}ms -> {result['median_ms']}ms")
+    return problems
@@ -0,0 +1,182 @@
+# loan_app/checkpoints.py
+"""
+Point-in-time loan state -- outstanding principal, interest paid and status at the end
+of any past day -- from monthly LoanCheckpoint rows.
+
+- write() checkpoints loans at one or more complete days by walking back from the live
+  book: the state at the end of day d is the current state plus the principal/interest
+  components of the payments dated after d, capped at the principal lent. Loans are
+  processed in id chunks, each one SELECT of loans, one grouped SELECT of their payments
+  and one bulk upsert.
+- as_of() answers from the nearest checkpoint on or before the date plus the payments
+  dated after it (a month at most, over payment_loan_date_idx), all as correlated
+  subqueries of one Loan query -- so the cost does not grow with the loan's history,
+  and a batch of loans is still one statement. Without a checkpoint the replay starts
+  from origination.
+- adjust() keeps existing checkpoints right when a backdated payment is processed.
+
+Only processed payments (with components) move balances. Loans have no default date,
+so a loan that is DEFAULTED now reads as defaulted whenever it still had a balance.
+"""
+from bisect import bisect_left
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DateField, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+
+from . import amortization
+from .models import Loan, LoanCheckpoint, Payment
+
+ZERO = Decimal("0.00")
+# before any loan's start: "no checkpoint, replay from origination"
+ORIGIN = date(1, 1, 1)
+CHUNK_SIZE = 2000
+
+
+def month_ends(start: date, end: date):
+    """Last days of the months from start's month to end, not after end."""
+    days = []
+    month = start.replace(day=1)
+    while True:
+        following = (month + timedelta(days=32)).replace(day=1)
+        last = following - timedelta(days=1)
+        if last > end:
+            return days
+        days.append(last)
+        month = following
+
+
+def status_for(balance, current_status):
+    if balance <= 0:
+        return Loan.STATUS_PAID_OFF
+    return Loan.STATUS_DEFAULTED if current_status == Loan.STATUS_DEFAULTED else Loan.STATUS_ACTIVE
+
+
+def write(days, queryset=None) -> int:
+    """
+    Upsert checkpoints for every loan (of `queryset`) started by each of `days`, which
+    must all be before today. Returns rows written.
+    """
+    days = sorted(set(days))
+    if not days:
+        return 0
+    if days[-1] >= date.today():
+        raise ValueError("checkpoints are written for complete days only (before today)")
+    queryset = Loan.objects.all() if queryset is None else queryset
+    loans = queryset.filter(start_date__lte=days[-1]).order_by("id").values_list(
+        "id", "start_date", "status", "principal_amount", "outstanding_principal", "total_interest_paid"
+    )
+    written = 0
+    last_id = 0
+    while True:
+        chunk = list(loans.filter(id__gt=last_id)[:CHUNK_SIZE])
+        if not chunk:
+            return written
+        last_id = chunk[-1][0]
+
+        # flows[loan][i]: principal/interest of payments dated in (days[i-1], days[i]];
+        # index len(days) holds the ones after the last day
+        flows = {}
+        payments = (
+            Payment.objects.filter(
+                loan_id__gte=chunk[0][0], loan_id__lte=last_id,
+                payment_date__gt=days[0], principal_component__isnull=False,
+            )
+            .order_by()
+            .values_list("loan_id", "payment_date")
+            .annotate(principal=Sum("principal_component"), interest=Sum("interest_component"))
+        )
+        for loan_id, payment_date, principal, interest in payments:
+            buckets = flows.setdefault(loan_id, [[ZERO, ZERO] for _ in range(len(days) + 1)])
+            flow = buckets[bisect_left(days, payment_date)]
+            flow[0] += amortization.to_cents(principal)
+            flow[1] += amortization.to_cents(interest)
+
+        rows = []
+        for loan_id, start_date, status, principal_amount, balance, interest_paid in chunk:
+            loan_flows = flows.get(loan_id)
+            for i in range(len(days) - 1, -1, -1):
+                if loan_flows is not None:
+                    # never more than was lent, even for payments recorded with an uncapped split
+                    balance = min(balance + loan_flows[i + 1][0], principal_amount)
+                    interest_paid -= loan_flows[i + 1][1]
+                if start_date and start_date > days[i]:
+                    break
+                rows.append(LoanCheckpoint(
+                    loan_id=loan_id, date=days[i], outstanding_principal=balance,
+                    total_interest_paid=interest_paid, status=status_for(balance, status),
+                ))
+        with transaction.atomic():
+            LoanCheckpoint.objects.bulk_create(
+                rows, batch_size=500, update_conflicts=True, unique_fields=["loan", "date"],
+                update_fields=["outstanding_principal", "total_interest_paid", "status", "computed_at"],
+            )
+        written += len(rows)
+
+
+def adjust(loan_id: int, payment_date: date, principal: Decimal, interest: Decimal) -> int:
+    """Apply a payment processed after the fact to the loan's checkpoints dated on or after it."""
+    return LoanCheckpoint.objects.filter(loan_id=loan_id, date__gte=payment_date).update(
+        outstanding_principal=Greatest(F("outstanding_principal") - principal, Value(ZERO)),
+        total_interest_paid=F("total_interest_paid") + interest,
+        status=Case(When(outstanding_principal__lte=principal, then=Value(Loan.STATUS_PAID_OFF)), default=F("status")),
+    )
+
+
+def _checkpoint(day, field):
+    latest = LoanCheckpoint.objects.filter(loan=OuterRef("pk"), date__lte=day).order_by("-date")
+    return Subquery(latest.values(field)[:1])
+
+
+def _replayed(day, aggregate):
+    payments = (
+        Payment.objects.filter(
+            loan=OuterRef("pk"), payment_date__lte=day, principal_component__isnull=False,
+            payment_date__gt=Coalesce(OuterRef("checkpoint_date"), Value(ORIGIN, output_field=DateField())),
+        )
+        .order_by()
+        .values("loan")
+        .annotate(value=aggregate)
+        .values("value")
+    )
+    return Subquery(payments)
+
+
+def as_of(queryset, day: date) -> dict:
+    """{loan_id: state at the end of `day`} for the loans of `queryset` (one query)."""
+    loans = (
+        queryset.order_by("id")
+        .annotate(
+            checkpoint_date=_checkpoint(day, "date"),
+            checkpoint_balance=_checkpoint(day, "outstanding_principal"),
+            checkpoint_interest=_checkpoint(day, "total_interest_paid"),
+            replayed=_replayed(day, Count("id")),
+            replayed_principal=_replayed(day, Sum("principal_component")),
+            replayed_interest=_replayed(day, Sum("interest_component")),
+        )
+        .values_list(
+            "id", "start_date", "status", "principal_amount", "checkpoint_date", "checkpoint_balance",
+            "checkpoint_interest", "replayed", "replayed_principal", "replayed_interest",
+        )
+    )
+    states = {}
+    for (loan_id, start_date, status, principal_amount, checkpoint_date, checkpoint_balance,
+         checkpoint_interest, replayed, replayed_principal, replayed_interest) in loans:
+        if start_date and start_date > day:
+            states[loan_id] = None
+            continue
+        if checkpoint_date is None:
+            checkpoint_balance, checkpoint_interest = principal_amount, ZERO
+        balance = max(amortization.to_cents(checkpoint_balance) - amortization.to_cents(replayed_principal or 0), ZERO)
+        states[loan_id] = {
+            "loan_id": loan_id,
+            "date": day.isoformat(),
+            "outstanding_principal": balance,
+            "total_interest_paid": amortization.to_cents(checkpoint_interest) + amortization.to_cents(replayed_interest or 0),
+            "status": status_for(balance, status),
+            "checkpoint_date": checkpoint_date.isoformat() if checkpoint_date else None,
+            "payments_replayed": replayed or 0,
+        }
+    return states
@@ -0,0 +1,28 @@
+# loan_app/database.py
+"""
+Per-connection database tuning (see DB_PROFILE in backend/settings.py).
+
+apply_sqlite_pragmas runs on connection_created and applies settings.SQLITE_PRAGMAS to
+every new SQLite connection -- PRAGMAs are per connection, and with CONN_MAX_AGE a
+connection (and its PRAGMAs) is reused across requests.
+"""
+from django.conf import settings
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    pragmas = getattr(settings, "SQLITE_PRAGMAS", {})
+    # on the raw sqlite3 connection: no Django cursor wrappers, no query counting
+    for name, value in pragmas.items():
+        connection.connection.execute(f"PRAGMA {name} = {value}")
+
+
+def sqlite_pragmas(connection, names=("journal_mode", "synchronous", "busy_timeout", "mmap_size")) -> dict:
+    """Current values of PRAGMAs `names` on `connection` (to check a profile took effect)."""
+    connection.ensure_connection()
+    values = {}
+    for name in names:
+        row = connection.connection.execute(f"PRAGMA {name}").fetchone()
+        values[name] = row[0] if row else None  # e.g. mmap_size on an in-memory database
+    return values
@@ -0,0 +1,96 @@
+# loan_app/escrow.py
+"""
+Escrow postings. Every balance change is one UPDATE of F("balance") plus an
+EscrowTransaction ledger insert in the same transaction, so concurrent postings never
+lose updates and an account's balance always equals the sum of its ledger entries
+(see the reconcile_escrow command).
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import EscrowAccount, EscrowTransaction, Loan
+
+POSTING_KINDS = (EscrowTransaction.KIND_DEPOSIT, EscrowTransaction.KIND_DISBURSEMENT)
+
+
+class EscrowPostingError(Exception):
+    """A posting (or batch) was rejected; nothing was written. `errors` is [{"index", "detail"}]."""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def signed_amount(kind: str, amount) -> Decimal:
+    amount = Decimal(amount).quantize(Decimal("0.01"))
+    return -amount if kind == EscrowTransaction.KIND_DISBURSEMENT else amount
+
+
+def post(escrow_id: int, kind: str, amount, note: str = "") -> EscrowTransaction:
+    """Post one deposit/disbursement: one conditional UPDATE, a loan version bump and one INSERT."""
+    delta = signed_amount(kind, amount)
+    with transaction.atomic():
+        accounts = EscrowAccount.objects.filter(pk=escrow_id)
+        if delta < 0:
+            # disbursements never overdraw; the check and the write are one statement
+            accounts = accounts.filter(balance__gte=-delta)
+        if not accounts.update(balance=F("balance") + delta):
+            detail = (
+                "Insufficient escrow balance."
+                if EscrowAccount.objects.filter(pk=escrow_id).exists()
+                else f"Escrow account {escrow_id} does not exist."
+            )
+            raise EscrowPostingError([{"index": 0, "detail": detail}])
+        # the escrow balance is part of the loan's summary
+        Loan.objects.filter(escrow__pk=escrow_id).bump_version()
+        return EscrowTransaction.objects.create(escrow_id=escrow_id, kind=kind, amount=delta, note=note)
+
+
+def post_batch(postings):
+    """
+    Post many deposits/disbursements ({"escrow", "kind", "amount", "note"}) across any
+    number of accounts in one transaction: one locking SELECT, one bulk UPDATE, one loan
+    version bump and one bulk INSERT. All-or-nothing: an unknown account or an account
+    whose net change would take it below zero rejects the whole batch with
+    EscrowPostingError.
+    """
+    deltas = defaultdict(Decimal)
+    for posting in postings:
+        deltas[posting["escrow"]] += signed_amount(posting["kind"], posting["amount"])
+
+    with transaction.atomic():
+        balances = dict(
+            EscrowAccount.objects.select_for_update().filter(pk__in=deltas).values_list("id", "balance")
+        )
+        errors = []
+        for index, posting in enumerate(postings):
+            escrow_id = posting["escrow"]
+            if escrow_id not in balances:
+                errors.append({"index": index, "detail": f"Escrow account {escrow_id} does not exist."})
+            elif balances[escrow_id] + deltas[escrow_id] < 0:
+                errors.append({"index": index, "detail": f"Escrow account {escrow_id} would be overdrawn."})
+        if errors:
+            raise EscrowPostingError(errors)
+
+        accounts = []
+        for escrow_id, delta in deltas.items():
+            account = EscrowAccount(pk=escrow_id)
+            account.balance = F("balance") + delta
+            accounts.append(account)
+        EscrowAccount.objects.bulk_update(accounts, ["balance"], batch_size=500)
+        Loan.objects.filter(escrow__pk__in=list(deltas)).bump_version()
+        return EscrowTransaction.objects.bulk_create(
+            [
+                EscrowTransaction(
+                    escrow_id=posting["escrow"],
+                    kind=posting["kind"],
+                    amount=signed_amount(posting["kind"], posting["amount"]),
+                    note=posting.get("note", ""),
+                )
+                for posting in postings
+            ],
+            batch_size=500,
+        )
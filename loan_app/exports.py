@@ -0,0 +1,141 @@
+# loan_app/exports.py
+"""
+Streaming CSV/NDJSON dumps of loans and payments (GET /api/exports/<resource>/ and the
+export_data command).
+
+Rows come from values_list(...).iterator(chunk_size=EXPORT_CHUNK_SIZE) -- plain tuples,
+no model instances, and a server-side cursor on backends that have one -- and are
+encoded and yielded a batch of lines at a time. Memory is bounded by one chunk however
+large the table, and the header is yielded before the first query runs.
+"""
+import csv
+from datetime import date, datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Loan, Payment
+
+EXPORT_CHUNK_SIZE = 2000
+# lines per yielded piece of the response body
+LINES_PER_WRITE = 500
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+LOAN_COLUMNS = [
+    "id", "customer_id", "principal_amount", "annual_interest_rate", "term_months", "start_date",
+    "status", "outstanding_principal", "total_interest_paid", "scheduled_monthly_payment",
+    "payments_count", "total_paid", "last_payment_date", "paid_off_date", "created_at",
+]
+PAYMENT_COLUMNS = [
+    "id", "loan_id", "amount", "payment_date", "note", "processed_at",
+    "principal_component", "interest_component", "idempotency_key", "created_at",
+]
+
+
+def _loans(start=None, end=None, status=None):
+    queryset = Loan.objects.all()
+    if start:
+        queryset = queryset.filter(start_date__gte=start)
+    if end:
+        queryset = queryset.filter(start_date__lte=end)
+    if status:
+        queryset = queryset.filter(status=status)
+    return queryset.order_by("id")
+
+
+def _payments(start=None, end=None, status=None):
+    queryset = Payment.objects.all()
+    if start:
+        queryset = queryset.filter(payment_date__gte=start)
+    if end:
+        queryset = queryset.filter(payment_date__lte=end)
+    if status:
+        queryset = queryset.filter(loan__status=status)
+    # matches payment_date_idx, so a date range is an index range scan with no sort
+    return queryset.order_by("payment_date", "id")
+
+
+# resource -> (queryset builder, columns); date filters apply to start_date / payment_date,
+# status to the loan's status
+EXPORTS = {
+    "loans": (_loans, LOAN_COLUMNS),
+    "payments": (_payments, PAYMENT_COLUMNS),
+}
+
+
+def parse_filters(fmt=None, start=None, end=None, status=None):
+    """Validate raw filter strings; returns kwargs for stream_export or raises ValueError."""
+    fmt = (fmt or "csv").lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"fmt must be one of: {', '.join(FORMATS)}")
+    try:
+        start = date.fromisoformat(start) if start else None
+        end = date.fromisoformat(end) if end else None
+    except ValueError:
+        raise ValueError("from/to must be dates (YYYY-MM-DD)")
+    statuses = {value for value, _ in Loan.STATUS_CHOICES}
+    if status and status not in statuses:
+        raise ValueError(f"status must be one of: {', '.join(sorted(statuses))}")
+    return {"fmt": fmt, "start": start, "end": end, "status": status or None}
+
+
+class _Echo:
+    """File-like object whose write() hands the encoded line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _csv_lines(columns, rows):
+    writer = csv.writer(_Echo())
+    for row in rows:
+        yield writer.writerow([_cell(value) for value in row])
+
+
+def _ndjson_lines(columns, rows):
+    encoder = DjangoJSONEncoder(separators=(",", ":"))
+    for row in rows:
+        yield encoder.encode(dict(zip(columns, row))) + "\n"
+
+
+def export_rows(resource, start=None, end=None, status=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """(columns, lazy iterator of value tuples) for one resource."""
+    build, columns = EXPORTS[resource]
+    rows = build(start, end, status).values_list(*columns).iterator(chunk_size=chunk_size)
+    return columns, rows
+
+
+def stream_export(resource, fmt="csv", start=None, end=None, status=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the export body as str pieces of up to LINES_PER_WRITE lines."""
+    columns, rows = export_rows(resource, start, end, status, chunk_size)
+    if fmt == "csv":
+        # sent before the query runs, so the client sees the first byte immediately
+        yield csv.writer(_Echo()).writerow(columns)
+        lines = _csv_lines(columns, rows)
+    else:
+        lines = _ndjson_lines(columns, rows)
+        # NDJSON has no header: send the first record as soon as it exists, then buffer
+        first = next(lines, None)
+        if first is None:
+            return
+        yield first
+
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= LINES_PER_WRITE:
+            yield "".join(buffer)
+            buffer = []
+    if buffer:
+        yield "".join(buffer)
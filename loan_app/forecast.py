@@ -0,0 +1,183 @@
+# loan_app/forecast.py
+"""
+Portfolio cash-flow forecast: expected payments, interest, principal and balances per
+month for every loan in the book, summed per group.
+
+The loans' balance/rate/term columns are read in one values_list pass and projected
+together on int64 cent arrays (the same integer interest rounding as schedules.py), one
+handful of array ops per month across all loans. Per-group totals are np.bincount sums,
+so nothing of size loans x months is ever materialized.
+
+Each loan is assumed to pay its scheduled EMI every month until its contractual
+maturity (start_date + term_months); the last month before maturity -- or the first
+forecast month for a loan already past it -- collects the whole remaining balance.
+"""
+from datetime import date
+
+import numpy as np
+
+from . import amortization
+from .models import Loan
+from .schedules import add_months, interest_cents
+
+MAX_MONTHS = 360
+DEFAULT_MONTHS = 12
+GROUPINGS = ("portfolio", "status", "origination_month")
+# loans with a balance can still pay; PAID_OFF loans have nothing left to forecast
+FORECAST_STATUSES = (Loan.STATUS_ACTIVE, Loan.STATUS_DEFAULTED)
+LOAD_CHUNK_SIZE = 5000
+# drop paid-off loans from the working arrays once a year of months
+COMPACT_EVERY = 12
+
+COLUMNS = ("payment", "interest", "principal", "balance", "loans")
+
+
+def months_between(start: date, end: date) -> int:
+    """Whole calendar months from start's month to end's month."""
+    return (end.year - start.year) * 12 + end.month - start.month
+
+
+def _group_key(group_by, status, start_date):
+    if group_by == "status":
+        return status
+    if group_by == "origination_month":
+        return start_date.strftime("%Y-%m")
+    return "portfolio"
+
+
+def load(statuses=(Loan.STATUS_ACTIVE,), group_by="portfolio", as_of=None):
+    """
+    One pass over the loans' columns -> dict of per-loan arrays (cents / basis points /
+    months remaining) and the group key of each loan.
+    """
+    as_of = as_of or date.today()
+    rows = (
+        Loan.objects.filter(status__in=statuses, outstanding_principal__gt=0)
+        .order_by()
+        .values_list(
+            "outstanding_principal", "annual_interest_rate", "term_months", "start_date",
+            "scheduled_monthly_payment", "principal_amount", "status",
+        )
+    )
+    balance, rate_bp, rates, remaining, emi, keys = [], [], [], [], [], []
+    for outstanding, rate, term, start, scheduled, principal, status in rows.iterator(chunk_size=LOAD_CHUNK_SIZE):
+        start = start or as_of
+        balance.append(int(outstanding * 100))
+        rate_bp.append(int(rate * 100))
+        rates.append(rate)
+        remaining.append(max(1, min(term, term - months_between(start, as_of))))
+        emi.append(int((scheduled or amortization.emi(principal, rate, term)) * 100))
+        keys.append(_group_key(group_by, status, start))
+
+    groups, codes = np.unique(np.array(keys, dtype=str), return_inverse=True) if keys else ([], [])
+    return {
+        "balance": np.array(balance, dtype=np.int64),
+        "rate_bp": np.array(rate_bp, dtype=np.int64),
+        "rates": np.array(rates, dtype=object),
+        "remaining": np.array(remaining, dtype=np.int64),
+        "emi": np.array(emi, dtype=np.int64),
+        "codes": np.asarray(codes, dtype=np.int64).reshape(-1),
+        "groups": [str(group) for group in groups],
+    }
+
+
+def project(book, months=DEFAULT_MONTHS):
+    """
+    Month-by-month per-group totals for `book` (from load()): a dict of
+    (groups x months) int64 arrays -- payment, interest, principal (cents), balance at
+    month end (cents) and loans still paying -- plus the opening balance per group.
+    """
+    group_count = len(book["groups"])
+    codes = book["codes"]
+    balance, rate_bp, rates = book["balance"], book["rate_bp"], book["rates"]
+    remaining, emi = book["remaining"], book["emi"]
+
+    def per_group(values):
+        return np.rint(np.bincount(codes, weights=values, minlength=group_count)).astype(np.int64)
+
+    out = {name: np.zeros((group_count, months), dtype=np.int64) for name in COLUMNS}
+    out["opening_balance"] = per_group(balance)
+    for t in range(months):
+        if t and t % COMPACT_EVERY == 0:
+            keep = balance > 0
+            codes, balance, rate_bp, rates, remaining, emi = (
+                codes[keep], balance[keep], rate_bp[keep], rates[keep], remaining[keep], emi[keep]
+            )
+        if not len(balance):
+            break
+        live = balance > 0
+        interest = interest_cents(balance, rate_bp, rates)
+        principal = np.minimum(np.maximum(emi - interest, 0), balance)
+        # maturity month: the rest of the balance is due
+        principal = np.where(remaining <= t + 1, balance, principal)
+        balance = balance - principal
+
+        out["interest"][:, t] = per_group(interest)
+        out["principal"][:, t] = per_group(principal)
+        out["balance"][:, t] = per_group(balance)
+        out["loans"][:, t] = per_group(live)
+    out["payment"] = out["interest"] + out["principal"]
+    return out
+
+
+def forecast(months=DEFAULT_MONTHS, group_by="portfolio", statuses=(Loan.STATUS_ACTIVE,), as_of=None) -> dict:
+    """The GET /api/portfolio/forecast/ body: per group, one row per month plus totals."""
+    as_of = as_of or date.today()
+    book = load(statuses, group_by, as_of)
+    result = project(book, months)
+    first_month = as_of.replace(day=1)
+    labels = [add_months(first_month, t + 1).strftime("%Y-%m") for t in range(months)]
+
+    groups = []
+    for g, key in enumerate(book["groups"]):
+        columns = {name: result[name][g].tolist() for name in COLUMNS}
+        groups.append({
+            "key": key,
+            "loans": int(np.count_nonzero(book["codes"] == g)),
+            "opening_balance": int(result["opening_balance"][g]) / 100,
+            "totals": {name: int(result[name][g].sum()) / 100 for name in ("payment", "interest", "principal")},
+            "rows": [
+                {
+                    "month": label,
+                    "payment": columns["payment"][t] / 100,
+                    "interest": columns["interest"][t] / 100,
+                    "principal": columns["principal"][t] / 100,
+                    "balance_end": columns["balance"][t] / 100,
+                    "paying_loans": columns["loans"][t],
+                }
+                for t, label in enumerate(labels)
+            ],
+        })
+    return {
+        "as_of": as_of.isoformat(),
+        "months": months,
+        "group_by": group_by,
+        "statuses": list(statuses),
+        "loans": len(book["codes"]),
+        "groups": groups,
+    }
+
+
+def parse_params(months, group_by, status, as_of):
+    """Validate the endpoint's query params; raises ValueError with a user-facing message."""
+    try:
+        months = int(months) if months else DEFAULT_MONTHS
+    except ValueError:
+        raise ValueError("months must be an integer")
+    if not 1 <= months <= MAX_MONTHS:
+        raise ValueError(f"months must be between 1 and {MAX_MONTHS}")
+
+    group_by = group_by or "portfolio"
+    if group_by not in GROUPINGS:
+        raise ValueError(f"group_by must be one of: {', '.join(GROUPINGS)}")
+
+    statuses = tuple(s.strip() for s in (status or Loan.STATUS_ACTIVE).upper().split(",") if s.strip())
+    unknown = [s for s in statuses if s not in FORECAST_STATUSES]
+    if unknown or not statuses:
+        raise ValueError(f"status must be a comma-separated subset of: {', '.join(FORECAST_STATUSES)}")
+
+    try:
+        as_of = date.fromisoformat(as_of) if as_of else None
+    except ValueError:
+        raise ValueError("as_of must be an ISO date (YYYY-MM-DD)")
+    return {"months": months, "group_by": group_by, "statuses": statuses, "as_of": as_of}
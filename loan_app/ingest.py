@@ -0,0 +1,165 @@
+# loan_app/ingest.py
+"""
+Bulk payment ingestion for bank files (POST /api/payments/bulk/).
+
+The body is read as a stream -- NDJSON (one JSON object per line) or CSV with a header
+row -- and handled in chunks of INGEST_CHUNK_SIZE rows. For each chunk:
+
+- rows are validated by one PaymentRowSerializer;
+- every referenced loan is resolved with a single in_bulk();
+- valid rows are inserted with one bulk_create and folded into the loans' stored
+  payment aggregates with one UPDATE (Loan.objects.add_payment_stats).
+
+Bad rows are reported with their line number and never abort the rest of the file.
+Only one chunk is held in memory at a time, so memory stays flat for any file size.
+"""
+import codecs
+import csv
+import json
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+
+from .models import Loan, Payment
+
+INGEST_CHUNK_SIZE = 1000
+# a file of garbage should not produce a garbage-sized response
+MAX_REPORTED_ERRORS = 1000
+
+CSV_CONTENT_TYPES = {"text/csv", "application/csv"}
+
+
+class PaymentRowSerializer(serializers.Serializer):
+    loan = serializers.IntegerField(min_value=1)
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2)
+    payment_date = serializers.DateField()
+    note = serializers.CharField(max_length=200, required=False, allow_blank=True, default="")
+    # the bank's transaction reference; a second row/file with the same key is rejected
+    idempotency_key = serializers.CharField(max_length=64, required=False, allow_null=True, default=None)
+
+    def validate_amount(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Payment amount must be positive.")
+        return value
+
+
+def _ndjson_rows(lines):
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield line_no, None, {"non_field_errors": [f"Invalid JSON: {exc}"]}
+            continue
+        if not isinstance(row, dict):
+            yield line_no, None, {"non_field_errors": ["Expected a JSON object."]}
+            continue
+        yield line_no, row, None
+
+
+def _csv_rows(lines):
+    reader = csv.DictReader(lines)
+    for row in reader:
+        # blank cells mean "not given", so optional columns fall back to their defaults
+        yield reader.line_num, {k: v for k, v in row.items() if k and v not in ("", None)}, None
+
+
+def iter_rows(stream, content_type=""):
+    """
+    (line_no, row dict or None, parse error or None) for every record in a byte stream,
+    decoded incrementally line by line.
+    """
+    lines = codecs.iterdecode(stream, "utf-8-sig")
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in CSV_CONTENT_TYPES:
+        return _csv_rows(lines)
+    return _ndjson_rows(lines)
+
+
+def _ingest_chunk(chunk, report):
+    errors = report["errors"]
+
+    def fail(line_no, detail):
+        report["failed"] += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"line": line_no, "errors": detail})
+        else:
+            report["errors_truncated"] = True
+
+    parsed = []
+    for line_no, row, parse_error in chunk:
+        if parse_error:
+            fail(line_no, parse_error)
+        else:
+            parsed.append((line_no, row))
+    if not parsed:
+        return
+
+    # one serializer for the chunk; ListSerializer would discard the valid rows on any error
+    validator = PaymentRowSerializer()
+    valid = []
+    for line_no, row in parsed:
+        try:
+            valid.append((line_no, validator.run_validation(row)))
+        except serializers.ValidationError as exc:
+            fail(line_no, exc.detail)
+
+    loans = Loan.objects.only("id", "status").in_bulk({data["loan"] for _, data in valid})
+    keys = {data["idempotency_key"] for _, data in valid if data["idempotency_key"]}
+    seen = set(Payment.objects.filter(idempotency_key__in=keys).values_list("idempotency_key", flat=True))
+
+    payments = []
+    for line_no, data in valid:
+        loan = loans.get(data["loan"])
+        key = data["idempotency_key"]
+        if loan is None:
+            fail(line_no, {"loan": [f"Loan {data['loan']} does not exist."]})
+        elif loan.status == Loan.STATUS_PAID_OFF:
+            fail(line_no, {"loan": ["This loan is already PAID_OFF. No further payments allowed."]})
+        elif key and key in seen:
+            fail(line_no, {"idempotency_key": [f"Payment {key} was already received."]})
+        else:
+            if key:
+                seen.add(key)
+            payments.append((line_no, Payment(
+                loan_id=loan.id,
+                amount=data["amount"],
+                payment_date=data["payment_date"],
+                note=data["note"],
+                idempotency_key=key,
+            )))
+    if not payments:
+        return
+
+    try:
+        with transaction.atomic():
+            created = Payment.objects.bulk_create([p for _, p in payments], batch_size=len(payments))
+            # bulk_create skips post_save, which is what maintains these per row
+            Loan.objects.add_payment_stats(created)
+    except IntegrityError:
+        # a concurrent upload inserted one of our keys after the check above
+        for line_no, _ in payments:
+            fail(line_no, {"non_field_errors": ["Conflicting payment received concurrently; resend this row."]})
+        return
+    report["created"] += len(created)
+
+
+def ingest_payments(stream, content_type="", chunk_size=INGEST_CHUNK_SIZE):
+    """
+    Validate and insert every payment in `stream`.
+
+    Returns {"received", "created", "failed", "errors": [{"line", "errors"}], ...}; one
+    transaction per chunk, so a failure late in the file keeps the earlier chunks.
+    """
+    report = {"received": 0, "created": 0, "failed": 0, "errors": []}
+    rows = iter_rows(stream, content_type)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        report["received"] += len(chunk)
+        _ingest_chunk(chunk, report)
+    report["errors"].sort(key=lambda error: error["line"])
+    return report
@@ -0,0 +1,199 @@
+# loan_app/intents.py
+"""
+Question planning for ai_query: a registry of intents compiled once at import.
+
+Each intent is a regex plus what answering it costs:
+- `facts`: portfolio facts (cached per group, see portfolio.py) -- "total customers"
+  needs only the customers group, i.e. one COUNT on a cold cache and none on a warm one;
+- `aggregate`: for parameterized questions ("active loans above 6%", "payments last 7
+  days"), the match compiles to filtered aggregate expressions on one model.
+
+answer() finds every intent in the question (the registry is tried in order and a
+matched span is not matched again, so "active loans above 6%" is the rate question,
+not also "active loans"), then fetches what they need together: the facts in one
+get_facts() call and the parameterized aggregates as a single aggregate query per model.
+aanswer() is the async twin.
+"""
+import asyncio
+import re
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Callable, Optional
+
+from django.db.models import Count, Q, Sum
+
+from . import amortization, portfolio
+from .models import Loan, Payment
+
+AI_EMPTY_ANSWER = "Please ask a question, e.g. 'total customers'."
+AI_HELP = (
+    "I can answer: 'total customers', 'active loans', "
+    "'outstanding principal', 'monthly emi total', 'recent payments', "
+    "'active loans above 6%', 'payments last 7 days'."
+)
+# facts rendered as strings in the response body
+MONEY_FACTS = ("outstanding_principal", "monthly_emi_total")
+ZERO = Decimal("0.00")
+
+STATUS_WORDS = {
+    "active": Loan.STATUS_ACTIVE,
+    "paid off": Loan.STATUS_PAID_OFF,
+    "paid-off": Loan.STATUS_PAID_OFF,
+    "defaulted": Loan.STATUS_DEFAULTED,
+}
+RATE_LOOKUPS = {"above": "gt", "over": "gt", "below": "lt", "under": "lt"}
+
+
+@dataclass(frozen=True)
+class Intent:
+    name: str
+    pattern: re.Pattern
+    template: str
+    facts: tuple = ()
+    # match -> (fact key, model, {alias: aggregate}) for parameterized questions
+    aggregate: Optional[Callable] = None
+
+
+def _loans_by_rate(match):
+    status_word, direction, rate = match.group("status"), match.group("direction"), match.group("rate")
+    condition = Q(**{f"annual_interest_rate__{RATE_LOOKUPS[direction]}": Decimal(rate)})
+    if status_word:
+        condition &= Q(status=STATUS_WORDS[status_word])
+    key = f"{(status_word or 'all').replace(' ', '_').replace('-', '_')}_loans_{direction}_{rate}%"
+    return key, Loan, {
+        "count": Count("id", filter=condition),
+        "outstanding_principal": Sum("outstanding_principal", filter=condition, default=ZERO),
+    }
+
+
+def _payments_in_window(match):
+    days = int(match.group("days"))
+    today = date.today()
+    condition = Q(payment_date__gt=today - timedelta(days=days), payment_date__lte=today)
+    return f"payments_last_{days}_days", Payment, {
+        "count": Count("id", filter=condition),
+        "amount": Sum("amount", filter=condition, default=ZERO),
+    }
+
+
+INTENTS = [
+    # parameterized first: their spans contain the plain intents' words
+    Intent(
+        "loans_by_rate",
+        re.compile(
+            r"\b(?:(?P<status>active|paid[- ]off|defaulted)\s+)?loans?\s+(?:with\s+(?:a\s+)?rate\s+)?"
+            r"(?P<direction>above|over|below|under)\s+(?P<rate>\d{1,3}(?:\.\d+)?)\s*%"
+        ),
+        "{label}: {count} (outstanding ${outstanding_principal}).",
+        aggregate=_loans_by_rate,
+    ),
+    Intent(
+        "payments_in_window",
+        re.compile(r"\bpayments?\s+(?:in\s+)?(?:the\s+)?(?:last|past)\s+(?P<days>[1-9]\d{0,3})\s+days?\b"),
+        "{label}: {count} totalling ${amount}.",
+        aggregate=_payments_in_window,
+    ),
+    Intent("customers", re.compile(r"\btotal customers\b"), "Total customers: {customers}.", ("customers",)),
+    Intent("active_loans", re.compile(r"\bactive loans\b"), "Active loans: {active_loans}.", ("active_loans",)),
+    Intent("paid_off_loans", re.compile(r"\bpaid loans\b|\bpaid[- ]off\b"), "Paid-off loans: {paid_off_loans}.",
+           ("paid_off_loans",)),
+    Intent("defaulted_loans", re.compile(r"\bdefaulted\b"), "Defaulted loans: {defaulted_loans}.",
+           ("defaulted_loans",)),
+    Intent("outstanding_principal", re.compile(r"\boutstanding\b"),
+           "Total outstanding principal: ${outstanding_principal}.", ("outstanding_principal",)),
+    Intent("monthly_emi_total", re.compile(r"\bemi\b"), "Monthly EMI total (approx): ${monthly_emi_total}.",
+           ("monthly_emi_total",)),
+    Intent("recent_payments", re.compile(r"\brecent payments\b"), "Last {count} payments.", ("recent_payments",)),
+]
+
+
+def plan(text: str):
+    """[(intent, match)] found in a lower-cased question, in the order they appear."""
+    found = []
+    for intent in INTENTS:
+        for match in intent.pattern.finditer(text):
+            found.append((intent, match))
+        # blank the matched spans so later, more generic intents do not match them again
+        text = intent.pattern.sub(lambda m: " " * len(m.group(0)), text)
+    return sorted(found, key=lambda item: item[1].start())
+
+
+def _requirements(found):
+    """(portfolio fact names, recent payments needed?, {model: {alias: aggregate}}, [(match, key, prefix)])."""
+    facts, recent, batches, parameterized = set(), False, {}, []
+    for number, (intent, match) in enumerate(found):
+        if intent.aggregate is not None:
+            key, model, aggregates = intent.aggregate(match)
+            prefix = f"q{number}__"
+            batches.setdefault(model, {}).update({prefix + alias: agg for alias, agg in aggregates.items()})
+            parameterized.append((key, prefix))
+        else:
+            recent = recent or "recent_payments" in intent.facts
+            facts.update(name for name in intent.facts if name != "recent_payments")
+    return sorted(facts), recent, batches, parameterized
+
+
+def _render(found, parameterized, facts, aggregated) -> dict:
+    values = dict(facts)
+    sentences = []
+    parameterized = iter(parameterized)
+    for intent, match in found:
+        if intent.aggregate is not None:
+            key, prefix = next(parameterized)
+            result = {
+                alias[len(prefix):]: value for alias, value in aggregated.items() if alias.startswith(prefix)
+            }
+            for alias, value in result.items():
+                if alias != "count":
+                    result[alias] = str(amortization.to_cents(value))  # SQLite sums decimals as floats
+            values[key] = result
+            label = match.group(0)
+            sentences.append(intent.template.format(label=label[:1].upper() + label[1:], **result))
+        elif intent.name == "recent_payments":
+            sentences.append(intent.template.format(count=len(values["recent_payments"])))
+        else:
+            sentences.append(intent.template.format(**values))
+    for name in MONEY_FACTS:
+        if name in values:
+            values[name] = str(values[name])
+    return {"answer": " ".join(sentences), "facts": values}
+
+
+def answer(text: str) -> dict:
+    """The ai_query response body for a lower-cased, non-empty question."""
+    found = plan(text)
+    if not found:
+        return {"answer": AI_HELP, "facts": {}}
+    names, recent, batches, parameterized = _requirements(found)
+    facts = portfolio.get_facts(*names) if names else {}
+    if recent:
+        facts["recent_payments"] = portfolio.recent_payments()
+    aggregated = {}
+    for model, aggregates in batches.items():
+        aggregated.update(model.objects.aggregate(**aggregates))
+    return _render(found, parameterized, facts, aggregated)
+
+
+async def aanswer(text: str) -> dict:
+    """answer() for async callers: the facts, recent payments and aggregates are fetched concurrently."""
+    found = plan(text)
+    if not found:
+        return {"answer": AI_HELP, "facts": {}}
+    names, recent, batches, parameterized = _requirements(found)
+
+    async def nothing():
+        return {}
+
+    fetched = await asyncio.gather(
+        portfolio.aget_facts(*names) if names else nothing(),
+        portfolio.arecent_payments() if recent else nothing(),
+        *(model.objects.aaggregate(**aggregates) for model, aggregates in batches.items()),
+    )
+    facts, payments, *results = fetched
+    if recent:
+        facts["recent_payments"] = payments
+    aggregated = {}
+    for result in results:
+        aggregated.update(result)
+    return _render(found, parameterized, facts, aggregated)
@@ -0,0 +1,109 @@
+# loan_app/loan_cache.py
+"""
+Versioned read cache for per-loan GET responses (detail, summary, amortization preview).
+
+Every write to a loan bumps Loan.version (Loan.save, LoanQuerySet.update/bulk_update and
+escrow postings), so a rendered response is cached under (loan, version, kind, query
+params) and never needs invalidating: the next write simply moves readers to a new key.
+The same tuple is the response's ETag, so a polling client that sends If-None-Match gets
+a 304 for the cost of one indexed single-column lookup.
+
+Works with any Django cache backend -- local memory by default, Redis when
+REDIS_CACHE_URL is configured. aversioned_response() is the same for the async views
+(loan_app.async_views); both share keys and ETags, so either path can serve the other's
+entries and validate the other's ETags.
+"""
+import hashlib
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
+
+from .models import Loan
+
+CACHE_PREFIX = "loan_app:loan:"
+# entries never go stale (the version is in the key); the timeout only bounds memory
+CACHE_TIMEOUT = 60 * 60
+
+
+def _digest(created_at, params) -> str:
+    # created_at tells apart a deleted loan and a new one that got its id back (SQLite reuses ids)
+    items = sorted((key, value) for key, values in params.lists() for value in values)
+    return hashlib.sha1(f"{created_at.isoformat()}?{urlencode(items)}".encode()).hexdigest()[:12]
+
+
+def current_version(loan_id):
+    """(version, created_at) of the loan, or None when it does not exist (or the id is malformed)."""
+    try:
+        return Loan.objects.filter(pk=loan_id).values_list("version", "created_at").first()
+    except (TypeError, ValueError):
+        return None
+
+
+def _validators(request, loan_id, kind, current):
+    """(cache key, headers, not_modified) for a loan at (version, created_at) `current`."""
+    version, created_at = current
+    digest = _digest(created_at, request.GET)
+    etag = f'"{kind}-{loan_id}-{version}-{digest}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("If-None-Match")
+    not_modified = bool(if_none_match) and (etag in parse_etags(if_none_match) or if_none_match.strip() == "*")
+    return f"{CACHE_PREFIX}{loan_id}:v{version}:{kind}:{digest}", headers, not_modified
+
+
+def versioned_response(request, loan_id, kind: str, build):
+    """
+    Serve `build()` (which returns the response data and may raise Http404) through the
+    versioned cache, with ETag / If-None-Match handling.
+    """
+    current = current_version(loan_id)
+    if current is None:
+        # let build() produce the 404 (or whatever it does for a missing loan)
+        return Response(build())
+
+    key, headers, not_modified = _validators(request, loan_id, kind, current)
+    if not_modified:
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    data = cache.get(key)
+    if data is None:
+        # built after the version was read: at worst newer data lands under the older key
+        data = build()
+        cache.set(key, data, CACHE_TIMEOUT)
+    return Response(data, headers=headers)
+
+
+async def acurrent_version(loan_id):
+    try:
+        return await Loan.objects.filter(pk=loan_id).values_list("version", "created_at").afirst()
+    except (TypeError, ValueError):
+        return None
+
+
+async def aversioned_response(request, loan_id, kind: str, build, current):
+    """
+    versioned_response() for async views: `build` is a coroutine function and `current`
+    is what acurrent_version() returned (awaited by the caller, typically alongside other
+    lookups). Returns a plain Django response with the same body as the DRF one.
+    """
+    if current is None:
+        return json_response(await build())
+
+    key, headers, not_modified = _validators(request, loan_id, kind, current)
+    if not_modified:
+        return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    data = await cache.aget(key)
+    if data is None:
+        data = await build()
+        await cache.aset(key, data, CACHE_TIMEOUT)
+    return json_response(data, headers=headers)
+
+
+def json_response(data, status=200, headers=None):
+    """`data` rendered by DRF's JSONRenderer, for views that are not DRF views."""
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type="application/json", headers=headers)
@@ -0,0 +1,64 @@
+# loan_app/management/commands/benchmark.py
+import json
+import subprocess
+
+from django.core.management.base import BaseCommand, CommandError
+
+from loan_app import benchmarks
+
+
+class Command(BaseCommand):
+    help = "Run the money-math / endpoint / EMI-run benchmarks in a throwaway test database and emit a JSON report"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", default=",".join(str(n) for n in benchmarks.DEFAULT_EMI_SIZES),
+            help="Loan counts for the process_daily_emi runs (comma-separated)",
+        )
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--emi-repeat", type=int, default=3, help="Runs per process_daily_emi / forecast size")
+        parser.add_argument(
+            "--only", default="emi,endpoints,process_daily_emi,forecast",
+            help="Benchmark groups to run: emi, endpoints, process_daily_emi, forecast",
+        )
+        parser.add_argument("--output", "-o", help="Write the JSON report here (default: stdout)")
+        parser.add_argument("--baseline", help="Earlier report to compare against; exits non-zero on regressions")
+        parser.add_argument("--max-slowdown", type=float, default=0.25, help="Allowed median slowdown vs baseline (fraction)")
+
+    def handle(self, *args, **opts):
+        try:
+            sizes = [int(n) for n in opts["sizes"].split(",") if n.strip()]
+        except ValueError:
+            raise CommandError("--sizes must be a comma-separated list of integers")
+        groups = tuple(name.strip() for name in opts["only"].split(",") if name.strip())
+
+        with benchmarks.throwaway_database():
+            report = benchmarks.run_suite(
+                sizes=sizes, repeat=opts["repeat"], include=groups, emi_repeat=opts["emi_repeat"]
+            )
+        report["commit"] = self._commit()
+
+        payload = json.dumps(report, indent=2)
+        if opts["output"]:
+            with open(opts["output"], "w", encoding="utf-8") as out:
+                out.write(payload + "\n")
+            self.stderr.write(self.style.SUCCESS(f"Wrote {len(report['results'])} results to {opts['output']}"))
+        else:
+            self.stdout.write(payload)
+
+        if opts["baseline"]:
+            with open(opts["baseline"], encoding="utf-8") as f:
+                problems = benchmarks.compare(report, json.load(f), opts["max_slowdown"])
+            for problem in problems:
+                self.stderr.write(self.style.WARNING(problem))
+            if problems:
+                raise CommandError(f"{len(problems)} regression(s) against {opts['baseline']}")
+
+    @staticmethod
+    def _commit():
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,40 @@
+# loan_app/management/commands/benchmark_asgi.py
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from loan_app import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare concurrent-request throughput of the read endpoints: sync views on threads "
+        "(WSGI) against the async views on one event loop (ASGI), in a throwaway database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=400, help="Requests per endpoint and mode")
+        parser.add_argument("--concurrency", type=int, default=32, help="Requests in flight at once")
+        parser.add_argument("--loans", type=int, default=100, help="Loans the requests cycle over")
+        parser.add_argument("--output", "-o", help="Write the JSON report here (default: stdout)")
+
+    def handle(self, *args, **opts):
+        with benchmarks.throwaway_database():
+            results = benchmarks.bench_concurrent_reads(opts["requests"], opts["concurrency"], opts["loans"])
+            database = connection.vendor
+
+        for result in results:
+            params = result["params"]
+            self.stderr.write(
+                f"{params['endpoint']:>22} {params['mode']}: {result['requests_per_s']:>8} req/s, "
+                f"{result['errors']} errors"
+            )
+
+        payload = json.dumps({"database": database, "results": results}, indent=2)
+        if opts["output"]:
+            with open(opts["output"], "w", encoding="utf-8") as out:
+                out.write(payload + "\n")
+            self.stderr.write(self.style.SUCCESS(f"Wrote {len(results)} results to {opts['output']}"))
+        else:
+            self.stdout.write(payload)
@@ -0,0 +1,79 @@
+# loan_app/management/commands/benchmark_db.py
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from loan_app import benchmarks
+from loan_app.database import sqlite_pragmas
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare payment-processing write throughput with concurrent writers under each "
+        "DB_PROFILE (each profile runs in its own process against a throwaway database)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--profiles", default="sqlite-plain,sqlite",
+            help=f"Comma-separated DB_PROFILEs to compare ({', '.join(settings.DATABASE_PROFILES)})",
+        )
+        parser.add_argument("--payments", type=int, default=2000)
+        parser.add_argument("--writers", type=int, default=8, help="Concurrent writer threads")
+        parser.add_argument("--loans", type=int, default=200, help="Loans the payments are spread over")
+        parser.add_argument("--output", "-o", help="Write the JSON report here (default: stdout)")
+        parser.add_argument("--worker", action="store_true", help="Internal: run the current profile only")
+
+    def handle(self, *args, **opts):
+        if opts["worker"]:
+            self.stdout.write(json.dumps(self._run_profile(opts)))
+            return
+
+        profiles = [name.strip() for name in opts["profiles"].split(",") if name.strip()]
+        unknown = [name for name in profiles if name not in settings.DATABASE_PROFILES]
+        if unknown:
+            raise CommandError(f"Unknown profile(s): {', '.join(unknown)}")
+
+        results = [self._spawn(profile, opts) for profile in profiles]
+        for result in results:
+            if "error" in result:
+                self.stderr.write(self.style.WARNING(f"{result['profile']:>14}: failed -- {result['error']}"))
+            else:
+                self.stderr.write(
+                    f"{result['profile']:>14}: {result['payments_per_s']:>8} payments/s, "
+                    f"{result['failed']} failed, {result['seconds']}s"
+                )
+
+        payload = json.dumps({"results": results}, indent=2)
+        if opts["output"]:
+            with open(opts["output"], "w", encoding="utf-8") as out:
+                out.write(payload + "\n")
+            self.stderr.write(self.style.SUCCESS(f"Wrote {len(results)} results to {opts['output']}"))
+        else:
+            self.stdout.write(payload)
+
+    def _spawn(self, profile, opts):
+        # settings (and so the connection setup) are fixed per process: one process per profile
+        command = [
+            sys.executable, str(settings.BASE_DIR / "manage.py"), "benchmark_db", "--worker",
+            "--payments", str(opts["payments"]), "--writers", str(opts["writers"]), "--loans", str(opts["loans"]),
+        ]
+        done = subprocess.run(command, env={**os.environ, "DB_PROFILE": profile}, capture_output=True, text=True)
+        if done.returncode:
+            lines = done.stderr.strip().splitlines()
+            return {"profile": profile, "error": lines[-1] if lines else f"exit status {done.returncode}"}
+        return json.loads(done.stdout.strip().splitlines()[-1])
+
+    def _run_profile(self, opts):
+        with benchmarks.throwaway_database():
+            result = benchmarks.bench_payment_writes(opts["payments"], opts["writers"], opts["loans"])
+            if connection.vendor == "sqlite":
+                result["pragmas"] = sqlite_pragmas(connection)
+        result["profile"] = settings.DB_PROFILE
+        result["database"] = connection.vendor
+        return result
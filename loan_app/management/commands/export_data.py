@@ -0,0 +1,33 @@
+# loan_app/management/commands/export_data.py
+from django.core.management.base import BaseCommand, CommandError
+
+from loan_app import exports
+
+
+class Command(BaseCommand):
+    help = "Stream loans or payments as CSV/NDJSON to a file or stdout (constant memory)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("resource", choices=sorted(exports.EXPORTS))
+        parser.add_argument("--fmt", choices=sorted(exports.FORMATS), default="csv")
+        parser.add_argument("--from", dest="start", help="Earliest start_date / payment_date (YYYY-MM-DD)")
+        parser.add_argument("--to", dest="end", help="Latest start_date / payment_date (YYYY-MM-DD)")
+        parser.add_argument("--status", help="Only loans (or payments of loans) with this status")
+        parser.add_argument("--output", "-o", help="File to write (default: stdout)")
+        parser.add_argument("--chunk-size", type=int, default=exports.EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **opts):
+        try:
+            filters = exports.parse_filters(opts["fmt"], opts["start"], opts["end"], opts["status"])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        pieces = exports.stream_export(opts["resource"], chunk_size=opts["chunk_size"], **filters)
+        if opts["output"]:
+            with open(opts["output"], "w", encoding="utf-8", newline="") as out:
+                for piece in pieces:
+                    out.write(piece)
+            self.stderr.write(self.style.SUCCESS(f"Wrote {opts['resource']} export to {opts['output']}"))
+        else:
+            for piece in pieces:
+                self.stdout.write(piece, ending="")
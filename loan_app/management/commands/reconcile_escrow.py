@@ -0,0 +1,59 @@
+# loan_app/management/commands/reconcile_escrow.py
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+
+from loan_app.models import EscrowAccount, EscrowTransaction, Loan
+
+
+class Command(BaseCommand):
+    help = "Verify every EscrowAccount.balance equals the sum of its ledger entries (--fix to rebuild from the ledger)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Rewrite mismatched balances from the ledger")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **opts):
+        ledger = dict(
+            EscrowTransaction.objects.values("escrow_id").annotate(total=Sum("amount")).values_list("escrow_id", "total")
+        )
+
+        checked = 0
+        mismatched = []
+        stored = EscrowAccount.objects.values_list("id", "balance").order_by("id")
+        for escrow_id, balance in stored.iterator(chunk_size=opts["chunk_size"]):
+            checked += 1
+            expected = ledger.get(escrow_id) or Decimal("0.00")
+            if balance != expected:
+                mismatched.append((escrow_id, expected))
+                self.stdout.write(f"Escrow #{escrow_id}: stored balance={balance} ledger={expected}")
+
+        if mismatched and opts["fix"]:
+            ids = [escrow_id for escrow_id, _ in mismatched]
+            for first in range(0, len(ids), opts["chunk_size"]):
+                self._rebuild(ids[first:first + opts["chunk_size"]])
+            self.stdout.write(self.style.SUCCESS(f"Repaired {len(mismatched)} of {checked} escrow accounts"))
+        elif mismatched:
+            self.stdout.write(self.style.WARNING(f"{len(mismatched)} of {checked} escrow accounts out of sync (run with --fix)"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"All {checked} escrow accounts in sync"))
+
+    def _rebuild(self, escrow_ids):
+        # Postings UPDATE the account row before inserting their ledger entry, in one
+        # transaction: once the rows are locked, the ledger read below includes every
+        # posting that changed them, and none can slip in before our write.
+        with transaction.atomic():
+            locked = list(
+                EscrowAccount.objects.select_for_update().filter(pk__in=escrow_ids).values_list("id", flat=True)
+            )
+            ledger = dict(
+                EscrowTransaction.objects.filter(escrow_id__in=locked)
+                .values("escrow_id").annotate(total=Sum("amount")).values_list("escrow_id", "total")
+            )
+            accounts = [
+                EscrowAccount(pk=escrow_id, balance=ledger.get(escrow_id) or Decimal("0.00")) for escrow_id in locked
+            ]
+            EscrowAccount.objects.bulk_update(accounts, ["balance"])
+            Loan.objects.filter(escrow__pk__in=locked).bump_version()
@@ -0,0 +1,39 @@
+# loan_app/management/commands/reconcile_payment_stats.py
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from loan_app.models import Loan
+
+
+class Command(BaseCommand):
+    help = "Verify Loan.payments_count/total_paid/last_payment_date against the Payment table (--fix to repair)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Rewrite mismatched loans from the raw table")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **opts):
+        actual = Loan.objects.actual_payment_stats()
+
+        checked = 0
+        mismatched = []
+        stored = Loan.objects.values_list("id", *Loan.PAYMENT_STATS_FIELDS).order_by("id")
+        for loan_id, count, total, last in stored.iterator(chunk_size=opts["chunk_size"]):
+            checked += 1
+            expected = actual.get(loan_id, (0, Decimal("0.00"), None))
+            if (count, total, last) != expected:
+                mismatched.append(loan_id)
+                self.stdout.write(
+                    f"Loan #{loan_id}: stored count={count} total={total} last={last} "
+                    f"actual count={expected[0]} total={expected[1]} last={expected[2]}"
+                )
+
+        if mismatched and opts["fix"]:
+            for start in range(0, len(mismatched), opts["chunk_size"]):
+                Loan.objects.filter(pk__in=mismatched[start:start + opts["chunk_size"]]).refresh_payment_stats()
+            self.stdout.write(self.style.SUCCESS(f"Repaired {len(mismatched)} of {checked} loans"))
+        elif mismatched:
+            self.stdout.write(self.style.WARNING(f"{len(mismatched)} of {checked} loans out of sync (run with --fix)"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"All {checked} loans in sync"))
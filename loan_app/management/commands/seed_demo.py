@@ -1,12 +1,78 @@
 # loan_app/management/commands/seed_demo.py
-from django.core.management.base import BaseCommand
-from loan_app.models import Customer, Loan, EscrowAccount
+import random
+import time
+from datetime import date, datetime, time as dt_time
 from decimal import Decimal
 
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from loan_app import amortization, portfolio
+from loan_app.models import Customer, Loan, EscrowAccount, EscrowTransaction, Payment
+from loan_app.schedules import add_months
+
+# (weight, principal range, rate range %, terms in months)
+LOAN_PRODUCTS = [
+    (50, (2_000, 40_000), (8.0, 19.0), (12, 24, 36, 48, 60)),          # personal
+    (30, (8_000, 60_000), (3.5, 9.5), (36, 48, 60, 72)),               # auto
+    (20, (80_000, 750_000), (3.0, 7.5), (120, 180, 240, 360)),         # mortgage
+]
+DEFAULT_RATE = 0.04      # share of loans that stop paying and default
+EARLY_PAYOFF_RATE = 0.05  # share of loans settled early with one lump-sum payment
+MAX_HISTORY_MONTHS = 120
+
+
 class Command(BaseCommand):
-    help = "Seed demo data"
+    help = (
+        "Seed demo data. Without --customers: one demo customer and loan. With --customers: "
+        "a deterministic synthetic portfolio (loans, escrows, payment history) bulk-inserted in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--customers", type=int, default=0, help="Synthetic customers to generate")
+        parser.add_argument("--loans-per-customer", type=int, default=2)
+        parser.add_argument(
+            "--payments-per-loan", type=int, default=24,
+            help="Most payments of history per loan (fewer for young or defaulted loans)",
+        )
+        parser.add_argument("--seed", type=int, default=1, help="Random seed; same seed and --as-of give the same data")
+        parser.add_argument("--as-of", type=date.fromisoformat, default=None, help="Portfolio date (default: today)")
+        parser.add_argument("--batch-size", type=int, default=500, help="Customers per insert transaction")
 
-    def handle(self, *args, **kwargs):
+    def handle(self, *args, **opts):
+        if not opts["customers"]:
+            return self._seed_single()
+
+        domain = f"seed{opts['seed']}.example.com"
+        if Customer.objects.filter(email__endswith="@" + domain).exists():
+            raise CommandError(f"Seed {opts['seed']} is already loaded; pass a different --seed")
+
+        rng = random.Random(opts["seed"])
+        as_of = opts["as_of"] or date.today()
+        counts = {"customers": 0, "loans": 0, "escrows": 0, "payments": 0}
+        started = time.perf_counter()
+
+        for first in range(0, opts["customers"], opts["batch_size"]):
+            size = min(opts["batch_size"], opts["customers"] - first)
+            with transaction.atomic():
+                self._insert_batch(rng, domain, first, size, as_of, opts, counts)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"  {counts['customers']}/{opts['customers']} customers, {counts['payments']} payments "
+                f"({sum(counts.values()) / elapsed:.0f} rows/s)"
+            )
+
+        # Customer.bulk_create sends no signals (loan writes invalidate themselves)
+        portfolio.invalidate("customers")
+        elapsed = time.perf_counter() - started
+        total = sum(counts.values())
+        summary = ", ".join(f"{count} {name}" for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {summary} in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f} rows/s)"
+        ))
+
+    def _seed_single(self):
         c, _ = Customer.objects.get_or_create(full_name="Demo User", email="demo@example.com", phone="555-0100")
         loan, _ = Loan.objects.get_or_create(
             customer=c,
@@ -17,3 +83,113 @@ class Command(BaseCommand):
         )
         EscrowAccount.objects.get_or_create(loan=loan)
         self.stdout.write(self.style.SUCCESS(f"Seeded demo: customer={c.id}, loan={loan.id}"))
+
+    def _insert_batch(self, rng, domain, first, size, as_of, opts, counts):
+        customers = Customer.objects.bulk_create([
+            Customer(
+                full_name=f"Customer {first + i + 1:07d}",
+                email=f"customer{first + i + 1}@{domain}",
+                phone=f"555-{rng.randint(0, 9999):04d}",
+            )
+            for i in range(size)
+        ])
+
+        loans = []
+        histories = []
+        for customer in customers:
+            for _ in range(opts["loans_per_customer"]):
+                loan, history = self._synthetic_loan(rng, customer, as_of, opts["payments_per_loan"])
+                loans.append(loan)
+                histories.append(history)
+        # Loan.objects.bulk_create fills scheduled_monthly_payment
+        Loan.objects.bulk_create(loans, batch_size=1000)
+
+        escrows = EscrowAccount.objects.bulk_create(
+            [
+                EscrowAccount(loan=loan, balance=Decimal(rng.randint(0, 600) * 5).quantize(Decimal("0.01")))
+                for loan in loans
+            ],
+            batch_size=1000,
+        )
+        EscrowTransaction.objects.bulk_create(
+            [
+                EscrowTransaction(escrow=escrow, kind=EscrowTransaction.KIND_OPENING, amount=escrow.balance,
+                                  note="Opening balance")
+                for escrow in escrows if escrow.balance
+            ],
+            batch_size=1000,
+        )
+
+        payments = []
+        for loan, history in zip(loans, histories):
+            for payment in history:
+                payment.loan_id = loan.pk
+                payments.append(payment)
+        Payment.objects.bulk_create(payments, batch_size=2000)
+
+        counts["customers"] += len(customers)
+        counts["loans"] += len(loans)
+        counts["escrows"] += len(escrows)
+        counts["payments"] += len(payments)
+
+    def _synthetic_loan(self, rng, customer, as_of, max_payments):
+        """An unsaved Loan with balances/stats already reflecting its (unsaved) payment history."""
+        _, (low, high), (rate_low, rate_high), terms = rng.choices(
+            LOAN_PRODUCTS, weights=[p[0] for p in LOAN_PRODUCTS]
+        )[0]
+        principal = Decimal(rng.randint(low // 100, high // 100) * 100).quantize(Decimal("0.01"))
+        rate = Decimal(f"{rng.uniform(rate_low, rate_high):.2f}")
+        term = rng.choice(terms)
+        age = rng.randint(0, min(term, MAX_HISTORY_MONTHS))
+        start = add_months(as_of, -age)
+
+        months = min(age, term, max_payments)
+        defaulted = rng.random() < DEFAULT_RATE
+        if defaulted:
+            months = rng.randint(0, months)
+        payoff_at = rng.randint(1, months) if months and not defaulted and rng.random() < EARLY_PAYOFF_RATE else None
+
+        emi = amortization.emi(principal, rate, term)
+        balance = principal
+        interest_paid = Decimal("0.00")
+        total_paid = Decimal("0.00")
+        history = []
+        for period in range(1, months + 1):
+            interest = amortization.interest_for(balance, rate)
+            principal_part = balance if period == payoff_at or period == term else min(emi - interest, balance)
+            paid_on = add_months(start, period)
+            history.append(Payment(
+                amount=principal_part + interest,
+                payment_date=paid_on,
+                note=f"Processed | Principal: {principal_part:.2f}, Interest: {interest:.2f}",
+                principal_component=principal_part,
+                interest_component=interest,
+                processed_at=timezone.make_aware(datetime.combine(paid_on, dt_time(9))),
+            ))
+            balance -= principal_part
+            interest_paid += interest
+            total_paid += principal_part + interest
+            if balance <= 0:
+                break
+
+        if balance <= 0:
+            status = Loan.STATUS_PAID_OFF
+        elif defaulted:
+            status = Loan.STATUS_DEFAULTED
+        else:
+            status = Loan.STATUS_ACTIVE
+        loan = Loan(
+            customer=customer,
+            principal_amount=principal,
+            annual_interest_rate=rate,
+            term_months=term,
+            start_date=start,
+            status=status,
+            outstanding_principal=balance,
+            total_interest_paid=interest_paid,
+            paid_off_date=history[-1].payment_date if status == Loan.STATUS_PAID_OFF else None,
+            payments_count=len(history),
+            total_paid=total_paid,
+            last_payment_date=history[-1].payment_date if history else None,
+        )
+        return loan, history
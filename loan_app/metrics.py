@@ -0,0 +1,154 @@
+# loan_app/metrics.py
+"""
+In-process request metrics for PerformanceMiddleware and GET /api/metrics/.
+
+Per (view, method) we keep a latency histogram plus running totals of DB queries, DB
+time, serializer time and requests with repeated queries (likely N+1s). Totals live in
+this process only -- with several workers each one reports its own, which Prometheus
+sums when scraping them individually.
+
+Serializer time is collected by TimedRepresentationMixin: the outermost to_representation
+call of a serializer adds its duration to the current request's RequestStats.
+"""
+import contextvars
+import threading
+import time
+from collections import Counter, defaultdict
+
+# seconds; Prometheus' default buckets cut off at 10s too
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = contextvars.ContextVar("loan_app_request_stats", default=None)
+
+
+class RequestStats:
+    """What one request did: queries (by SQL template), DB time and serializer time."""
+
+    def __init__(self):
+        self.view = None
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.statements = Counter()
+        self._serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook. Async requests sharing one sync thread share its
+        # connection and so each other's wrappers: count only this request's queries.
+        current = _current.get()
+        if current is not None and current is not self:
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - started
+            self.queries += 1
+            self.statements[sql] += 1
+
+    def repeated_statements(self, threshold):
+        """[(sql, count)] for statements run at least `threshold` times, most repeated first."""
+        return [(sql, count) for sql, count in self.statements.most_common() if count >= threshold]
+
+
+def start_request():
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+class TimedRepresentationMixin:
+    """Adds the serializer's to_representation time to the current request's stats."""
+
+    def to_representation(self, instance):
+        stats = _current.get()
+        if stats is None or stats._serializing:
+            return super().to_representation(instance)
+        stats._serializing = True
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            stats.serializer_seconds += time.perf_counter() - started
+            stats._serializing = False
+
+
+class _Series:
+    __slots__ = ("buckets", "count", "latency_sum", "queries", "db_seconds", "serializer_seconds", "repeated")
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.latency_sum = 0.0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.repeated = 0
+
+
+_lock = threading.Lock()
+_series = defaultdict(_Series)
+
+
+def observe(view, method, latency, stats, repeated=False):
+    with _lock:
+        series = _series[(view, method)]
+        series.count += 1
+        series.latency_sum += latency
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                series.buckets[i] += 1
+        series.queries += stats.queries
+        series.db_seconds += stats.db_seconds
+        series.serializer_seconds += stats.serializer_seconds
+        series.repeated += int(repeated)
+
+
+def reset():
+    with _lock:
+        _series.clear()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(view, method, **extra):
+    pairs = {"view": view, "method": method, **extra}
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in pairs.items())
+
+
+def render_prometheus() -> str:
+    """All series in the Prometheus text exposition format (version 0.0.4)."""
+    with _lock:
+        snapshot = sorted(
+            ((key, (list(s.buckets), s.count, s.latency_sum, s.queries, s.db_seconds, s.serializer_seconds, s.repeated))
+             for key, s in _series.items()),
+        )
+
+    lines = [
+        "# HELP loan_app_request_duration_seconds Request latency per view and method.",
+        "# TYPE loan_app_request_duration_seconds histogram",
+    ]
+    for (view, method), (buckets, count, latency_sum, *_rest) in snapshot:
+        for bound, hits in zip(LATENCY_BUCKETS, buckets):
+            lines.append(f"loan_app_request_duration_seconds_bucket{{{_labels(view, method, le=bound)}}} {hits}")
+        lines.append(f'loan_app_request_duration_seconds_bucket{{{_labels(view, method, le="+Inf")}}} {count}')
+        lines.append(f"loan_app_request_duration_seconds_sum{{{_labels(view, method)}}} {latency_sum:.6f}")
+        lines.append(f"loan_app_request_duration_seconds_count{{{_labels(view, method)}}} {count}")
+
+    counters = [
+        ("loan_app_db_queries_total", "DB queries issued by requests.", 3, "{}"),
+        ("loan_app_db_query_seconds_total", "Time spent in DB queries.", 4, "{:.6f}"),
+        ("loan_app_serializer_seconds_total", "Time spent in serializer to_representation.", 5, "{:.6f}"),
+        ("loan_app_repeated_query_requests_total", "Requests that repeated one SQL statement past the threshold (likely N+1).", 6, "{}"),
+    ]
+    for name, help_text, index, fmt in counters:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for (view, method), values in snapshot:
+            lines.append(f"{name}{{{_labels(view, method)}}} {fmt.format(values[index])}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,117 @@
+# loan_app/middleware.py
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+
+logger = logging.getLogger("loan_app.performance")
+
+
+def view_label(view_func, method):
+    """'LoanViewSet.summaries' for DRF viewset actions, the class/function name otherwise."""
+    cls = getattr(view_func, "cls", None)
+    actions = getattr(view_func, "actions", None)
+    if cls is not None and actions:
+        return f"{cls.__name__}.{actions.get(method.lower(), method.lower())}"
+    if cls is not None:
+        return cls.__name__
+    return getattr(view_func, "__name__", "unknown")
+
+
+def _wrap_connections(stack, stats):
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(stats))
+
+
+class PerformanceMiddleware:
+    """
+    Per-request DB query count/time, serializer time and total latency.
+
+    - Adds a Server-Timing header (db, ser, total) to every response.
+    - Aggregates per view/action into loan_app.metrics (served at /api/metrics/).
+    - Logs a warning on "loan_app.performance" when a request exceeds
+      PERF_QUERY_BUDGET queries or PERF_LATENCY_BUDGET_MS, or runs one SQL statement
+      PERF_REPEATED_QUERY_THRESHOLD times or more (the usual N+1 signature).
+
+    Queries issued while a StreamingHttpResponse is consumed happen after the view
+    returns and are not counted.
+
+    Async-capable, so under ASGI the async views (loan_app.async_views) are not pushed
+    through a thread. Connections are per thread there: the wrappers are installed on
+    the request's thread-sensitive executor, which runs both the async ORM's queries and
+    any sync view.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self.query_budget = getattr(settings, "PERF_QUERY_BUDGET", 0)
+        self.latency_budget = getattr(settings, "PERF_LATENCY_BUDGET_MS", 0) / 1000
+        self.repeat_threshold = getattr(settings, "PERF_REPEATED_QUERY_THRESHOLD", 5)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats, token = metrics.start_request()
+        request._perf_stats = stats
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                _wrap_connections(stack, stats)
+                response = self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        return self._record(request, response, stats, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        stats, token = metrics.start_request()
+        request._perf_stats = stats
+        started = time.perf_counter()
+        try:
+            stack = ExitStack()
+            await sync_to_async(_wrap_connections)(stack, stats)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            metrics.end_request(token)
+        return self._record(request, response, stats, time.perf_counter() - started)
+
+    def _record(self, request, response, stats, latency):
+        response["Server-Timing"] = (
+            f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries", '
+            f"ser;dur={stats.serializer_seconds * 1000:.1f}, "
+            f"total;dur={latency * 1000:.1f}"
+        )
+
+        view = stats.view or "unresolved"
+        repeated = stats.repeated_statements(self.repeat_threshold) if self.repeat_threshold else []
+        metrics.observe(view, request.method, latency, stats, repeated=bool(repeated))
+
+        over_queries = self.query_budget and stats.queries > self.query_budget
+        over_latency = self.latency_budget and latency > self.latency_budget
+        if over_queries or over_latency or repeated:
+            logger.warning(
+                "%s %s (%s): %.1fms, %d queries (%.1fms db), %.1fms serializing%s",
+                request.method, request.path, view, latency * 1000, stats.queries,
+                stats.db_seconds * 1000, stats.serializer_seconds * 1000,
+                "".join(f"\n  repeated x{count}: {sql[:200]}" for sql, count in repeated[:3]),
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = getattr(request, "_perf_stats", None)
+        if stats is not None:
+            stats.view = view_label(view_func, request.method)
+        return None
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:56
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+
+
+def backfill_payment_stats(apps, schema_editor):
+    Loan = apps.get_model("loan_app", "Loan")
+    Payment = apps.get_model("loan_app", "Payment")
+    rows = Payment.objects.values("loan_id").annotate(count=Count("id"), total=Sum("amount"), last=Max("payment_date"))
+    loans = [
+        Loan(pk=row["loan_id"], payments_count=row["count"], total_paid=row["total"], last_payment_date=row["last"])
+        for row in rows
+    ]
+    Loan.objects.bulk_update(loans, ["payments_count", "total_paid", "last_payment_date"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loan_app', '0004_payment_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='last_payment_date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='payments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='total_paid',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=14),
+        ),
+        migrations.RunPython(backfill_payment_stats, migrations.RunPython.noop),
+    ]
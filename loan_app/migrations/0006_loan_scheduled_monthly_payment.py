@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:59
+
+from decimal import Decimal, ROUND_HALF_UP
+from django.db import migrations, models
+
+
+def _emi(principal, annual_rate, term_months):
+    # frozen copy of amortization.emi() as of this migration: history must not follow later edits
+    principal = Decimal(principal or 0)
+    annual_rate, term_months = Decimal(str(annual_rate or 0)), max(1, int(term_months or 0))
+    if annual_rate == 0:
+        payment = principal / Decimal(term_months)
+    else:
+        r = annual_rate / Decimal("100") / Decimal("12")
+        growth = (1 + r) ** term_months
+        payment = principal * (r * growth) / (growth - 1)
+    return payment.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+def backfill_scheduled_payment(apps, schema_editor):
+    Loan = apps.get_model("loan_app", "Loan")
+    batch = []
+    rows = Loan.objects.values_list("id", "principal_amount", "annual_interest_rate", "term_months")
+    for loan_id, principal, rate, term in rows.iterator(chunk_size=1000):
+        batch.append(Loan(pk=loan_id, scheduled_monthly_payment=_emi(principal, rate, term)))
+        if len(batch) >= 1000:
+            Loan.objects.bulk_update(batch, ["scheduled_monthly_payment"])
+            batch = []
+    Loan.objects.bulk_update(batch, ["scheduled_monthly_payment"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loan_app', '0005_loan_payment_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='scheduled_monthly_payment',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=12),
+        ),
+        migrations.RunPython(backfill_scheduled_payment, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:02
+
+from django.db import migrations, models
+from django.db.models import F, Q
+
+
+def backfill_processed_at(apps, schema_editor):
+    # payments already split by mark_processed or created by the auto-EMI runs
+    Payment = apps.get_model("loan_app", "Payment")
+    Payment.objects.filter(
+        Q(note__startswith="Processed |") | Q(note__startswith="Auto EMI via Celery"),
+        processed_at__isnull=True,
+    ).update(processed_at=F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loan_app', '0007_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='processed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_processed_at, migrations.RunPython.noop),
+    ]
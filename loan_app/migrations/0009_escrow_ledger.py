@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_opening_balances(apps, schema_editor):
+    # existing balances become the first ledger entry, so ledger sums match from day one
+    EscrowAccount = apps.get_model("loan_app", "EscrowAccount")
+    EscrowTransaction = apps.get_model("loan_app", "EscrowTransaction")
+    batch = []
+    for escrow_id, balance in EscrowAccount.objects.exclude(balance=0).values_list("id", "balance").iterator():
+        batch.append(EscrowTransaction(escrow_id=escrow_id, kind="OPENING", amount=balance, note="Opening balance"))
+        if len(batch) == 500:
+            EscrowTransaction.objects.bulk_create(batch)
+            batch = []
+    EscrowTransaction.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loan_app', '0008_payment_processed_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EscrowTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('OPENING', 'Opening balance'), ('DEPOSIT', 'Deposit'), ('DISBURSEMENT', 'Disbursement')], max_length=12)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('note', models.CharField(blank=True, max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('escrow', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transactions', to='loan_app.escrowaccount')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['escrow', 'id'], name='escrow_txn_escrow_idx')],
+            },
+        ),
+        migrations.RunPython(create_opening_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:28
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loan_app', '0010_loan_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PortfolioSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('outstanding_principal', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16)),
+                ('total_interest_paid', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16)),
+                ('payments_count', models.PositiveIntegerField(default=0)),
+                ('amount_collected', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16)),
+                ('principal_collected', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16)),
+                ('interest_collected', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16)),
+                ('active_loans', models.PositiveIntegerField(default=0)),
+                ('paid_off_loans', models.PositiveIntegerField(default=0)),
+                ('defaulted_loans', models.PositiveIntegerField(default=0)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+    ]
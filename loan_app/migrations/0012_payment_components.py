@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:32
+
+import re
+from decimal import Decimal
+
+from django.db import migrations, models
+
+# "Processed | Principal: 1.00, Interest: 2.00" and "Auto EMI via Celery | principal=1.00 interest=2.00"
+NOTE_SPLIT = re.compile(r"principal[:=]\s*(-?\d+(?:\.\d+)?)\W+interest[:=]\s*(-?\d+(?:\.\d+)?)", re.IGNORECASE)
+BATCH_SIZE = 2000
+
+
+def backfill_components(apps, schema_editor):
+    # the split of every processed payment, parsed once from the note it was recorded in
+    Payment = apps.get_model("loan_app", "Payment")
+    pending = Payment.objects.filter(processed_at__isnull=False, principal_component__isnull=True).only("id", "note")
+    last_id = 0
+    while True:
+        chunk = list(pending.filter(id__gt=last_id).order_by("id")[:BATCH_SIZE])
+        if not chunk:
+            return
+        last_id = chunk[-1].id
+        parsed = []
+        for payment in chunk:
+            match = NOTE_SPLIT.search(payment.note or "")
+            if match is not None:
+                payment.principal_component = Decimal(match.group(1))
+                payment.interest_component = Decimal(match.group(2))
+                parsed.append(payment)
+        Payment.objects.bulk_update(parsed, ["principal_component", "interest_component"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loan_app', '0011_portfolio_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='interest_component',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='principal_component',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=12, null=True),
+        ),
+        migrations.RunPython(backfill_components, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loan_app', '0012_payment_components'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoanCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('outstanding_principal', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('total_interest_paid', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('status', models.CharField(choices=[('ACTIVE', 'Active'), ('PAID_OFF', 'Paid Off'), ('DEFAULTED', 'Defaulted')], max_length=20)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('loan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='loan_app.loan')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('loan', 'date'), name='loan_checkpoint_unique')],
+            },
+        ),
+    ]
@@ -12,17 +12,162 @@ class Customer(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # list endpoints: cursor paging on (created_at, id)
+            models.Index(fields=["created_at", "id"], name="customer_created_idx"),
+        ]
+
     def __str__(self) -> str:
         return f"{self.full_name} ({self.email})"
 
 
 # loan_app/models.py
 from datetime import date
-from decimal import Decimal, ROUND_HALF_UP
+from decimal import Decimal
 
 from django.db import models
+from django.db.models import Case, Count, F, Max, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
 from django.utils import timezone
 
+from . import amortization
+
+
+def _as_date(value):
+    # DateField defaults of timezone.now leave a datetime on unsaved instances
+    return timezone.localdate(value) if hasattr(value, "hour") else value
+
+
+def _invalidate_portfolio_facts():
+    from . import portfolio
+
+    portfolio.invalidate("loans")
+
+
+class LoanQuerySet(models.QuerySet):
+    # Queryset writes send no post_save, so every one of them drops the cached portfolio
+    # facts itself (bulk_update runs through update()); Loan.save() is covered by signals.
+
+    # ---- scheduled_monthly_payment is derived from these; keep it current on bulk writes ----
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for loan in objs:
+            loan.refresh_scheduled_payment()
+        created = super().bulk_create(objs, *args, **kwargs)
+        _invalidate_portfolio_facts()
+        return created
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        if not set(fields) & set(Loan.SCHEDULE_SOURCE_FIELDS):
+            return super().bulk_update(objs, fields, *args, **kwargs)
+        # recompute from the stored rows: terms not listed in `fields` may be stale in memory
+        objs = list(objs)
+        rows = super().bulk_update(objs, fields, *args, **kwargs)
+        self.model.objects.filter(pk__in=[loan.pk for loan in objs]).recompute_scheduled_payments()
+        return rows
+
+    def update(self, **kwargs):
+        # every write to a loan row makes its cached reads stale (see loan_app.loan_cache)
+        kwargs.setdefault("version", F("version") + 1)
+        if not set(kwargs) & set(Loan.SCHEDULE_SOURCE_FIELDS):
+            rows = super().update(**kwargs)
+        else:
+            # the filter may stop matching once updated, so pin the rows first
+            pks = list(self.values_list("pk", flat=True))
+            rows = super().update(**kwargs)
+            self.model.objects.filter(pk__in=pks).recompute_scheduled_payments()
+        # ... and the balances/status counts/EMI totals cached from them
+        _invalidate_portfolio_facts()
+        return rows
+
+    def bump_version(self):
+        """Mark these loans' cached reads stale, e.g. after a write to a related row (escrow)."""
+        return self.update(version=F("version") + 1)
+
+    def recompute_scheduled_payments(self, chunk_size=1000):
+        """Rewrite scheduled_monthly_payment for every loan in this queryset from its terms."""
+        columns = ("id", "principal_amount", "annual_interest_rate", "term_months")
+        batch = []
+        updated = 0
+        for loan_id, principal, rate, term in self.values_list(*columns).iterator(chunk_size=chunk_size):
+            batch.append(Loan(pk=loan_id, scheduled_monthly_payment=amortization.emi(principal, rate, term)))
+            if len(batch) >= chunk_size:
+                updated += self.model.objects.bulk_update(batch, ["scheduled_monthly_payment"])
+                batch = []
+        if batch:
+            updated += self.model.objects.bulk_update(batch, ["scheduled_monthly_payment"])
+        return updated
+
+    def add_payment_stats(self, payments):
+        """
+        Fold newly inserted payments into the stored per-loan aggregates with one UPDATE.
+        For bulk paths (bulk_create skips the post_save signal that does this per row).
+        The counters are applied as F() increments, so concurrent writers do not lose updates.
+        """
+        deltas = {}
+        for payment in payments:
+            count, total, last = deltas.get(payment.loan_id, (0, Decimal("0.00"), None))
+            paid_on = _as_date(payment.payment_date)
+            deltas[payment.loan_id] = (count + 1, total + payment.amount, max(last or paid_on, paid_on))
+
+        loans = []
+        for loan_id, (count, total, last) in deltas.items():
+            loan = Loan(pk=loan_id)
+            loan.payments_count = F("payments_count") + count
+            loan.total_paid = F("total_paid") + total
+            last = Value(last, output_field=models.DateField())
+            loan.last_payment_date = Greatest(Coalesce("last_payment_date", last), last)
+            loans.append(loan)
+        if loans:
+            self.model.objects.bulk_update(loans, Loan.PAYMENT_STATS_FIELDS, batch_size=500)
+
+    def apply_allocation(self, principal_component, interest_component, paid_on=None):
+        """
+        Apply a processed payment's split to every loan in this queryset in one UPDATE.
+
+        Balances are adjusted with F() expressions and the clamp-at-zero / PAID_OFF flip
+        of Loan.save() is done with Case/When on the row's current values, so concurrent
+        allocations never overwrite each other.
+        """
+        principal_component = Decimal(principal_component or 0).quantize(Decimal("0.01"))
+        interest_component = Decimal(interest_component or 0).quantize(Decimal("0.01"))
+        clears = Q(outstanding_principal__lte=principal_component)
+        return self.update(
+            total_interest_paid=F("total_interest_paid") + interest_component,
+            outstanding_principal=Case(
+                When(clears, then=Value(Decimal("0.00"))),
+                default=F("outstanding_principal") - principal_component,
+            ),
+            status=Case(When(clears, then=Value(Loan.STATUS_PAID_OFF)), default=F("status")),
+            paid_off_date=Case(
+                When(clears & Q(paid_off_date__isnull=True), then=Value(paid_on or date.today())),
+                default=F("paid_off_date"),
+            ),
+        )
+
+    def actual_payment_stats(self) -> dict:
+        """{loan_id: (count, total, last payment date)} from the Payment table, for loans with payments."""
+        rows = (
+            Payment.objects.filter(loan__in=self.values("pk"))
+            .values("loan_id")
+            .annotate(count=Count("id"), total=Sum("amount"), last=Max("payment_date"))
+        )
+        # SQLite sums decimals as floats; quantize like the stored column
+        return {row["loan_id"]: (row["count"], amortization.to_cents(row["total"] or 0), row["last"]) for row in rows}
+
+    def refresh_payment_stats(self):
+        """Recompute the stored aggregates of every loan in this queryset from the Payment table."""
+        actual = self.actual_payment_stats()
+        loans = []
+        for loan in self.only("id"):
+            loan.payments_count, loan.total_paid, loan.last_payment_date = actual.get(
+                loan.id, (0, Decimal("0.00"), None)
+            )
+            loans.append(loan)
+        self.model.objects.bulk_update(loans, Loan.PAYMENT_STATS_FIELDS, batch_size=500)
+        return len(loans)
+
 
 class Loan(models.Model):
     # ---- Status constants/choices ----
@@ -48,6 +193,33 @@ class Loan(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     outstanding_principal = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
     total_interest_paid = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    # EMI on original principal/rate/term; stored so it can be filtered, sorted and summed in SQL
+    scheduled_monthly_payment = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00"), editable=False, db_index=True
+    )
+    SCHEDULE_SOURCE_FIELDS = ["principal_amount", "annual_interest_rate", "term_months"]
+
+    # ---- Payment aggregates (maintained by signals / bulk paths, never by Loan.save) ----
+    payments_count = models.PositiveIntegerField(default=0, editable=False)
+    total_paid = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"), editable=False)
+    last_payment_date = models.DateField(null=True, blank=True, editable=False)
+    PAYMENT_STATS_FIELDS = ["payments_count", "total_paid", "last_payment_date"]
+
+    # Bumped by every write to the row (save(), LoanQuerySet.update/bulk_update) and by
+    # escrow postings; cached summaries/previews/details are keyed on it.
+    version = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = LoanQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # list endpoints: cursor paging on (created_at, id)
+            models.Index(fields=["created_at", "id"], name="loan_created_idx"),
+            # status-filtered lists / dashboards, newest first
+            models.Index(fields=["status", "created_at"], name="loan_status_created_idx"),
+            # batched/sharded EMI runs: keyset chunks of ACTIVE loans by id
+            models.Index(fields=["status", "id"], name="loan_status_id_idx"),
+        ]
 
     # ---------- Helpers ----------
     def __str__(self) -> str:
@@ -56,41 +228,33 @@ class Loan(models.Model):
     @property
     def monthly_interest_rate(self) -> Decimal:
         """Annual % -> monthly decimal rate, e.g. 6.50 -> 0.065/12"""
-        return (Decimal(self.annual_interest_rate) / Decimal("100")) / Decimal("12")
+        return amortization.monthly_rate(self.annual_interest_rate)
 
-    @property
-    def scheduled_monthly_payment(self) -> Decimal:
+    def refresh_scheduled_payment(self):
         """
         Classic amortization formula (P * r * (1+r)^n) / ((1+r)^n - 1).
         If r == 0 → principal/term.
         """
-        P = Decimal(self.principal_amount)
-        n = Decimal(self.term_months if self.term_months else 1)
-        r = self.monthly_interest_rate
-        if r == 0:
-            return (P / n).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-        top = P * r * (1 + r) ** n
-        bottom = (1 + r) ** n - 1
-        return (top / bottom).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        self.scheduled_monthly_payment = amortization.emi(
+            self.principal_amount, self.annual_interest_rate, self.term_months
+        )
+        return self.scheduled_monthly_payment
 
     def apply_allocation(self, principal_component: Decimal, interest_component: Decimal):
         """
         Small utility to apply a processed payment's split to this loan safely.
         Call this from your view/Celery after you've computed principal/interest for a payment.
+        The write is a single atomic UPDATE (see LoanQuerySet.apply_allocation).
         """
-        principal_component = Decimal(principal_component or 0).quantize(Decimal("0.01"))
-        interest_component = Decimal(interest_component or 0).quantize(Decimal("0.01"))
-
-        self.total_interest_paid = (self.total_interest_paid or Decimal("0.00")) + interest_component
-        self.outstanding_principal = (self.outstanding_principal or Decimal("0.00")) - principal_component
-        self.save(update_fields=["total_interest_paid", "outstanding_principal", "status", "paid_off_date"])
+        Loan.objects.filter(pk=self.pk).apply_allocation(principal_component, interest_component)
+        self.refresh_from_db(fields=["total_interest_paid", "outstanding_principal", "status", "paid_off_date"])
 
     # ---------- Status/guard logic ----------
-    def save(self, *args, **kwargs):
-        # Initialize outstanding on first save
-        if self.pk is None and (self.outstanding_principal is None or self.outstanding_principal == 0):
-            self.outstanding_principal = self.principal_amount
-
+    def apply_balance_guards(self):
+        """
+        Clamp the balance and flip status/paid_off_date to match it.
+        Runs on every save(); bulk paths call it directly since bulk_update skips save().
+        """
         # Normalize & clamp negative balances
         if self.outstanding_principal is None:
             self.outstanding_principal = Decimal("0.00")
@@ -109,7 +273,37 @@ class Loan(models.Model):
                 self.status = self.STATUS_ACTIVE
                 self.paid_off_date = None
 
+    def save(self, *args, **kwargs):
+        # Initialize outstanding on first save
+        if self.pk is None and (self.outstanding_principal is None or self.outstanding_principal == 0):
+            self.outstanding_principal = self.principal_amount
+
+        self.apply_balance_guards()
+        if not set(self.SCHEDULE_SOURCE_FIELDS) & self.get_deferred_fields():
+            self.refresh_scheduled_payment()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and set(update_fields) & set(self.SCHEDULE_SOURCE_FIELDS):
+            kwargs["update_fields"] = [*update_fields, "scheduled_monthly_payment"]
+
+        bump = not self._state.adding and not kwargs.get("force_insert")
+        if bump:
+            # incremented in SQL, so a stale copy cannot write back an old version number
+            self.version = F("version") + 1
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = [*kwargs["update_fields"], "version"]
+
+        # A stale in-memory copy must not overwrite payment aggregates bumped in the DB since
+        # it was loaded, so plain saves of existing rows leave those columns alone.
+        if not self._state.adding and kwargs.get("update_fields") is None and not kwargs.get("force_insert"):
+            skip = set(self.PAYMENT_STATS_FIELDS) | self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.attname not in skip and f.name not in skip
+            ]
         super().save(*args, **kwargs)
+        if bump:
+            # drop the F() expression; the new value is loaded on first access
+            del self.__dict__["version"]
 
 
 class EscrowAccount(models.Model):
@@ -117,18 +311,143 @@ class EscrowAccount(models.Model):
     balance = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # list endpoints: cursor paging on (created_at, id)
+            models.Index(fields=["created_at", "id"], name="escrow_created_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remembered so post_save can also mark the loan an account is moved away from
+        instance._loan_snapshot = instance.__dict__.get("loan_id")
+        return instance
+
     def __str__(self) -> str:
         return f"Escrow for Loan #{self.loan_id}"
 
 
+class EscrowTransaction(models.Model):
+    """
+    Append-only ledger of escrow movements. `amount` is signed (deposits positive,
+    disbursements negative), so an account's balance is the sum of its entries.
+    Written only through loan_app.escrow, together with the matching balance UPDATE.
+    """
+    KIND_OPENING = "OPENING"
+    KIND_DEPOSIT = "DEPOSIT"
+    KIND_DISBURSEMENT = "DISBURSEMENT"
+    KIND_CHOICES = [
+        (KIND_OPENING, "Opening balance"),
+        (KIND_DEPOSIT, "Deposit"),
+        (KIND_DISBURSEMENT, "Disbursement"),
+    ]
+
+    escrow = models.ForeignKey(EscrowAccount, on_delete=models.CASCADE, related_name="transactions")
+    kind = models.CharField(max_length=12, choices=KIND_CHOICES)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    note = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # an account's history and its balance-from-ledger sum
+            models.Index(fields=["escrow", "id"], name="escrow_txn_escrow_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None and not self._state.adding:
+            raise ValueError("Escrow ledger entries are append-only")
+        super().save(*args, **kwargs)
+
+    def __str__(self) -> str:
+        return f"{self.kind} {self.amount} (escrow #{self.escrow_id})"
+
+
 class Payment(models.Model):
     loan = models.ForeignKey(Loan, on_delete=models.CASCADE, related_name="payments")
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     payment_date = models.DateField(default=timezone.now)
     note = models.CharField(max_length=200, blank=True)
+    # Set once the payment's split has been applied to the loan; processing is a no-op afterwards
+    processed_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # The split applied to the loan, written together with processed_at (NULL until then)
+    principal_component = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, editable=False)
+    interest_component = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, editable=False)
+    # Set by automated runs (e.g. "emi:<loan_id>:<date>") so a retried run cannot charge twice
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True, unique=True, editable=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # list endpoints: cursor paging on (created_at, id)
+            models.Index(fields=["created_at", "id"], name="payment_created_idx"),
+            # a loan's payment history by date (summaries/stats recompute, replay)
+            models.Index(fields=["loan", "payment_date"], name="payment_loan_date_idx"),
+            # portfolio-wide "recent payments" and per-day rollups
+            models.Index(fields=["payment_date", "id"], name="payment_date_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remembered so post_save can tell whether the loan's aggregates need recomputing
+        instance._stats_snapshot = (instance.__dict__.get("loan_id"), instance.__dict__.get("amount"),
+                                    instance.__dict__.get("payment_date"))
+        return instance
+
     def __str__(self) -> str:
         return f"Payment {self.amount} for Loan #{self.loan_id} on {self.payment_date}"
 
+
+
+class PortfolioSnapshot(models.Model):
+    """
+    One row per day of book-level totals, maintained by loan_app.snapshots (daily task,
+    after EMI runs, backfill_snapshots command) so trend charts read precomputed rows
+    instead of aggregating Loan and Payment.
+
+    Balances and status counts are as of the end of `date`; the *_collected columns and
+    payments_count cover payments dated `date`.
+    """
+    date = models.DateField(unique=True)
+    outstanding_principal = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal("0.00"))
+    total_interest_paid = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal("0.00"))
+    payments_count = models.PositiveIntegerField(default=0)
+    amount_collected = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal("0.00"))
+    principal_collected = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal("0.00"))
+    interest_collected = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal("0.00"))
+    active_loans = models.PositiveIntegerField(default=0)
+    paid_off_loans = models.PositiveIntegerField(default=0)
+    defaulted_loans = models.PositiveIntegerField(default=0)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["date"]
+
+    def __str__(self) -> str:
+        return f"Portfolio snapshot {self.date}"
+
+
+class LoanCheckpoint(models.Model):
+    """
+    A loan's balance, interest paid and status at the end of `date` (after every payment
+    dated on or before it), written monthly by loan_app.checkpoints so point-in-time
+    lookups replay at most the payments since the nearest earlier checkpoint.
+    """
+    loan = models.ForeignKey(Loan, on_delete=models.CASCADE, related_name="checkpoints")
+    date = models.DateField()
+    outstanding_principal = models.DecimalField(max_digits=12, decimal_places=2)
+    total_interest_paid = models.DecimalField(max_digits=12, decimal_places=2)
+    status = models.CharField(max_length=20, choices=Loan.STATUS_CHOICES)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # also the (loan, date) index the "latest checkpoint on or before" lookups seek on
+            models.UniqueConstraint(fields=["loan", "date"], name="loan_checkpoint_unique"),
+        ]
+
+    def __str__(self) -> str:
+        return f"Loan #{self.loan_id} checkpoint {self.date}"
@@ -0,0 +1,19 @@
+# loan_app/pagination.py
+from rest_framework.pagination import CursorPagination
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Newest-first cursor paging for the list endpoints.
+
+    DRF encodes only the first ordering field: the cursor holds a created_at position
+    plus an offset counting the rows after it that share their created_at. Page N is
+    an indexed range scan (WHERE created_at < ? ORDER BY created_at DESC, id DESC
+    LIMIT ? OFFSET ?) whose offset is bounded by the size of one run of tied timestamps,
+    not by how deep a client pages. "-id" only makes the order of ties deterministic;
+    it is not part of the cursor.
+    """
+    ordering = ("-created_at", "-id")
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
@@ -0,0 +1,137 @@
+# loan_app/portfolio.py
+"""
+Portfolio-wide facts (customer count, loan status counts, outstanding principal,
+monthly EMI total) for ai_query and dashboards.
+
+Facts are computed per group -- each group is one query -- and cached in Django's cache
+framework. Loan/Customer/Payment signals and every LoanQuerySet write (update,
+bulk_update, bulk_create) drop the affected groups, so the next reader recomputes only
+what changed.
+
+aget_facts() / arecent_payments() are the async twins (async ORM); missing groups are
+computed concurrently there.
+"""
+import asyncio
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from . import amortization
+from .models import Customer, Loan, Payment
+
+CACHE_PREFIX = "loan_app:portfolio:"
+# Safety net only; signals invalidate on every relevant write.
+CACHE_TIMEOUT = 60 * 60
+
+
+def _customer_facts():
+    return {"customers": Customer.objects.count()}
+
+
+def _loan_aggregates():
+    # all status counts + outstanding in one conditional aggregate
+    return {
+        "active_loans": Count("id", filter=Q(status=Loan.STATUS_ACTIVE)),
+        "paid_off_loans": Count("id", filter=Q(status=Loan.STATUS_PAID_OFF)),
+        "defaulted_loans": Count("id", filter=Q(status=Loan.STATUS_DEFAULTED)),
+        "outstanding_principal": Sum("outstanding_principal"),
+        "monthly_emi_total": Sum("scheduled_monthly_payment", filter=Q(status=Loan.STATUS_ACTIVE)),
+    }
+
+
+def _money_facts(agg):
+    for name in ("outstanding_principal", "monthly_emi_total"):
+        agg[name] = amortization.to_cents(agg[name] or 0)
+    return agg
+
+
+def _loan_facts():
+    return _money_facts(Loan.objects.aggregate(**_loan_aggregates()))
+
+
+async def _acustomer_facts():
+    return {"customers": await Customer.objects.acount()}
+
+
+async def _aloan_facts():
+    return _money_facts(await Loan.objects.aaggregate(**_loan_aggregates()))
+
+
+FACT_GROUPS = {
+    "customers": _customer_facts,
+    "loans": _loan_facts,
+}
+ASYNC_FACT_GROUPS = {
+    "customers": _acustomer_facts,
+    "loans": _aloan_facts,
+}
+FACT_GROUP_OF = {
+    "customers": "customers",
+    "active_loans": "loans",
+    "paid_off_loans": "loans",
+    "defaulted_loans": "loans",
+    "outstanding_principal": "loans",
+    "monthly_emi_total": "loans",
+}
+
+
+def get_facts(*names):
+    """
+    {fact: value} for the requested fact names (all facts when none are given),
+    computing only the groups that are not already cached.
+    """
+    names = names or tuple(FACT_GROUP_OF)
+    groups = {FACT_GROUP_OF[name] for name in names}
+    cached = cache.get_many([CACHE_PREFIX + group for group in groups])
+
+    values = {}
+    fresh = {}
+    for group in groups:
+        group_values = cached.get(CACHE_PREFIX + group)
+        if group_values is None:
+            group_values = fresh[CACHE_PREFIX + group] = FACT_GROUPS[group]()
+        values.update(group_values)
+    if fresh:
+        cache.set_many(fresh, CACHE_TIMEOUT)
+    return {name: values[name] for name in names}
+
+
+async def aget_facts(*names):
+    """get_facts() for async callers: the uncached groups' queries run concurrently."""
+    names = names or tuple(FACT_GROUP_OF)
+    groups = sorted({FACT_GROUP_OF[name] for name in names})
+    cached = await cache.aget_many([CACHE_PREFIX + group for group in groups])
+
+    missing = [group for group in groups if CACHE_PREFIX + group not in cached]
+    computed = await asyncio.gather(*(ASYNC_FACT_GROUPS[group]() for group in missing))
+    fresh = {CACHE_PREFIX + group: group_values for group, group_values in zip(missing, computed)}
+    if fresh:
+        await cache.aset_many(fresh, CACHE_TIMEOUT)
+
+    values = {}
+    for group_values in (*cached.values(), *fresh.values()):
+        values.update(group_values)
+    return {name: values[name] for name in names}
+
+
+def invalidate(*groups):
+    """Drop cached fact groups (all when none given), now and again once the transaction commits."""
+    keys = [CACHE_PREFIX + group for group in (groups or FACT_GROUPS)]
+    cache.delete_many(keys)
+    # a reader between now and COMMIT could re-cache pre-commit values
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _recent_payments_queryset(limit):
+    return Payment.objects.order_by("-payment_date", "-id").values(
+        "id", "loan_id", "amount", "payment_date", "note"
+    )[:limit]
+
+
+def recent_payments(limit=5):
+    return list(_recent_payments_queryset(limit))
+
+
+async def arecent_payments(limit=5):
+    return [row async for row in _recent_payments_queryset(limit)]
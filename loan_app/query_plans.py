@@ -0,0 +1,72 @@
+# loan_app/query_plans.py
+"""
+EXPLAIN QUERY PLAN checks for the hot queries.
+
+Each entry in HOT_QUERIES builds the queryset a hot path actually runs. full_scan_report()
+explains them and returns every plan line that reads a whole table (a SCAN without an
+index) or sorts in a temp B-tree, so a test can fail when a change to a query or the
+indexes silently turns an indexed lookup into a table scan.
+
+SQLite only: other backends print plans in a different format, so there the report is
+None ("not checked") rather than {} ("no regressions").
+"""
+import re
+
+from django.db import connection
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from .models import Loan, Payment
+
+_FULL_SCAN = re.compile(r"\bSCAN (?!.*\bUSING (?:COVERING )?INDEX\b)")
+_TEMP_SORT = re.compile(r"USE TEMP B-TREE FOR (?:ORDER|GROUP) BY")
+
+# sample ids/timestamps only shape the SQL; plans do not depend on the values
+HOT_QUERIES = {
+    # list endpoints (CreatedAtCursorPagination): first page and a deep page
+    "payment_list_first_page": lambda: Payment.objects.order_by("-created_at", "-id")[:50],
+    "payment_list_deep_page": lambda: Payment.objects.filter(created_at__lt=timezone.now()).order_by("-created_at", "-id")[:50],
+    "loan_list_first_page": lambda: Loan.objects.order_by("-created_at", "-id")[:50],
+    "loan_list_by_status": lambda: Loan.objects.filter(status=Loan.STATUS_ACTIVE).order_by("-created_at")[:50],
+    # ai_query / portfolio.recent_payments
+    "recent_payments": lambda: Payment.objects.order_by("-payment_date", "-id")[:5],
+    # a loan's payment history and its stored-aggregate recompute
+    "loan_payment_history": lambda: Payment.objects.filter(loan_id=1).order_by("-payment_date")[:50],
+    "loan_payment_stats": lambda: Payment.objects.filter(loan_id=1).values("loan_id").order_by().annotate(
+        count=Count("id"), total=Sum("amount"), last=Max("payment_date")
+    ),
+    # batched/sharded EMI chunk reader
+    "active_loan_chunk": lambda: Loan.objects.filter(
+        status=Loan.STATUS_ACTIVE, outstanding_principal__gt=0, id__gt=0
+    ).order_by("id")[:500],
+    # streaming export of a payment date range
+    "payment_export_range": lambda: Payment.objects.filter(
+        payment_date__gte=timezone.now().date(), payment_date__lte=timezone.now().date()
+    ).order_by("payment_date", "id"),
+    # batch summaries (loan + escrow join)
+    "loan_summaries": lambda: Loan.objects.select_related("escrow").filter(pk__in=[1, 2, 3]).order_by("id"),
+}
+
+
+def explain(queryset) -> str:
+    return queryset.explain()
+
+
+def plan_problems(plan: str):
+    """Plan lines that scan a whole table or sort in a temp B-tree."""
+    return [line.strip() for line in plan.splitlines() if _FULL_SCAN.search(line) or _TEMP_SORT.search(line)]
+
+
+def full_scan_report(queries=None):
+    """
+    {query name: [offending plan lines]} for every hot query whose plan regressed, or
+    None on a backend other than SQLite, whose plans this module cannot read.
+    """
+    if connection.vendor != "sqlite":
+        return None
+    report = {}
+    for name, build in (queries or HOT_QUERIES).items():
+        problems = plan_problems(explain(build()))
+        if problems:
+            report[name] = problems
+    return report
@@ -1,19 +1,31 @@
 from rest_framework import serializers
-from .models import Customer, Loan, Payment, EscrowAccount
+from .metrics import TimedRepresentationMixin
+from .models import Customer, Loan, Payment, EscrowAccount, EscrowTransaction, PortfolioSnapshot
 from decimal import Decimal
 
 
-class CustomerSerializer(serializers.ModelSerializer):
+class SparseFieldsetMixin:
+    """
+    Honour ?fields=a,b,c on the request: every other field is dropped before
+    serialization, so computed columns the client does not want cost nothing.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        requested = request.query_params.get("fields") if request is not None and request.method == "GET" else None
+        if requested:
+            keep = {name.strip() for name in requested.split(",") if name.strip()}
+            for name in set(self.fields) - keep:
+                self.fields.pop(name)
+
+
+class CustomerSerializer(TimedRepresentationMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Customer
         fields = "__all__"
 
 
-class LoanSerializer(serializers.ModelSerializer):
-    scheduled_monthly_payment = serializers.DecimalField(
-        max_digits=12, decimal_places=2, read_only=True
-    )
-
+class LoanSerializer(TimedRepresentationMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Loan
         fields = [
@@ -28,22 +40,44 @@ class LoanSerializer(serializers.ModelSerializer):
             "total_interest_paid",
             "scheduled_monthly_payment",  
         ]
-        read_only_fields = ["created_at"]
-
-    def to_representation(self, instance):
-        data = super().to_representation(instance)
-        data["scheduled_monthly_payment"] = str(instance.scheduled_monthly_payment)
-        return data
+        read_only_fields = ["created_at", "scheduled_monthly_payment"]
 
 
-class EscrowSerializer(serializers.ModelSerializer):
+class EscrowSerializer(TimedRepresentationMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = EscrowAccount
         fields = "__all__"
-        read_only_fields = ["created_at"]
+        # balance moves only through ledger postings (loan_app.escrow)
+        read_only_fields = ["created_at", "balance"]
+
+
+class EscrowTransactionSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
+    class Meta:
+        model = EscrowTransaction
+        fields = ["id", "escrow", "kind", "amount", "note", "created_at"]
+        read_only_fields = fields
+
+
+class EscrowPostingSerializer(serializers.Serializer):
+    escrow = serializers.IntegerField(min_value=1)
+    kind = serializers.ChoiceField(choices=[EscrowTransaction.KIND_DEPOSIT, EscrowTransaction.KIND_DISBURSEMENT])
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2)
+    note = serializers.CharField(max_length=200, required=False, allow_blank=True, default="")
+
+    def validate_amount(self, value):
+        if value <= Decimal("0"):
+            raise serializers.ValidationError("Amount must be > 0")
+        return value
+
+
+class PortfolioSnapshotSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
+    class Meta:
+        model = PortfolioSnapshot
+        exclude = ["id"]
+        read_only_fields = [f.name for f in PortfolioSnapshot._meta.fields]
 
 
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(TimedRepresentationMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Payment
         fields = "__all__"
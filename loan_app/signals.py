@@ -1,6 +1,10 @@
-from django.db.models.signals import post_save
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from .models import Loan, EscrowAccount
+from . import portfolio
+from .models import Customer, Loan, EscrowAccount, Payment
 
 @receiver(post_save, sender=Loan)
 def create_escrow_for_new_loan(sender, instance: Loan, created, **kwargs):
@@ -8,4 +12,77 @@ def create_escrow_for_new_loan(sender, instance: Loan, created, **kwargs):
         EscrowAccount.objects.get_or_create(loan=instance)
 
 
-# auto-create escrow when a loan is created
\ No newline at end of file
+# auto-create escrow when a loan is created
+
+
+# keep Loan.payments_count / total_paid / last_payment_date in step with the Payment table
+@receiver(post_save, sender=Payment)
+def update_loan_payment_stats(sender, instance: Payment, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        Loan.objects.add_payment_stats([instance])
+        return
+
+    before = getattr(instance, "_stats_snapshot", None)
+    after = (instance.loan_id, instance.amount, instance.payment_date)
+    if before != after:
+        loan_ids = {instance.loan_id} | ({before[0]} if before else set())
+        Loan.objects.filter(pk__in=loan_ids).refresh_payment_stats()
+    instance._stats_snapshot = after
+
+
+# loans whose payments were deleted in the current transaction, refreshed once on commit
+_deleted_payment_loans = threading.local()
+
+
+def _refresh_deleted_payment_loans():
+    loan_ids = getattr(_deleted_payment_loans, "ids", None)
+    if loan_ids:
+        _deleted_payment_loans.ids = set()
+        Loan.objects.filter(pk__in=loan_ids).refresh_payment_stats()
+
+
+@receiver(post_delete, sender=Payment)
+def remove_loan_payment_stats(sender, instance: Payment, origin=None, **kwargs):
+    # a cascade from a Loan (or Customer) delete takes the loan with it: nothing to refresh
+    if origin is not None and not isinstance(origin, Payment) and getattr(origin, "model", None) is not Payment:
+        return
+    if getattr(_deleted_payment_loans, "ids", None) is None:
+        _deleted_payment_loans.ids = set()
+    _deleted_payment_loans.ids.add(instance.loan_id)
+    # a bulk delete runs in one transaction, so its loans are refreshed together by the
+    # first callback; ids left behind by a rolled-back delete are refreshed by the next one
+    transaction.on_commit(_refresh_deleted_payment_loans)
+
+
+# loan summaries/ETags embed the escrow balance: any direct write to an account (admin,
+# reassignment, delete) makes the cached reads of its old and new loan stale
+@receiver(post_save, sender=EscrowAccount)
+def bump_loan_version_on_escrow_save(sender, instance: EscrowAccount, raw=False, **kwargs):
+    if raw:
+        return
+    loan_ids = {instance.loan_id, getattr(instance, "_loan_snapshot", None)} - {None}
+    Loan.objects.filter(pk__in=loan_ids).bump_version()
+    instance._loan_snapshot = instance.loan_id
+
+
+@receiver(post_delete, sender=EscrowAccount)
+def bump_loan_version_on_escrow_delete(sender, instance: EscrowAccount, origin=None, **kwargs):
+    # deleted along with its loan: no cached reads left to invalidate
+    if isinstance(origin, (Loan, Customer)) or getattr(origin, "model", None) in (Loan, Customer):
+        return
+    Loan.objects.filter(pk=instance.loan_id).bump_version()
+
+
+# drop cached portfolio facts (see portfolio.py) when the rows behind them change
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+def invalidate_customer_facts(sender, **kwargs):
+    portfolio.invalidate("customers")
+
+
+@receiver(post_save, sender=Loan)
+@receiver(post_delete, sender=Loan)
+def invalidate_loan_facts(sender, **kwargs):
+    portfolio.invalidate("loans")
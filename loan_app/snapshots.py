@@ -0,0 +1,152 @@
+# loan_app/snapshots.py
+"""
+Daily PortfolioSnapshot rows: book totals (outstanding principal, cumulative interest,
+status counts) as of the end of each day, plus that day's collections.
+
+- record() writes today's row from the live book: one conditional aggregate over Loan
+  and one over the day's payments. It runs from the daily beat task and after every
+  EMI run, so it never touches history.
+- backfill() rebuilds a date range from one pass over loans and one per-day aggregate
+  of the payments since the range start, walking back from today's balances: the book
+  at the end of day d is the book at the end of d+1 plus the principal collected on
+  d+1, minus the loans originated on d+1 (and at most the principal lent by then).
+
+Principal/interest collected are the payments' principal_component/interest_component.
+Loans have no default date, so a DEFAULTED loan counts as defaulted from its start.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from . import amortization
+from .models import Loan, Payment, PortfolioSnapshot
+
+ZERO = Decimal("0.00")
+SNAPSHOT_FIELDS = [
+    "outstanding_principal", "total_interest_paid", "payments_count", "amount_collected",
+    "principal_collected", "interest_collected", "active_loans", "paid_off_loans", "defaulted_loans",
+]
+FLOW_FIELDS = ["payments_count", "amount_collected", "principal_collected", "interest_collected"]
+BATCH_SIZE = 500
+
+
+def collection_aggregates() -> dict:
+    """
+    Payment count, amount, principal and interest collected, as aggregate expressions
+    for .aggregate() or, after .values(<period>), .annotate().
+    """
+    return {
+        "payments_count": Count("id"),
+        "amount_collected": Sum("amount", default=ZERO),
+        "principal_collected": Sum("principal_component", default=ZERO),
+        "interest_collected": Sum("interest_component", default=ZERO),
+    }
+
+
+def money(row) -> dict:
+    """`row` with its decimal sums quantized to cents (SQLite sums decimals as floats)."""
+    return {name: amortization.to_cents(value) if isinstance(value, (Decimal, float)) else value
+            for name, value in row.items()}
+
+
+def record(day=None) -> PortfolioSnapshot:
+    """Write (or overwrite) the snapshot for `day` (default today) from the live book."""
+    day = day or date.today()
+    book = Loan.objects.aggregate(
+        outstanding_principal=Sum("outstanding_principal", default=ZERO),
+        total_interest_paid=Sum("total_interest_paid", default=ZERO),
+        active_loans=Count("id", filter=Q(status=Loan.STATUS_ACTIVE)),
+        paid_off_loans=Count("id", filter=Q(status=Loan.STATUS_PAID_OFF)),
+        defaulted_loans=Count("id", filter=Q(status=Loan.STATUS_DEFAULTED)),
+    )
+    flows = Payment.objects.filter(payment_date=day).aggregate(**collection_aggregates())
+    # one INSERT ... ON CONFLICT (date) DO UPDATE
+    [snapshot] = PortfolioSnapshot.objects.bulk_create(
+        [PortfolioSnapshot(date=day, **money(book), **money(flows))],
+        update_conflicts=True, unique_fields=["date"], update_fields=[*SNAPSHOT_FIELDS, "computed_at"],
+    )
+    return snapshot
+
+
+def backfill(start: date, end: date = None) -> int:
+    """Rebuild the snapshots for start..end (end defaults to, and is capped at, today). Returns rows written."""
+    today = date.today()
+    end = min(end or today, today)
+    if start > end:
+        return 0
+
+    def clamp(day):
+        return min(max(day or start, start), today)
+
+    outstanding = ZERO
+    interest_paid = ZERO
+    lent = ZERO
+    originated = defaultdict(Decimal)
+    started = defaultdict(int)
+    paid_off = defaultdict(int)
+    defaulted = defaultdict(int)
+    loans = Loan.objects.order_by().values_list(
+        "start_date", "paid_off_date", "status", "principal_amount", "outstanding_principal", "total_interest_paid"
+    )
+    for start_date, paid_off_date, status, principal, balance, interest in loans.iterator(chunk_size=2000):
+        outstanding += balance
+        interest_paid += interest
+        lent += principal
+        opened = clamp(start_date)
+        originated[opened] += principal
+        started[opened] += 1
+        if status == Loan.STATUS_PAID_OFF:
+            paid_off[max(opened, clamp(paid_off_date))] += 1
+        elif status == Loan.STATUS_DEFAULTED:
+            defaulted[opened] += 1
+
+    flows = {}
+    daily = Payment.objects.filter(payment_date__gte=start).order_by().values("payment_date").annotate(**collection_aggregates())
+    for row in daily:
+        # payments dated after today land on today's row
+        flow = flows.setdefault(clamp(row.pop("payment_date")), dict.fromkeys(FLOW_FIELDS, 0))
+        for name, value in money(row).items():
+            flow[name] += value
+
+    # balances at the end of each day, walking back from today's
+    book = {}
+    day = today
+    while day >= start:
+        book[day] = (outstanding, interest_paid)
+        flow = flows.get(day)
+        if flow is not None:
+            outstanding += flow["principal_collected"]
+            interest_paid -= flow["interest_collected"]
+        outstanding -= originated.get(day, ZERO)
+        lent -= originated.get(day, ZERO)
+        # the book never owes more than was lent, even with legacy uncapped splits
+        outstanding = min(outstanding, lent)
+        day -= timedelta(days=1)
+
+    rows = []
+    counts = [0, 0, 0]  # started, paid off, defaulted by the end of the day
+    day = start
+    while day <= end:
+        counts[0] += started.get(day, 0)
+        counts[1] += paid_off.get(day, 0)
+        counts[2] += defaulted.get(day, 0)
+        rows.append(PortfolioSnapshot(
+            date=day,
+            outstanding_principal=book[day][0],
+            total_interest_paid=book[day][1],
+            active_loans=counts[0] - counts[1] - counts[2],
+            paid_off_loans=counts[1],
+            defaulted_loans=counts[2],
+            **flows.get(day, {}),
+        ))
+        day += timedelta(days=1)
+
+    with transaction.atomic():
+        PortfolioSnapshot.objects.bulk_create(
+            rows, batch_size=BATCH_SIZE,
+            update_conflicts=True, unique_fields=["date"], update_fields=[*SNAPSHOT_FIELDS, "computed_at"],
+        )
+    return len(rows)
@@ -0,0 +1,65 @@
+# loan_app/summaries.py
+"""
+Loan KPI summaries, shared by LoanViewSet.summary, loan_summary and the batch
+/api/loans/summaries/ endpoint.
+
+Everything a summary needs is on the loan row (payment aggregates are stored on Loan)
+or its escrow, so summary_queryset() builds any number of summaries in one query.
+"""
+from decimal import Decimal
+
+from . import amortization
+from .models import Loan
+
+
+def summary_queryset():
+    """Loans with their escrow joined in, so build_loan_summary() issues no further queries."""
+    return Loan.objects.select_related("escrow")
+
+
+def build_loan_summary(loan: Loan) -> dict:
+    """
+    KPI summary for a single loan:
+    - totals (paid so far, interest paid, outstanding balance)
+    - last payment date, count of payments
+    - next payment preview (payment, interest, principal)
+    - escrow balance (if exists)
+    - status (ACTIVE/PAID_OFF/DEFAULTED)
+    """
+    balance = (loan.outstanding_principal or loan.principal_amount) or Decimal("0.00")
+    balance = Decimal(balance).quantize(Decimal("0.01"))
+
+    payment_per_period, principal_next, interest_next = amortization.split_payment(
+        balance, loan.annual_interest_rate, loan.term_months
+    )
+
+    escrow_balance = None
+    if hasattr(loan, "escrow") and loan.escrow is not None:
+        escrow_balance = float(loan.escrow.balance)
+
+    status_val = "PAID_OFF" if balance <= 0 else (loan.status or "ACTIVE")
+
+    return {
+        "loan_id": loan.id,
+        "customer_id": loan.customer_id,
+        "principal_amount": float(loan.principal_amount),
+        "annual_interest_rate_percent": float(loan.annual_interest_rate),
+        "term_months": int(loan.term_months),
+        "status": status_val,
+        "totals": {
+            "paid_so_far": float(loan.total_paid or 0),
+            "interest_paid": float(loan.total_interest_paid or 0),
+            "outstanding_principal": float(balance),
+        },
+        "payments": {
+            "count": loan.payments_count,
+            "last_payment_date": loan.last_payment_date,
+        },
+        "next_payment_preview": {
+            "payment": float(payment_per_period),
+            "interest": float(interest_next),
+            "principal": float(principal_next),
+            "projected_balance_after": float((balance - principal_next) if balance > 0 else 0),
+        },
+        "escrow": {"balance": escrow_balance},
+    }
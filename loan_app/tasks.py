@@ -1,66 +1,257 @@
 # loan_app/tasks.py
-from celery import shared_task
-from decimal import Decimal, ROUND_HALF_UP
-from datetime import date
+import os
+import time
+from celery import chord, group, shared_task
+from decimal import Decimal
+from datetime import date, timedelta
 from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+from loan_app import amortization, checkpoints, snapshots
 from loan_app.models import Loan, Payment
 
+# Loans per chunk in batched mode: one SELECT, one bulk INSERT and one bulk UPDATE each.
+EMI_BATCH_SIZE = 500
+
+
 def _emi(principal: Decimal, annual_rate: Decimal, term_months: int) -> Decimal:
     """Standard annuity EMI calculation on remaining principal."""
-    principal = Decimal(principal)
-    annual_rate = Decimal(annual_rate)
-    term_months = int(term_months) if term_months and int(term_months) > 0 else 1
+    return amortization.emi(principal, annual_rate, term_months)
 
-    r = (annual_rate / Decimal("100")) / Decimal("12")
-    if r == 0:
-        return (principal / Decimal(term_months)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
-    num = principal * r * (1 + r) ** term_months
-    den = (1 + r) ** term_months - 1
-    emi = num / den
-    return emi.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+def _emi_split(loan: Loan):
+    """Return (emi_amount, principal_component, interest_component) for the loan's next period."""
+    # EMI re-amortized on CURRENT remaining principal over the full term (simple assumption for demo)
+    return amortization.split_payment(loan.outstanding_principal, loan.annual_interest_rate, loan.term_months)
 
-@shared_task
-def process_daily_emi():
-    """Demo mode: create & apply one EMI for every ACTIVE loan each run."""
-    today = date.today()
+
+def _emi_note(principal_component: Decimal, interest_component: Decimal) -> str:
+    return f"Auto EMI via Celery | principal={principal_component} interest={interest_component}"
+
+
+def _emi_idempotency_key(loan_id: int, payment_date: date) -> str:
+    return f"emi:{loan_id}:{payment_date.isoformat()}"
+
+
+def _apply_emi_in_chunks(batch_size: int, payment_date: date, idempotent: bool = False, queryset=None):
+    """
+    Charge one EMI to every ACTIVE loan with a positive balance (of `queryset`), in chunks
+    keyset-paginated on id so each chunk is an indexed range scan no matter how far into
+    the table we are. Returns (payments_created, amount_charged).
+
+    Each chunk is read with SELECT ... FOR UPDATE and written in the same transaction, so
+    a concurrent mark_processed cannot change a balance between our read and our bulk
+    UPDATE.
+    """
+    queryset = Loan.objects.all() if queryset is None else queryset
+    queryset = (
+        queryset.filter(status=Loan.STATUS_ACTIVE, outstanding_principal__gt=0)
+        .only(
+            "id", "annual_interest_rate", "term_months", "status",
+            "paid_off_date", "outstanding_principal", "total_interest_paid",
+        )
+        .order_by("id")
+    )
     created = 0
+    total = Decimal("0.00")
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            chunk = list(queryset.filter(id__gt=last_id).select_for_update()[:batch_size])
+            if not chunk:
+                return created, total
+            count, amount = _apply_emi_chunk(chunk, payment_date, idempotent=idempotent)
+        created += count
+        total += amount
+        last_id = chunk[-1].id
+
+
+def _apply_emi_chunk(loans, payment_date: date, idempotent: bool = False):
+    """
+    Charge one EMI to each loan in `loans` using two statements: a bulk INSERT of the
+    payments and a bulk UPDATE of the balances. Returns (payments_created, amount_charged).
+
+    With `idempotent`, every payment carries a (loan, payment_date) idempotency key and
+    loans already charged for that date are skipped; the unique key is the backstop if
+    two runs race on the same loan.
+    """
+    if idempotent:
+        keys = {_emi_idempotency_key(loan.id, payment_date): loan for loan in loans}
+        charged = set(
+            Payment.objects.filter(idempotency_key__in=keys).values_list("idempotency_key", flat=True)
+        )
+        loans = [loan for key, loan in keys.items() if key not in charged]
+        if not loans:
+            return 0, Decimal("0.00")
+
+    payments = []
+    total = Decimal("0.00")
+    processed_at = timezone.now()
+    for loan in loans:
+        emi_amount, principal_component, interest_component = _emi_split(loan)
+        payments.append(Payment(
+            loan=loan,
+            amount=emi_amount,
+            payment_date=payment_date,
+            note=_emi_note(principal_component, interest_component),
+            principal_component=principal_component,
+            interest_component=interest_component,
+            idempotency_key=_emi_idempotency_key(loan.id, payment_date) if idempotent else None,
+            processed_at=processed_at,
+        ))
+        total += emi_amount
 
-    for loan in Loan.objects.all():
-        # skip fully paid loans
-        if not loan.outstanding_principal or loan.outstanding_principal <= 0:
-            continue
+        loan.total_interest_paid += interest_component
+        loan.outstanding_principal -= principal_component
+        # bulk_update bypasses Loan.save(), so apply the same clamp/status flip here
+        loan.apply_balance_guards()
 
-        # Compute EMI using CURRENT remaining principal
-        emi_amount = _emi(
-            principal=loan.outstanding_principal,
-            annual_rate=loan.annual_interest_rate,
-            term_months=max(1, loan.term_months),  # simple assumption for demo
+    with transaction.atomic():
+        Payment.objects.bulk_create(payments, batch_size=len(payments))
+        Loan.objects.add_payment_stats(payments)
+        Loan.objects.bulk_update(
+            loans,
+            ["outstanding_principal", "total_interest_paid", "status", "paid_off_date"],
+            batch_size=len(loans),
         )
+    return len(payments), total
+
+
+@shared_task
+def process_daily_emi(batch_size=None):
+    """
+    Demo mode: create & apply one EMI for every ACTIVE loan each run.
+
+    With `batch_size`, ACTIVE loans are streamed in chunks of that size and each chunk
+    is written with bulk_create/bulk_update instead of per-loan INSERT + save().
+    """
+    today = date.today()
+    started = time.perf_counter()
 
-        # Interest for this period (monthly)
-        monthly_rate = (loan.annual_interest_rate / Decimal("100")) / Decimal("12")
-        interest_component = (loan.outstanding_principal * monthly_rate).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    if batch_size:
+        created, _ = _apply_emi_in_chunks(int(batch_size), today)
+    else:
+        created = 0
+        for loan in Loan.objects.all():
+            # skip fully paid loans
+            if not loan.outstanding_principal or loan.outstanding_principal <= 0:
+                continue
 
-        # Principal = EMI - interest
-        principal_component = (emi_amount - interest_component).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-        if principal_component < 0:
-            principal_component = Decimal("0.00")
+            emi_amount, principal_component, interest_component = _emi_split(loan)
 
+            with transaction.atomic():
+                Payment.objects.create(
+                    amount=emi_amount,
+                    payment_date=today,
+                    loan=loan,
+                    note=_emi_note(principal_component, interest_component),
+                    principal_component=principal_component,
+                    interest_component=interest_component,
+                    processed_at=timezone.now(),
+                )
+
+                # one UPDATE relative to the row's current values, not a save() of our stale copy
+                Loan.objects.filter(pk=loan.pk).apply_allocation(principal_component, interest_component, today)
+
+                created += 1
+
+    if created:
+        # keep today's row of the trend table in step with the run
+        snapshots.record()
+    elapsed = time.perf_counter() - started
+    rate = created / elapsed if elapsed > 0 else 0.0
+    return (
+        f"Processed {created} EMI payments on {today.isoformat()} "
+        f"in {elapsed:.2f}s ({rate:.0f} rows/s)"
+    )
+
+
+@shared_task
+def snapshot_portfolio(day=None):
+    """Daily beat task: write the day's PortfolioSnapshot from the live book (see loan_app.snapshots)."""
+    snapshot = snapshots.record(date.fromisoformat(day) if day else None)
+    return f"Portfolio snapshot {snapshot.date.isoformat()}: outstanding {snapshot.outstanding_principal}"
+
+
+@shared_task
+def checkpoint_loans(day=None):
+    """Monthly beat task: checkpoint every loan at the end of `day` (default yesterday, see loan_app.checkpoints)."""
+    run_day = date.fromisoformat(day) if day else date.today() - timedelta(days=1)
+    written = checkpoints.write([run_day])
+    return f"Wrote {written} loan checkpoints for {run_day.isoformat()}"
+
+
+# ----------------------------
+# Sharded fan-out
+# ----------------------------
+def _shard_ranges(lo: int, hi: int, shards: int):
+    """Split the inclusive id range [lo, hi] into at most `shards` contiguous ranges."""
+    width = max(1, -(-(hi - lo + 1) // shards))
+    return [(start, min(hi, start + width - 1)) for start in range(lo, hi + 1, width)]
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=10)
+def process_emi_shard(self, first_id: int, last_id: int, payment_date: str, batch_size=EMI_BATCH_SIZE):
+    """
+    Charge one EMI to every ACTIVE loan with first_id <= id <= last_id, in one transaction.
+    Safe to retry: loans already charged for `payment_date` are skipped.
+    """
+    run_date = date.fromisoformat(payment_date)
+    queryset = Loan.objects.filter(id__gte=first_id, id__lte=last_id)
+    try:
         with transaction.atomic():
-            Payment.objects.create(
-                amount=emi_amount,
-                payment_date=today,
-                loan=loan,
-                note=f"Auto EMI via Celery | principal={principal_component} interest={interest_component}",
-            )
-
-            loan.total_interest_paid += interest_component
-            loan.outstanding_principal -= principal_component
-            if loan.outstanding_principal < 0:
-                loan.outstanding_principal = Decimal("0.00")
-            loan.save()
-
-            created += 1
-
-    return f"Processed {created} EMI payments on {today.isoformat()}"
+            created, total = _apply_emi_in_chunks(int(batch_size), run_date, idempotent=True, queryset=queryset)
+    except Exception as exc:
+        raise self.retry(exc=exc)
+
+    return {
+        "first_id": first_id,
+        "last_id": last_id,
+        "payments": created,
+        "amount": str(total),
+    }
+
+
+@shared_task
+def aggregate_emi_shards(results, payment_date: str, started_at: float = None):
+    """Chord callback: fold the per-shard results into one run summary."""
+    payments = sum(r["payments"] for r in results)
+    amount = sum((Decimal(r["amount"]) for r in results), Decimal("0.00"))
+    summary = {
+        "payment_date": payment_date,
+        "shards": len(results),
+        "payments": payments,
+        "amount": str(amount),
+    }
+    if payments:
+        snapshots.record()
+    if started_at is not None:
+        elapsed = time.time() - started_at
+        summary["elapsed_seconds"] = round(elapsed, 3)
+        summary["rows_per_second"] = round(payments / elapsed, 1) if elapsed > 0 else 0.0
+    return summary
+
+
+@shared_task
+def process_daily_emi_sharded(shards=None, batch_size=EMI_BATCH_SIZE, payment_date=None):
+    """
+    Coordinator: split the ACTIVE loan id space into `shards` ranges (default: one per
+    CPU) and fan them out as a chord of process_emi_shard tasks. Returns the chord id,
+    or the aggregated summary when tasks run eagerly.
+    """
+    run_date = payment_date or date.today().isoformat()
+    bounds = Loan.objects.filter(
+        status=Loan.STATUS_ACTIVE, outstanding_principal__gt=0
+    ).aggregate(lo=Min("id"), hi=Max("id"))
+    if bounds["lo"] is None:
+        return {"payment_date": run_date, "shards": 0, "payments": 0, "amount": "0.00"}
+
+    shards = max(1, int(shards or os.cpu_count() or 1))
+    header = group(
+        process_emi_shard.s(first_id, last_id, run_date, batch_size)
+        for first_id, last_id in _shard_ranges(bounds["lo"], bounds["hi"], shards)
+    )
+    result = chord(header)(aggregate_emi_shards.s(run_date, time.time()))
+    if result.ready():
+        return result.get()
+    return {"payment_date": run_date, "chord_id": result.id}
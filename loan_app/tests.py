@@ -1,3 +1,1439 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import re
+import threading
+import unittest
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from . import allocation, amortization, exports, ingest, schedules, signals
+from .models import Customer, EscrowAccount, Loan, LoanCheckpoint, Payment, PortfolioSnapshot
+from .tasks import _emi, process_daily_emi
+from .views import calculate_emi
+
+
+def make_loan(customer, principal="10000.00", rate="6.50", term=12, **extra):
+    return Loan.objects.create(
+        customer=customer,
+        principal_amount=Decimal(principal),
+        annual_interest_rate=Decimal(rate),
+        term_months=term,
+        **extra,
+    )
+
+
+class ProcessDailyEmiTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(full_name="Test User", email="test@example.com")
+
+    def _snapshot(self):
+        return [
+            (l.outstanding_principal, l.total_interest_paid, l.status, l.paid_off_date)
+            for l in Loan.objects.order_by("id")
+        ]
+
+    def _seed(self):
+        make_loan(self.customer, "10000.00", "6.50", 12)
+        make_loan(self.customer, "2500.00", "0.00", 6)
+        make_loan(self.customer, "50.00", "12.00", 1)          # pays off in one run
+        make_loan(self.customer, "8000.00", "9.25", 24, status=Loan.STATUS_DEFAULTED)
+
+    def test_batched_matches_row_by_row_for_active_loans(self):
+        self._seed()
+        Loan.objects.filter(status=Loan.STATUS_DEFAULTED).delete()
+        process_daily_emi()
+        expected = self._snapshot()
+        expected_payments = list(Payment.objects.order_by("loan_id").values_list("amount", "note"))
+
+        Payment.objects.all().delete()
+        Loan.objects.all().delete()
+        self._seed()
+        Loan.objects.filter(status=Loan.STATUS_DEFAULTED).delete()
+        result = process_daily_emi(batch_size=2)
+
+        self.assertEqual(self._snapshot(), expected)
+        self.assertEqual(
+            list(Payment.objects.order_by("loan_id").values_list("amount", "note")),
+            expected_payments,
+        )
+        self.assertIn("rows/s", result)
+
+    def test_batched_skips_non_active_loans_and_flips_paid_off(self):
+        self._seed()
+        process_daily_emi(batch_size=500)
+
+        defaulted = Loan.objects.get(status=Loan.STATUS_DEFAULTED)
+        self.assertFalse(defaulted.payments.exists())
+        paid = Loan.objects.get(principal_amount=Decimal("50.00"))
+        self.assertEqual(paid.status, Loan.STATUS_PAID_OFF)
+        self.assertEqual(paid.outstanding_principal, Decimal("0.00"))
+        self.assertEqual(paid.paid_off_date, date.today())
+
+        # a second run no longer charges the paid-off loan
+        process_daily_emi(batch_size=500)
+        self.assertEqual(paid.payments.count(), 1)
+        self.assertEqual(Payment.objects.count(), 5)
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True, CELERY_RESULT_BACKEND="cache+memory://")
+class ShardedEmiTests(TestCase):
+    def setUp(self):
+        customer = Customer.objects.create(full_name="Shard User", email="shard@example.com")
+        self.loans = [make_loan(customer, f"{1000 * (i + 1)}.00", "7.25", 24) for i in range(7)]
+
+    def test_chord_aggregates_all_shards(self):
+        from .tasks import process_daily_emi_sharded
+
+        summary = process_daily_emi_sharded(shards=3, batch_size=2, payment_date="2026-01-01")
+
+        self.assertEqual(summary["shards"], 3)
+        self.assertEqual(summary["payments"], 7)
+        self.assertEqual(Decimal(summary["amount"]), Payment.objects.aggregate(s=Sum("amount"))["s"])
+
+    def test_rerun_for_same_date_does_not_double_charge(self):
+        from .tasks import process_daily_emi_sharded, process_emi_shard
+
+        process_daily_emi_sharded(shards=2, payment_date="2026-01-01")
+        balances = list(Loan.objects.order_by("id").values_list("outstanding_principal", flat=True))
+
+        # a retried shard and a whole second run are both no-ops for that date
+        retried = process_emi_shard(self.loans[0].id, self.loans[-1].id, "2026-01-01")
+        again = process_daily_emi_sharded(shards=4, payment_date="2026-01-01")
+
+        self.assertEqual(retried["payments"], 0)
+        self.assertEqual(again["payments"], 0)
+        self.assertEqual(Payment.objects.count(), 7)
+        self.assertEqual(
+            list(Loan.objects.order_by("id").values_list("outstanding_principal", flat=True)), balances
+        )
+
+        process_daily_emi_sharded(shards=2, payment_date="2026-02-01")
+        self.assertEqual(Payment.objects.count(), 14)
+
+
+class AmortizationTests(TestCase):
+    @staticmethod
+    def _reference_emi(principal, annual_rate, term_months):
+        # the formula previously inlined in views/tasks/models
+        principal, annual_rate = Decimal(principal), Decimal(annual_rate)
+        n = max(1, int(term_months))
+        r = (annual_rate / Decimal("100")) / Decimal("12")
+        if r == 0:
+            return (principal / Decimal(n)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        return (principal * r * (1 + r) ** n / ((1 + r) ** n - 1)).quantize(
+            Decimal("0.01"), rounding=ROUND_HALF_UP
+        )
+
+    def test_emi_matches_reference_formula(self):
+        for principal in ("1000.00", "250000.00", "99999.99", "0.01"):
+            for rate in ("0.00", "0.01", "3.75", "6.50", "18.99"):
+                for term in (0, 1, 12, 60, 360):
+                    self.assertEqual(
+                        amortization.emi(principal, rate, term),
+                        self._reference_emi(principal, rate, term),
+                        (principal, rate, term),
+                    )
+
+    def test_annuity_factor_is_cached_per_rate_and_term(self):
+        amortization._annuity_factor.cache_clear()
+        amortization.emi_many([(Decimal("1000"), Decimal("6.50"), 360)] * 10 + [(Decimal("5"), "6.5", 360)])
+        info = amortization.cache_info()
+        self.assertEqual((info.misses, info.hits), (1, 10))
+
+    def test_callers_share_the_engine(self):
+        customer = Customer.objects.create(full_name="Amort User", email="amort@example.com")
+        loan = make_loan(customer, "250000.00", "6.50", 360)
+        self.assertEqual(loan.scheduled_monthly_payment, Decimal("1580.17"))
+        self.assertEqual(calculate_emi(Decimal("250000.00"), Decimal("6.50"), 360), Decimal("1580.17"))
+        self.assertEqual(_emi(Decimal("250000.00"), Decimal("6.50"), 360), Decimal("1580.17"))
+
+
+class FullScheduleTests(TestCase):
+    @staticmethod
+    def _reference_schedule(principal, annual_rate, term):
+        # amortization_preview's Decimal loop, run from origination with a final-period sweep
+        balance = Decimal(principal)
+        payment = amortization.emi(balance, annual_rate, term)
+        r = amortization.monthly_rate(annual_rate)
+        rows = []
+        for i in range(1, term + 1):
+            interest = amortization.to_cents(balance * r)
+            principal_part = amortization.to_cents(payment - interest)
+            if principal_part > balance or i == term:
+                principal_part = balance
+            balance = amortization.to_cents(balance - principal_part)
+            rows.append((float(principal_part + interest), float(interest), float(principal_part), float(balance)))
+            if balance <= 0:
+                break
+        return rows
+
+    def test_matches_decimal_loop_to_the_cent(self):
+        import random
+
+        rng = random.Random(7)
+        cases = [("250000.00", "6.50", 360), ("1650.00", "0.04", 12), ("37.50", "0.16", 6), ("1200.00", "0.00", 7)]
+        cases += [
+            (f"{rng.randint(100, 50_000_000) / 100:.2f}", f"{rng.randint(0, 3000) / 100:.2f}", rng.choice([1, 6, 60, 180, 360]))
+            for _ in range(40)
+        ]
+        loans = [
+            Loan(id=i, principal_amount=Decimal(p), annual_interest_rate=Decimal(r), term_months=t, start_date=date(2024, 1, 31))
+            for i, (p, r, t) in enumerate(cases)
+        ]
+        result = schedules.full_schedules(loans)
+        for loan, (p, r, t) in zip(loans, cases):
+            rows = [
+                (row["payment"], row["interest"], row["principal"], row["balance_after"])
+                for row in result[loan.id]["rows"]
+            ]
+            self.assertEqual(rows, self._reference_schedule(p, r, t), (p, r, t))
+            self.assertEqual(result[loan.id]["rows"][-1]["balance_after"], 0.0)
+
+    def test_batch_endpoint_returns_dated_cumulative_schedules(self):
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+
+        customer = Customer.objects.create(full_name="Sched User", email="sched@example.com")
+        a = make_loan(customer, "12000.00", "6.00", 12, start_date=date(2024, 1, 31))
+        b = make_loan(customer, "5000.00", "0.00", 5, start_date=date(2024, 3, 15))
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("sched"))
+
+        res = client.get(f"/api/loans/amortization/?ids={a.id},{b.id},999999")
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["missing_ids"], [999999])
+        first, second = res.data["loans"]
+        self.assertEqual(len(first["rows"]), 12)
+        self.assertEqual(first["rows"][0]["payment_date"], "2024-02-29")
+        self.assertEqual(first["rows"][-1]["cumulative_principal"], 12000.0)
+        self.assertEqual(second["rows"][-1]["payment_date"], "2024-08-15")
+        self.assertEqual(second["totals"]["interest"], 0.0)
+
+        single = client.get(f"/api/loans/{a.id}/amortization_preview/?schedule=full")
+        self.assertEqual(single.data["rows"], first["rows"])
+
+
+class PaymentStatsTests(TestCase):
+    def setUp(self):
+        customer = Customer.objects.create(full_name="Stats User", email="stats@example.com")
+        self.loan = make_loan(customer, "10000.00", "6.50", 12)
+
+    def _stats(self, loan=None):
+        return Loan.objects.values_list(*Loan.PAYMENT_STATS_FIELDS).get(pk=(loan or self.loan).pk)
+
+    def test_create_update_delete_keep_stats_in_step(self):
+        p1 = Payment.objects.create(loan=self.loan, amount=Decimal("100.00"), payment_date=date(2025, 1, 5))
+        Payment.objects.create(loan=self.loan, amount=Decimal("50.00"), payment_date=date(2025, 2, 5))
+        self.assertEqual(self._stats(), (2, Decimal("150.00"), date(2025, 2, 5)))
+
+        p1 = Payment.objects.get(pk=p1.pk)
+        p1.amount = Decimal("120.00")
+        p1.save()
+        self.assertEqual(self._stats(), (2, Decimal("170.00"), date(2025, 2, 5)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Payment.objects.filter(payment_date=date(2025, 2, 5)).delete()
+        self.assertEqual(self._stats(), (1, Decimal("120.00"), date(2025, 1, 5)))
+
+    def test_bulk_delete_refreshes_each_loan_once(self):
+        other = make_loan(self.loan.customer, "5000.00", "6.50", 12)
+        Payment.objects.bulk_create([
+            Payment(loan=loan, amount=Decimal("10.00"), payment_date=date(2025, 1, day))
+            for loan in (self.loan, other) for day in range(1, 21)
+        ])
+        Payment.objects.create(loan=other, amount=Decimal("7.00"), payment_date=date(2025, 3, 1))
+        with self.captureOnCommitCallbacks() as callbacks:
+            Payment.objects.filter(payment_date__lt=date(2025, 2, 1)).delete()
+        # the first callback refreshes both loans (aggregate, SELECT, bulk UPDATE), the rest are no-ops
+        with self.assertNumQueries(3):
+            for callback in callbacks:
+                callback()
+        self.assertEqual(self._stats(), (0, Decimal("0.00"), None))
+        self.assertEqual(self._stats(other), (1, Decimal("7.00"), date(2025, 3, 1)))
+
+    def test_loan_delete_skips_payment_stats(self):
+        Payment.objects.create(loan=self.loan, amount=Decimal("100.00"), payment_date=date(2025, 1, 5))
+        with self.captureOnCommitCallbacks() as callbacks:
+            Loan.objects.filter(pk=self.loan.pk).delete()
+        self.assertNotIn(signals._refresh_deleted_payment_loans, callbacks)
+
+    def test_stale_loan_save_does_not_clobber_stats(self):
+        stale = Loan.objects.get(pk=self.loan.pk)
+        Payment.objects.create(loan=self.loan, amount=Decimal("100.00"), payment_date=date(2025, 1, 5))
+        stale.total_interest_paid = Decimal("1.00")
+        stale.save()
+        self.assertEqual(self._stats(), (1, Decimal("100.00"), date(2025, 1, 5)))
+
+    def test_emi_runs_and_reconcile_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        process_daily_emi()
+        process_daily_emi(batch_size=10)
+        loan = Loan.objects.get(pk=self.loan.pk)
+        self.assertEqual(loan.payments_count, 2)
+        self.assertEqual(loan.total_paid, Payment.objects.aggregate(s=Sum("amount"))["s"])
+        self.assertEqual(loan.last_payment_date, date.today())
+
+        Loan.objects.filter(pk=loan.pk).update(payments_count=7)
+        out = StringIO()
+        call_command("reconcile_payment_stats", stdout=out)
+        self.assertIn("1 of 1 loans out of sync", out.getvalue())
+        call_command("reconcile_payment_stats", "--fix", stdout=out)
+        self.assertEqual(self._stats()[0], 2)
+
+
+class LoanSummaryTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+
+        self.customer = Customer.objects.create(full_name="Summary User", email="summary@example.com")
+        self.loans = [make_loan(self.customer, f"{5000 + i}.00", "6.50", 24) for i in range(30)]
+        for loan in self.loans[:10]:
+            Payment.objects.create(loan=loan, amount=Decimal("250.00"), payment_date=date(2025, 3, 1))
+        Loan.objects.filter(pk=self.loans[-1].pk).update(status=Loan.STATUS_DEFAULTED)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("summary"))
+
+    def test_batch_summaries_use_a_fixed_number_of_queries(self):
+        ids = ",".join(str(loan.id) for loan in self.loans)
+        with self.assertNumQueries(1):
+            res = self.client.get(f"/api/loans/summaries/?ids={ids},424242")
+        self.assertEqual(len(res.data["results"]), 30)
+        self.assertEqual(res.data["missing_ids"], [424242])
+
+        with self.assertNumQueries(1):
+            res = self.client.get("/api/loans/summaries/?status=defaulted")
+        self.assertEqual([row["loan_id"] for row in res.data["results"]], [self.loans[-1].id])
+
+    def test_single_summary_matches_batch_entry(self):
+        loan = self.loans[0]
+        with self.assertNumQueries(2):  # version lookup + the summary query
+            single = self.client.get(f"/api/loans/{loan.id}/summary/").data
+        batch = self.client.get(f"/api/loans/summaries/?ids={loan.id}").data["results"][0]
+        self.assertEqual(single, batch)
+        self.assertEqual(single["payments"], {"count": 1, "last_payment_date": date(2025, 3, 1)})
+        self.assertEqual(single["totals"]["paid_so_far"], 250.0)
+        self.assertEqual(single["escrow"], {"balance": 0.0})
+
+
+class PortfolioFactsTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+        from rest_framework.test import APIClient
+
+        cache.clear()
+        self.customer = Customer.objects.create(full_name="Facts User", email="facts@example.com")
+        make_loan(self.customer, "10000.00", "6.50", 12)
+        make_loan(self.customer, "2000.00", "0.00", 10, status=Loan.STATUS_DEFAULTED)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("facts"))
+
+    def ask(self, question):
+        return self.client.post("/api/ai/query/", {"question": question}, format="json").data
+
+    def test_facts_are_cached_and_computed_per_intent(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.ask("total customers")["facts"], {"customers": 1})
+        with self.assertNumQueries(0):
+            self.ask("total customers")
+        with self.assertNumQueries(1):  # all status counts + outstanding in one aggregate
+            self.assertEqual(self.ask("active loans")["facts"], {"active_loans": 1})
+        with self.assertNumQueries(0):
+            self.assertEqual(self.ask("outstanding principal")["facts"], {"outstanding_principal": "12000.00"})
+
+    def test_monthly_emi_total_is_no_longer_zero(self):
+        facts = self.ask("monthly emi total")["facts"]
+        self.assertEqual(facts["monthly_emi_total"], str(amortization.emi("10000.00", "6.50", 12)))
+
+    def test_loan_and_emi_writes_invalidate(self):
+        self.ask("active loans")
+        make_loan(self.customer, "500.00", "5.00", 6)
+        self.assertEqual(self.ask("active loans")["facts"], {"active_loans": 2})
+
+        process_daily_emi(batch_size=100)
+        outstanding = Loan.objects.aggregate(s=Sum("outstanding_principal"))["s"]
+        self.assertEqual(self.ask("outstanding")["facts"], {"outstanding_principal": str(amortization.to_cents(outstanding))})
+
+    def test_queryset_writes_invalidate(self):
+        self.assertEqual(self.ask("active loans")["facts"], {"active_loans": 1})
+        Loan.objects.filter(status=Loan.STATUS_ACTIVE).update(status=Loan.STATUS_DEFAULTED)
+        self.assertEqual(self.ask("active loans")["facts"], {"active_loans": 0})
+
+        Loan.objects.update(status=Loan.STATUS_ACTIVE)
+        self.ask("monthly emi total")
+        Loan.objects.filter(principal_amount=Decimal("10000.00")).update(principal_amount=Decimal("20000.00"))
+        expected = amortization.emi("20000.00", "6.50", 12) + amortization.emi("2000.00", "0.00", 10)
+        self.assertEqual(self.ask("monthly emi total")["facts"], {"monthly_emi_total": str(expected)})
+
+        loan = Loan.objects.get(principal_amount=Decimal("2000.00"))
+        loan.status = Loan.STATUS_PAID_OFF
+        Loan.objects.bulk_update([loan], ["status"])
+        self.assertEqual(self.ask("paid off")["facts"], {"paid_off_loans": 1})
+
+
+class AiIntentTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+        from datetime import timedelta
+        from rest_framework.test import APIClient
+
+        cache.clear()
+        customer = Customer.objects.create(full_name="Intent User", email="intent@example.com")
+        low = make_loan(customer, "1000.00", "5.00", 12)
+        make_loan(customer, "2000.00", "7.50", 12)
+        make_loan(customer, "3000.00", "9.00", 12, status=Loan.STATUS_DEFAULTED)
+        today = date.today()
+        Payment.objects.bulk_create([
+            Payment(loan=low, amount=Decimal("10.00"), payment_date=today),
+            Payment(loan=low, amount=Decimal("20.00"), payment_date=today - timedelta(days=6)),
+            Payment(loan=low, amount=Decimal("40.00"), payment_date=today - timedelta(days=7)),
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("intents"))
+
+    def ask(self, question):
+        return self.client.post("/api/ai/query/", {"question": question}, format="json").data
+
+    def test_each_intent_costs_only_its_queries(self):
+        from django.core.cache import cache
+
+        cases = [
+            ("total customers", 1),            # one COUNT
+            ("active loans", 1),               # the loans fact group: one conditional aggregate
+            ("recent payments", 1),
+            ("active loans above 6%", 1),      # one filtered aggregate
+            ("payments last 7 days", 1),
+            ("what is the weather", 0),
+            # several intents: facts in one get_facts call, rate questions share one aggregate
+            ("total customers and outstanding", 2),
+            ("active loans above 6% and defaulted loans below 10%", 1),
+            ("loans over 6% and payments in the last 30 days", 2),
+        ]
+        for question, queries in cases:
+            cache.clear()
+            with self.assertNumQueries(queries, msg=question):
+                self.ask(question)
+
+    def test_parameterized_questions_compile_to_filtered_aggregates(self):
+        data = self.ask("Active loans above 6%")
+        self.assertEqual(data["answer"], "Active loans above 6%: 1 (outstanding $2000.00).")
+        self.assertEqual(data["facts"], {"active_loans_above_6%": {"count": 1, "outstanding_principal": "2000.00"}})
+
+        self.assertEqual(self.ask("loans under 8.5%")["facts"]["all_loans_under_8.5%"]["count"], 2)
+        self.assertEqual(
+            self.ask("payments last 7 days")["facts"], {"payments_last_7_days": {"count": 2, "amount": "30.00"}}
+        )
+        self.assertEqual(self.ask("payments in the past 1 day")["facts"]["payments_last_1_days"]["amount"], "10.00")
+
+    def test_intents_answer_in_question_order_without_double_matching(self):
+        data = self.ask("defaulted loans above 8% vs total customers")
+        self.assertEqual(data["answer"], "Defaulted loans above 8%: 1 (outstanding $3000.00). Total customers: 1.")
+        self.assertNotIn("defaulted_loans", data["facts"])
+        self.assertIn("I can answer", self.ask("loans above ten percent")["answer"])
+
+
+class ScheduledPaymentColumnTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(full_name="EMI User", email="emi@example.com")
+
+    def _stored(self, loan):
+        return Loan.objects.values_list("scheduled_monthly_payment", flat=True).get(pk=loan.pk)
+
+    def test_save_and_bulk_paths_keep_column_current(self):
+        loan = make_loan(self.customer, "250000.00", "6.50", 360)
+        self.assertEqual(self._stored(loan), Decimal("1580.17"))
+
+        loan.term_months = 180
+        loan.save(update_fields=["term_months"])
+        self.assertEqual(self._stored(loan), amortization.emi("250000.00", "6.50", 180))
+
+        Loan.objects.filter(annual_interest_rate=Decimal("6.50")).update(annual_interest_rate=Decimal("5.00"))
+        self.assertEqual(self._stored(loan), amortization.emi("250000.00", "5.00", 180))
+
+        loan.principal_amount = Decimal("100000.00")
+        Loan.objects.bulk_update([loan], ["principal_amount"])
+        self.assertEqual(self._stored(loan), amortization.emi("100000.00", "5.00", 180))
+
+        created = Loan.objects.bulk_create([
+            Loan(customer=self.customer, principal_amount=Decimal("1200.00"),
+                 annual_interest_rate=Decimal("0.00"), term_months=12, outstanding_principal=Decimal("1200.00")),
+        ])
+        self.assertEqual(self._stored(created[0]), Decimal("100.00"))
+
+    def test_emi_is_filterable_sortable_and_summable_in_sql(self):
+        small = make_loan(self.customer, "1200.00", "0.00", 12)
+        big = make_loan(self.customer, "250000.00", "6.50", 360)
+        with self.assertNumQueries(1):
+            total = Loan.objects.aggregate(s=Sum("scheduled_monthly_payment"))["s"]
+        self.assertEqual(total, Decimal("1680.17"))
+        self.assertEqual(list(Loan.objects.filter(scheduled_monthly_payment__gt=500)), [big])
+        self.assertEqual(list(Loan.objects.order_by("scheduled_monthly_payment")), [small, big])
+
+
+class ListPaginationTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+
+        customer = Customer.objects.create(full_name="Page User", email="page@example.com")
+        self.loan = make_loan(customer, "5000.00", "6.50", 24)
+        Payment.objects.bulk_create(
+            [Payment(loan=self.loan, amount=Decimal(i + 1), payment_date=date(2025, 1, 1)) for i in range(120)]
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("pager"))
+
+    def test_cursor_pages_walk_every_payment_once(self):
+        seen = []
+        url = "/api/payments/?page_size=50"
+        while url:
+            with self.assertNumQueries(1):
+                page = self.client.get(url).data
+            self.assertLessEqual(len(page["results"]), 50)
+            seen += [row["id"] for row in page["results"]]
+            url = page["next"]
+        self.assertEqual(sorted(seen), sorted(Payment.objects.values_list("id", flat=True)))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_fields_param_returns_sparse_rows(self):
+        rows = self.client.get("/api/loans/?fields=id,status").data["results"]
+        self.assertEqual(rows, [{"id": self.loan.id, "status": Loan.STATUS_ACTIVE}])
+
+        detail = self.client.get("/api/payments/?fields=id,amount&page_size=1").data["results"][0]
+        self.assertEqual(set(detail), {"id", "amount"})
+
+
+class PaymentAllocationTests(TransactionTestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(full_name="Alloc", email="alloc@example.com")
+        self.loan = make_loan(self.customer, "10000.00", "6.50", 12)
+
+    def _serial_balance(self, amounts):
+        balance, interest_paid = Decimal("10000.00"), Decimal("0.00")
+        for amount in amounts:
+            interest = amortization.interest_for(balance, Decimal("6.50"))
+            balance = max(balance - max(amount - interest, Decimal("0.00")), Decimal("0.00"))
+            interest_paid += interest
+        return balance, interest_paid
+
+    def test_concurrent_and_repeated_processing_applies_each_payment_once(self):
+        payments = [
+            Payment.objects.create(loan=self.loan, amount=Decimal("500.00"), payment_date=date.today())
+            for _ in range(6)
+        ]
+        applied = []
+        errors = []
+
+        def worker(payment_ids):
+            try:
+                for payment_id in payment_ids:
+                    if allocation.process_payment(payment_id) is not None:
+                        applied.append(payment_id)
+            except Exception as exc:  # surfaced below; a thread cannot fail the test itself
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        # every thread is handed every payment, in different orders
+        ids = [p.pk for p in payments]
+        threads = [threading.Thread(target=worker, args=(ids[i::2] + ids[(i + 1) % 2::2],)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(applied), ids)
+        self.loan.refresh_from_db()
+        balance, interest_paid = self._serial_balance([Decimal("500.00")] * len(ids))
+        self.assertEqual(self.loan.outstanding_principal, balance)
+        self.assertEqual(self.loan.total_interest_paid, interest_paid)
+        self.assertFalse(Payment.objects.filter(processed_at__isnull=True).exists())
+
+    def test_overpayment_clears_loan_and_second_call_is_a_noop(self):
+        payment = Payment.objects.create(loan=self.loan, amount=Decimal("20000.00"), payment_date=date.today())
+        result = allocation.process_payment(payment.pk)
+
+        self.assertEqual(result["loan"].outstanding_principal, Decimal("0.00"))
+        self.assertEqual(result["loan"].status, Loan.STATUS_PAID_OFF)
+        self.assertEqual(result["loan"].paid_off_date, date.today())
+        self.assertIsNone(allocation.process_payment(payment.pk))
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.total_interest_paid, result["interest_applied"])
+        # the recorded split stops at the balance that was owed
+        payment.refresh_from_db()
+        self.assertEqual(result["principal_applied"], Decimal("10000.00"))
+        self.assertEqual(payment.principal_component, Decimal("10000.00"))
+        self.assertIn("Principal: 10000.00", payment.note)
+
+
+class BulkPaymentIngestTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("ops", password="x", is_staff=True))
+        customer = Customer.objects.create(full_name="Bulk", email="bulk@example.com")
+        self.loan = make_loan(customer, "10000.00", "6.50", 12)
+        self.paid = make_loan(customer, "500.00", "6.50", 12)
+        Loan.objects.filter(pk=self.paid.pk).update(status=Loan.STATUS_PAID_OFF)
+
+    def _post(self, body, content_type):
+        return self.client.generic("POST", "/api/payments/bulk/", body.encode(), content_type=content_type)
+
+    def test_ndjson_inserts_valid_rows_and_reports_bad_ones(self):
+        body = "\n".join([
+            f'{{"loan": {self.loan.pk}, "amount": "100.00", "payment_date": "2024-01-05", "idempotency_key": "bank-1"}}',
+            f'{{"loan": {self.loan.pk}, "amount": "-5", "payment_date": "2024-01-06"}}',
+            "not json",
+            f'{{"loan": {self.paid.pk}, "amount": "10.00", "payment_date": "2024-01-06"}}',
+            '{"loan": 99999, "amount": "10.00", "payment_date": "2024-01-06"}',
+            "",
+            f'{{"loan": {self.loan.pk}, "amount": "50.00", "payment_date": "2024-02-05", "idempotency_key": "bank-1"}}',
+            f'{{"loan": {self.loan.pk}, "amount": "25.50", "payment_date": "2024-02-07"}}',
+        ])
+        response = self._post(body, "application/x-ndjson")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data["received"], response.data["created"], response.data["failed"]), (7, 2, 5))
+        self.assertEqual([e["line"] for e in response.data["errors"]], [2, 3, 4, 5, 7])
+
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.payments_count, 2)
+        self.assertEqual(self.loan.total_paid, Decimal("125.50"))
+        self.assertEqual(self.loan.last_payment_date, date(2024, 2, 7))
+
+    def test_csv_body_in_small_chunks(self):
+        rows = "".join(f"{self.loan.pk},{i}.00,2024-03-{i:02d},row {i}\r\n" for i in range(1, 8))
+        body = "\ufeffloan,amount,payment_date,note\r\n" + rows
+        # per chunk: in_bulk, SAVEPOINT, INSERT, stats UPDATE, RELEASE
+        with self.assertNumQueries(3 * 5):
+            report = ingest.ingest_payments(io.BytesIO(body.encode()), "text/csv; charset=utf-8", chunk_size=3)
+
+        self.assertEqual((report["created"], report["failed"]), (7, 0))
+        self.assertEqual(Payment.objects.filter(loan=self.loan).aggregate(t=Sum("amount"))["t"], Decimal("28.00"))
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.payments_count, 7)
+
+
+class EscrowLedgerTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("teller", password="x", is_staff=True))
+        customer = Customer.objects.create(full_name="Escrow", email="escrow@example.com")
+        self.a = make_loan(customer).escrow
+        self.b = make_loan(customer).escrow
+
+    def _ledger_total(self, account):
+        return account.transactions.aggregate(t=Sum("amount"))["t"]
+
+    def test_deposit_updates_balance_and_writes_ledger(self):
+        response = self.client.post(f"/api/escrows/{self.a.pk}/deposit/", {"amount": "150.25"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.balance, Decimal("150.25"))
+        self.assertEqual(self._ledger_total(self.a), Decimal("150.25"))
+
+    def test_batch_postings_are_all_or_nothing(self):
+        batch = [
+            {"escrow": self.a.pk, "kind": "DEPOSIT", "amount": "500.00"},
+            {"escrow": self.b.pk, "kind": "DEPOSIT", "amount": "80.00"},
+            {"escrow": self.a.pk, "kind": "DISBURSEMENT", "amount": "120.00", "note": "tax"},
+        ]
+        # SELECT ... FOR UPDATE, bulk UPDATE, loan version bump, bulk INSERT (+ savepoint pair)
+        with self.assertNumQueries(6):
+            response = self.client.post("/api/escrows/postings/", batch, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["posted"], 3)
+
+        overdraw = [
+            {"escrow": self.b.pk, "kind": "DEPOSIT", "amount": "1.00"},
+            {"escrow": self.b.pk, "kind": "DISBURSEMENT", "amount": "100.00"},
+        ]
+        response = self.client.post("/api/escrows/postings/", {"postings": overdraw}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+        self.a.refresh_from_db()
+        self.b.refresh_from_db()
+        self.assertEqual((self.a.balance, self.b.balance), (Decimal("380.00"), Decimal("80.00")))
+        self.assertEqual(self._ledger_total(self.a), self.a.balance)
+        self.assertEqual(self.b.transactions.count(), 1)
+
+    def test_reconcile_command_rebuilds_balance_from_ledger(self):
+        from django.core.management import call_command
+
+        self.client.post(f"/api/escrows/{self.a.pk}/deposit/", {"amount": "40.00"}, format="json")
+        EscrowAccount.objects.filter(pk=self.a.pk).update(balance=Decimal("999.00"))
+
+        out = io.StringIO()
+        call_command("reconcile_escrow", stdout=out)
+        self.assertIn("1 of 2 escrow accounts out of sync", out.getvalue())
+        call_command("reconcile_escrow", "--fix", stdout=io.StringIO())
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.balance, Decimal("40.00"))
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("finance", password="x", is_staff=True))
+        customer = Customer.objects.create(full_name="Export", email="export@example.com")
+        self.active = make_loan(customer)
+        self.defaulted = make_loan(customer, status=Loan.STATUS_DEFAULTED)
+        for day in (1, 15, 28):
+            Payment.objects.create(loan=self.active, amount=Decimal("10.00"), payment_date=date(2024, 2, day))
+        Payment.objects.create(loan=self.defaulted, amount=Decimal("99.00"), payment_date=date(2024, 2, 10))
+
+    def test_streams_csv_with_date_and_status_filters(self):
+        response = self.client.get("/api/exports/payments/", {"from": "2024-02-05", "to": "2024-02-28", "status": "ACTIVE"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], ",".join(exports.PAYMENT_COLUMNS))
+        self.assertEqual([line.split(",")[3] for line in lines[1:]], ["2024-02-15", "2024-02-28"])
+
+    def test_ndjson_export_and_bad_params(self):
+        response = self.client.get("/api/exports/loans/", {"fmt": "ndjson", "status": "DEFAULTED"})
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual([row["id"] for row in rows], [self.defaulted.pk])
+        self.assertEqual(rows[0]["principal_amount"], "10000.00")
+
+        self.assertEqual(self.client.get("/api/exports/loans/", {"fmt": "xml"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/exports/loans/", {"from": "yesterday"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/exports/customers/").status_code, 404)
+
+    def test_command_writes_the_same_rows(self):
+        from django.core.management import call_command
+
+        out = io.StringIO()
+        call_command("export_data", "payments", "--fmt", "ndjson", "--chunk-size", "2", stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 4)
+
+    def test_ndjson_sends_first_record_alone(self):
+        pieces = exports.stream_export("payments", "ndjson")
+        self.assertEqual(len(next(pieces).splitlines()), 1)
+        self.assertEqual(len(next(pieces).splitlines()), 3)
+
+
+class BenchmarkSuiteTests(TestCase):
+    def test_suite_reports_time_and_queries_per_case(self):
+        from . import benchmarks
+
+        report = benchmarks.run_suite(sizes=[20], repeat=1)
+        by_key = {benchmarks.result_key(r): r for r in report["results"]}
+
+        self.assertEqual(by_key["views.calculate_emi"]["queries"], 0)
+        # one run, so a cache miss: version lookup + the loan
+        self.assertEqual(by_key["amortization_preview n=360"]["queries"], 2)
+        # per-loan statements show up as a query count that scales with the loans
+        self.assertLess(by_key["process_daily_emi loans=20 mode=batched"]["queries"], 20)
+        self.assertGreater(by_key["process_daily_emi loans=20 mode=row_by_row"]["queries"], 20 * 4)
+        # the benchmark data is rolled back
+        self.assertFalse(Loan.objects.exists())
+
+        slower = {"results": [dict(r, queries=r["queries"] + 1) for r in report["results"]]}
+        self.assertTrue(benchmarks.compare(slower, report))
+        self.assertEqual(benchmarks.compare(report, report), [])
+
+
+class SeedDemoTests(TestCase):
+    def _seed(self, seed):
+        from django.core.management import call_command
+
+        call_command(
+            "seed_demo", "--customers", "12", "--loans-per-customer", "2", "--payments-per-loan", "30",
+            "--seed", str(seed), "--as-of", "2025-06-30", "--batch-size", "5", stdout=io.StringIO(),
+        )
+        return list(Loan.objects.order_by("id").values_list(
+            "principal_amount", "annual_interest_rate", "term_months", "start_date", "status",
+            "outstanding_principal", "payments_count", "total_paid",
+        ))
+
+    def test_generates_consistent_deterministic_portfolio(self):
+        from django.core.management import call_command
+
+        first = self._seed(3)
+        self.assertEqual(len(first), 24)
+        self.assertEqual(EscrowAccount.objects.count(), 24)
+        self.assertEqual(Payment.objects.count(), sum(row[6] for row in first))
+        for row in first:
+            self.assertEqual(row[4] == Loan.STATUS_PAID_OFF, row[5] == 0)
+        self.assertTrue(Loan.objects.filter(scheduled_monthly_payment__gt=0).exists())
+
+        for command in ("reconcile_payment_stats", "reconcile_escrow"):
+            out = io.StringIO()
+            call_command(command, stdout=out)
+            self.assertIn("in sync", out.getvalue())
+
+        Customer.objects.all().delete()
+        self.assertEqual(self._seed(3), first)
+        self.assertNotEqual(self._seed(4)[len(first):], first)
+
+
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+
+        from . import metrics
+
+        metrics.reset()
+        self.admin = User.objects.create_user("admin", password="x", is_staff=True)
+        customer = Customer.objects.create(full_name="Perf", email="perf@example.com")
+        for _ in range(3):
+            make_loan(customer)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_server_timing_and_prometheus_metrics(self):
+        response = self.client.get("/api/loans/")
+        self.assertEqual(response.status_code, 200)
+        timing = response["Server-Timing"]
+        self.assertRegex(timing, r'^db;dur=[\d.]+;desc="\d+ queries", ser;dur=[\d.]+, total;dur=[\d.]+$')
+
+        body = self.client.get("/api/metrics/").content.decode()
+        self.assertIn('loan_app_request_duration_seconds_count{view="LoanViewSet.list",method="GET"} 1', body)
+        self.assertIn('loan_app_db_queries_total{view="LoanViewSet.list",method="GET"}', body)
+        self.assertRegex(body, r'loan_app_serializer_seconds_total\{view="LoanViewSet.list",method="GET"\} 0\.\d*[1-9]')
+
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+
+        reader = APIClient()
+        reader.force_authenticate(User.objects.create_user("reader", password="x"))
+        self.assertEqual(reader.get("/api/metrics/").status_code, 403)
+
+    def test_budget_overruns_and_repeated_queries_are_logged(self):
+        from rest_framework.test import APIClient
+
+        from . import metrics
+
+        with override_settings(PERF_QUERY_BUDGET=0, PERF_REPEATED_QUERY_THRESHOLD=0, PERF_LATENCY_BUDGET_MS=0):
+            client = APIClient()
+            client.force_authenticate(self.admin)
+            with self.assertNoLogs("loan_app.performance", "WARNING"):
+                client.get("/api/loans/summaries/")
+
+        escrow = EscrowAccount.objects.first()
+        with override_settings(PERF_QUERY_BUDGET=2, PERF_REPEATED_QUERY_THRESHOLD=0):
+            client = APIClient()
+            client.force_authenticate(self.admin)
+            with self.assertLogs("loan_app.performance", "WARNING") as logs:
+                # lock, UPDATE, version bump, INSERT inside a savepoint: 6 statements
+                client.post("/api/escrows/postings/", [{"escrow": escrow.pk, "kind": "DEPOSIT", "amount": "1.00"}], format="json")
+        self.assertIn("EscrowViewSet.postings", logs.output[0])
+        self.assertIn("6 queries", logs.output[0])
+
+        stats = metrics.RequestStats()
+        run = lambda sql, params, many, context: None
+        for loan_id in (1, 2, 3):
+            stats(run, 'SELECT * FROM "loan_app_escrowaccount" WHERE "loan_id" = %s', (loan_id,), False, {})
+        stats(run, 'SELECT * FROM "loan_app_loan"', (), False, {})
+        self.assertEqual(stats.queries, 4)
+        self.assertEqual(
+            stats.repeated_statements(3), [('SELECT * FROM "loan_app_escrowaccount" WHERE "loan_id" = %s', 3)]
+        )
+
+
+class LoanVersionCacheTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("poller", password="x", is_staff=True))
+        customer = Customer.objects.create(full_name="Poll", email="poll@example.com")
+        self.loan = make_loan(customer, "10000.00", "6.50", 12)
+
+    def _version(self):
+        return Loan.objects.values_list("version", flat=True).get(pk=self.loan.pk)
+
+    def test_every_write_path_bumps_the_version(self):
+        seen = [self._version()]
+
+        def bumped():
+            seen.append(self._version())
+            return seen[-1] > seen[-2]
+
+        payment = Payment.objects.create(loan=self.loan, amount=Decimal("900.00"), payment_date=date.today())
+        self.assertTrue(bumped())
+        allocation.process_payment(payment.pk)
+        self.assertTrue(bumped())
+        self.client.post(f"/api/escrows/{self.loan.escrow.pk}/deposit/", {"amount": "5.00"}, format="json")
+        self.assertTrue(bumped())
+        process_daily_emi(batch_size=10)
+        self.assertTrue(bumped())
+
+        stale = Loan.objects.get(pk=self.loan.pk)
+        Loan.objects.filter(pk=self.loan.pk).update(status=Loan.STATUS_DEFAULTED)
+        self.assertTrue(bumped())
+        stale.save()  # an older copy must still move the version forward
+        self.assertTrue(bumped())
+        self.assertEqual(stale.version, seen[-1])
+
+    def test_escrow_account_writes_bump_old_and_new_loan(self):
+        other = make_loan(self.loan.customer, "5000.00", "6.50", 12)
+        EscrowAccount.objects.filter(loan=other).delete()
+        before = dict(Loan.objects.values_list("pk", "version"))
+
+        escrow = EscrowAccount.objects.get(loan=self.loan)
+        escrow.loan = other
+        escrow.save()
+        after = dict(Loan.objects.values_list("pk", "version"))
+        self.assertGreater(after[self.loan.pk], before[self.loan.pk])
+        self.assertGreater(after[other.pk], before[other.pk])
+
+        escrow.delete()
+        self.assertGreater(Loan.objects.get(pk=other.pk).version, after[other.pk])
+
+    def test_etag_304_and_cache_hits(self):
+        for url in (
+            f"/api/loans/{self.loan.pk}/summary/",
+            f"/api/loans/{self.loan.pk}/",
+            f"/api/loans/{self.loan.pk}/amortization_preview/?n=12",
+        ):
+            first = self.client.get(url)
+            self.assertEqual(first.status_code, 200)
+            etag = first["ETag"]
+
+            with self.assertNumQueries(1):  # version lookup only
+                cached = self.client.get(url)
+            self.assertEqual(cached.data, first.data)
+            with self.assertNumQueries(1):
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+            Payment.objects.create(loan=self.loan, amount=Decimal("10.00"), payment_date=date.today())
+            fresh = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(fresh.status_code, 200)
+            self.assertNotEqual(fresh["ETag"], etag)
+
+        other = self.client.get(f"/api/loans/{self.loan.pk}/amortization_preview/?n=3")
+        self.assertEqual(len(other.data["rows"]), 3)
+        self.assertEqual(self.client.get("/api/loans/999999/summary/").status_code, 404)
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "parses SQLite EXPLAIN QUERY PLAN output")
+class QueryPlanTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        from .query_plans import full_scan_report
+
+        self.assertEqual(full_scan_report(), {})
+
+    def test_detects_full_scan(self):
+        from .query_plans import full_scan_report
+
+        report = full_scan_report({"unindexed": lambda: Payment.objects.filter(note="x")})
+        self.assertIn("unindexed", report)
+
+    def test_other_backends_report_not_checked(self):
+        from unittest import mock
+        from .query_plans import full_scan_report
+
+        with mock.patch.object(connection, "vendor", "postgresql"):
+            self.assertIsNone(full_scan_report())
+
+
+class DatabaseProfileTests(TransactionTestCase):
+    def test_sqlite_pragmas_applied_to_new_connections(self):
+        from .database import sqlite_pragmas
+
+        pragmas = sqlite_pragmas(connection)
+        # the in-memory test database cannot use WAL; the other PRAGMAs still apply
+        self.assertEqual(pragmas["synchronous"], 1)  # NORMAL
+        self.assertEqual(pragmas["busy_timeout"], settings.SQLITE_PRAGMAS["busy_timeout"])
+
+    def test_concurrent_payment_writes_all_land(self):
+        from . import benchmarks
+
+        result = benchmarks.bench_payment_writes(payments=30, writers=3, loans=4)
+
+        self.assertEqual(result["failed"], 0, result["sample_errors"])
+        self.assertEqual(result["processed"], 30)
+        self.assertEqual(Payment.objects.filter(processed_at__isnull=True).count(), 0)
+
+
+class AsyncReadPathTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+        from rest_framework.test import APIClient
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        cache.clear()
+        user = User.objects.create_user("async-reader", email="reader@example.com")
+        self.sync_client = APIClient()
+        self.sync_client.force_authenticate(user)
+        self.auth = {"headers": {"Authorization": f"Bearer {AccessToken.for_user(user)}"}}
+        customer = Customer.objects.create(full_name="Async", email="async@example.com")
+        self.loan = make_loan(customer, "12000.00", "7.25", 24)
+        Payment.objects.create(loan=self.loan, amount=Decimal("540.00"), payment_date=date(2026, 1, 5))
+
+    async def test_summary_and_preview_match_the_sync_endpoints(self):
+        for sync_url, async_url in (
+            (f"/api/loans/{self.loan.pk}/summary/", f"/api/async/loans/{self.loan.pk}/summary/"),
+            (f"/api/loans/{self.loan.pk}/amortization_preview/?n=12",
+             f"/api/async/loans/{self.loan.pk}/amortization_preview/?n=12"),
+        ):
+            response = await self.async_client.get(async_url, **self.auth)
+            self.assertEqual(response.status_code, 200)
+            expected = await sync_to_async(self.sync_client.get)(sync_url)
+            self.assertEqual(json.loads(response.content), json.loads(expected.content))
+            # same cache entry and validators on either path
+            self.assertEqual(response["ETag"], expected["ETag"])
+            revalidated = await self.async_client.get(
+                async_url, headers={**self.auth["headers"], "If-None-Match": expected["ETag"]}
+            )
+            self.assertEqual(revalidated.status_code, 304)
+
+        missing = await self.async_client.get("/api/async/loans/999999/summary/", **self.auth)
+        self.assertEqual(missing.status_code, 404)
+        anonymous = await self.async_client.get(f"/api/async/loans/{self.loan.pk}/summary/")
+        self.assertEqual(anonymous.status_code, 401)
+
+    async def test_concurrent_requests_count_only_their_own_queries(self):
+        url = f"/api/async/loans/{self.loan.pk}/summary/"
+        responses = await asyncio.gather(*(self.async_client.get(url, **self.auth) for _ in range(3)))
+        for response in responses:
+            # the user, the version lookup and (on a cache miss) the loan -- not the others' queries
+            queries = int(re.search(r'"(\d+) queries"', response["Server-Timing"]).group(1))
+            self.assertIn(queries, (2, 3))
+
+    async def test_me_and_ai_query(self):
+        me = await self.async_client.get("/api/async/me/", **self.auth)
+        self.assertEqual(json.loads(me.content)["username"], "async-reader")
+        self.assertIn("Server-Timing", me)
+
+        for question in ("active loans", "outstanding principal", "recent payments", "what?", ""):
+            response = await self.async_client.post(
+                "/api/async/ai/query/", {"question": question}, content_type="application/json", **self.auth
+            )
+            expected = await sync_to_async(self.sync_client.post)(
+                "/api/ai/query/", {"question": question}, format="json"
+            )
+            self.assertEqual(json.loads(response.content), json.loads(expected.content), question)
+
+    async def test_portfolio_facts_match_sync(self):
+        from . import portfolio
+
+        await sync_to_async(portfolio.invalidate)()
+        facts = await portfolio.aget_facts()
+        self.assertEqual(facts, await sync_to_async(portfolio.get_facts)())
+
+
+class PortfolioForecastTests(TestCase):
+    as_of = date(2026, 10, 15)
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("forecaster"))
+        customer = Customer.objects.create(full_name="Forecast", email="forecast@example.com")
+        self.loans = [
+            make_loan(customer, "12000.00", "7.25", 24, start_date=date(2026, 7, 1)),
+            make_loan(customer, "3000.00", "0.00", 6, start_date=date(2026, 9, 10)),
+            # past maturity with a balance left: all of it is due in the first month
+            make_loan(customer, "2000.00", "9.00", 12, start_date=date(2024, 1, 1)),
+        ]
+        Loan.objects.filter(pk=self.loans[0].pk).update(outstanding_principal=Decimal("10987.65"))
+        make_loan(customer, "5000.00", "11.00", 36, start_date=date(2025, 3, 1), status=Loan.STATUS_DEFAULTED)
+        paid = make_loan(customer, "800.00", "5.00", 12, start_date=date(2026, 1, 1))
+        Loan.objects.filter(pk=paid.pk).update(status=Loan.STATUS_PAID_OFF, outstanding_principal=Decimal("0"))
+
+    def _decimal_projection(self, months):
+        """The same assumptions, loan by loan in Decimal."""
+        from . import forecast
+
+        totals = [{"interest": Decimal(0), "principal": Decimal(0), "balance": Decimal(0)} for _ in range(months)]
+        for loan in Loan.objects.filter(status=Loan.STATUS_ACTIVE):
+            balance = loan.outstanding_principal
+            remaining = max(1, min(loan.term_months, loan.term_months - forecast.months_between(loan.start_date, self.as_of)))
+            for t in range(months):
+                interest = amortization.interest_for(balance, loan.annual_interest_rate)
+                principal = min(max(loan.scheduled_monthly_payment - interest, Decimal(0)), balance)
+                if remaining <= t + 1:
+                    principal = balance
+                balance -= principal
+                totals[t]["interest"] += interest
+                totals[t]["principal"] += principal
+                totals[t]["balance"] += balance
+        return totals
+
+    def test_matches_loan_by_loan_projection(self):
+        from . import forecast
+
+        with self.assertNumQueries(1):
+            result = forecast.forecast(months=30, as_of=self.as_of)
+        self.assertEqual(result["loans"], 3)
+        [group] = result["groups"]
+        expected = self._decimal_projection(30)
+        for row, want in zip(group["rows"], expected):
+            self.assertEqual(Decimal(str(row["interest"])), want["interest"], row["month"])
+            self.assertEqual(Decimal(str(row["principal"])), want["principal"], row["month"])
+            self.assertEqual(Decimal(str(row["balance_end"])), want["balance"], row["month"])
+        self.assertEqual(group["rows"][0]["month"], "2026-11")
+        self.assertEqual(group["rows"][0]["paying_loans"], 3)
+        self.assertEqual(group["rows"][-1]["balance_end"], 0)
+        # every cent outstanding is eventually collected as principal
+        self.assertEqual(Decimal(str(group["totals"]["principal"])), Decimal(str(group["opening_balance"])))
+
+    def test_groups_partition_the_portfolio(self):
+        from . import forecast
+
+        statuses = (Loan.STATUS_ACTIVE, Loan.STATUS_DEFAULTED)
+        whole = forecast.forecast(24, "portfolio", statuses, self.as_of)["groups"][0]
+        for group_by, keys in (("status", ["ACTIVE", "DEFAULTED"]), ("origination_month", ["2024-01", "2025-03", "2026-07", "2026-09"])):
+            groups = forecast.forecast(24, group_by, statuses, self.as_of)["groups"]
+            self.assertEqual([g["key"] for g in groups], keys)
+            for name in ("payment", "interest", "principal"):
+                self.assertAlmostEqual(sum(g["totals"][name] for g in groups), whole["totals"][name], places=2)
+
+    def test_endpoint(self):
+        response = self.client.get("/api/portfolio/forecast/", {"months": 6, "group_by": "status", "as_of": "2026-10-15"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["groups"][0]["rows"]), 6)
+        for params in ({"months": 0}, {"months": "x"}, {"group_by": "customer"}, {"status": "PAID_OFF"}, {"as_of": "soon"}):
+            self.assertEqual(self.client.get("/api/portfolio/forecast/", params).status_code, 400, params)
+
+
+class PortfolioSnapshotTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from django.utils import timezone
+        from rest_framework.test import APIClient
+        from datetime import timedelta
+
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("trends"))
+        self.today = date.today()
+        self.days_ago = lambda n: self.today - timedelta(days=n)
+        customer = Customer.objects.create(full_name="Trend", email="trend@example.com")
+        a = make_loan(customer, "1000.00", "6.00", 12, start_date=self.days_ago(10))
+        b = make_loan(customer, "500.00", "4.80", 12, start_date=self.days_ago(3))
+        make_loan(customer, "300.00", "9.00", 12, start_date=self.days_ago(20), status=Loan.STATUS_DEFAULTED)
+        now = timezone.now()
+        Payment.objects.bulk_create([
+            Payment(loan=a, amount=Decimal("105.00"), payment_date=self.days_ago(5), processed_at=now,
+                    principal_component=Decimal("100.00"), interest_component=Decimal("5.00")),
+            Payment(loan=a, amount=Decimal("54.00"), payment_date=self.days_ago(1), processed_at=now,
+                    principal_component=Decimal("50.00"), interest_component=Decimal("4.00")),
+            Payment(loan=b, amount=Decimal("22.00"), payment_date=self.today, processed_at=now,
+                    principal_component=Decimal("20.00"), interest_component=Decimal("2.00")),
+            # not applied yet: collected, but no split
+            Payment(loan=b, amount=Decimal("7.00"), payment_date=self.today),
+        ])
+        Loan.objects.filter(pk=a.pk).update(outstanding_principal=Decimal("850.00"), total_interest_paid=Decimal("9.00"))
+        Loan.objects.filter(pk=b.pk).update(outstanding_principal=Decimal("480.00"), total_interest_paid=Decimal("2.00"))
+
+    def test_record_writes_todays_row(self):
+        from . import snapshots
+
+        with self.assertNumQueries(3):
+            snapshots.record()
+        snapshots.record()  # overwrites, no duplicate
+        [row] = PortfolioSnapshot.objects.all()
+        self.assertEqual(row.date, self.today)
+        self.assertEqual(row.outstanding_principal, Decimal("1630.00"))
+        self.assertEqual(row.total_interest_paid, Decimal("11.00"))
+        self.assertEqual((row.payments_count, row.amount_collected), (2, Decimal("29.00")))
+        self.assertEqual((row.principal_collected, row.interest_collected), (Decimal("20.00"), Decimal("2.00")))
+        self.assertEqual((row.active_loans, row.paid_off_loans, row.defaulted_loans), (2, 0, 1))
+
+    def test_backfill_walks_back_from_the_live_book(self):
+        from . import snapshots
+
+        snapshots.record()
+        recorded = PortfolioSnapshot.objects.values(*snapshots.SNAPSHOT_FIELDS).get()
+        with self.assertNumQueries(5):  # loans, payments, one upsert (inside a savepoint here)
+            self.assertEqual(snapshots.backfill(self.days_ago(12)), 13)
+        rows = {s.date: s for s in PortfolioSnapshot.objects.all()}
+        self.assertEqual(len(rows), 13)
+        self.assertEqual(PortfolioSnapshot.objects.values(*snapshots.SNAPSHOT_FIELDS).get(date=self.today), recorded)
+
+        expected = {12: ("300.00", "0.00", 1), 10: ("1300.00", "0.00", 2), 5: ("1200.00", "5.00", 2),
+                    3: ("1700.00", "5.00", 3), 1: ("1650.00", "9.00", 3)}
+        for n, (outstanding, interest, loans) in expected.items():
+            row = rows[self.days_ago(n)]
+            self.assertEqual(row.outstanding_principal, Decimal(outstanding), n)
+            self.assertEqual(row.total_interest_paid, Decimal(interest), n)
+            self.assertEqual(row.active_loans + row.defaulted_loans, loans, n)
+        self.assertEqual(rows[self.days_ago(5)].principal_collected, Decimal("100.00"))
+        self.assertEqual(rows[self.days_ago(4)].payments_count, 0)
+
+    def test_backfill_with_an_overpayment(self):
+        from . import snapshots
+
+        loan = make_loan(Customer.objects.get(), "10000.00", "6.50", 12, start_date=self.days_ago(8))
+        paid = Payment.objects.create(loan=loan, amount=Decimal("20000.00"), payment_date=self.days_ago(4))
+        allocation.process_payment(paid.pk)
+        snapshots.backfill(self.days_ago(12))
+        self.assertEqual(PortfolioSnapshot.objects.get(date=self.days_ago(5)).outstanding_principal, Decimal("11200.00"))
+        self.assertEqual(PortfolioSnapshot.objects.get(date=self.days_ago(4)).outstanding_principal, Decimal("1200.00"))
+        self.assertEqual(PortfolioSnapshot.objects.get(date=self.days_ago(4)).principal_collected, Decimal("10000.00"))
+
+        # a legacy uncapped split still cannot put more on the book than was lent
+        Payment.objects.filter(pk=paid.pk).update(principal_component=Decimal("19945.83"))
+        snapshots.backfill(self.days_ago(12))
+        for n, lent in ((9, "1300.00"), (5, "11300.00")):
+            self.assertLessEqual(PortfolioSnapshot.objects.get(date=self.days_ago(n)).outstanding_principal, Decimal(lent))
+
+    def test_task_and_emi_run_refresh_today(self):
+        from .tasks import snapshot_portfolio
+
+        snapshot_portfolio(self.days_ago(2).isoformat())
+        self.assertTrue(PortfolioSnapshot.objects.filter(date=self.days_ago(2)).exists())
+        process_daily_emi()
+        self.assertEqual(
+            PortfolioSnapshot.objects.get(date=self.today).outstanding_principal,
+            Loan.objects.aggregate(total=Sum("outstanding_principal"))["total"],
+        )
+
+    def test_endpoint(self):
+        from . import snapshots
+
+        snapshots.backfill(self.days_ago(12))
+        response = self.client.get("/api/portfolio/snapshots/", {"from": self.days_ago(5).isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 6)
+        self.assertEqual(response.data["results"][0]["date"], self.days_ago(5).isoformat())
+        self.assertEqual(response.data["results"][-1]["outstanding_principal"], "1630.00")
+        self.assertEqual(len(self.client.get("/api/portfolio/snapshots/").data["results"]), 13)
+        for params in ({"from": "yesterday"}, {"from": "2026-02-01", "to": "2026-01-01"},
+                       {"from": "2000-01-01", "to": "2026-01-01"}):
+            self.assertEqual(self.client.get("/api/portfolio/snapshots/", params).status_code, 400, params)
+
+
+class PaymentComponentTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+
+        self.customer = Customer.objects.create(full_name="Split User", email="split@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("collections"))
+
+    def test_every_processing_path_records_the_split(self):
+        make_loan(self.customer, "10000.00", "6.50", 12)
+        make_loan(self.customer, "2500.00", "9.00", 6)
+        process_daily_emi()
+        process_daily_emi(batch_size=1)
+        loan = make_loan(self.customer, "1000.00", "12.00", 12)
+        received = Payment.objects.create(loan=loan, amount=Decimal("100.00"))
+        result = allocation.process_payment(received.pk)
+
+        received.refresh_from_db()
+        self.assertEqual(received.principal_component, result["principal_applied"])
+        self.assertEqual(received.interest_component, result["interest_applied"])
+        for payment in Payment.objects.all():
+            self.assertEqual(payment.principal_component + payment.interest_component, payment.amount, payment.note)
+        totals = Payment.objects.aggregate(principal=Sum("principal_component"), interest=Sum("interest_component"))
+        book = Loan.objects.aggregate(interest=Sum("total_interest_paid"), principal=Sum("principal_amount"),
+                                      outstanding=Sum("outstanding_principal"))
+        self.assertEqual(amortization.to_cents(totals["interest"]), amortization.to_cents(book["interest"]))
+        self.assertEqual(amortization.to_cents(totals["principal"]),
+                         amortization.to_cents(book["principal"] - book["outstanding"]))
+
+    def test_migration_backfills_from_notes(self):
+        import importlib
+        from django.apps import apps
+        from django.utils import timezone
+
+        migration = importlib.import_module("loan_app.migrations.0012_payment_components")
+        loan = make_loan(self.customer)
+        now = timezone.now()
+        Payment.objects.bulk_create([
+            Payment(loan=loan, amount=Decimal("60.00"), processed_at=now,
+                    note=allocation.processed_note(Decimal("50.00"), Decimal("10.00"))),
+            Payment(loan=loan, amount=Decimal("7.50"), processed_at=now,
+                    note="Auto EMI via Celery | principal=5.25 interest=2.25"),
+            Payment(loan=loan, amount=Decimal("9.00"), note="not processed"),
+        ])
+        migration.backfill_components(apps, None)
+        self.assertEqual(
+            list(Payment.objects.order_by("id").values_list("principal_component", "interest_component")),
+            [(Decimal("50.00"), Decimal("10.00")), (Decimal("5.25"), Decimal("2.25")), (None, None)],
+        )
+
+    def test_collections_report_is_one_aggregate(self):
+        from django.utils import timezone
+
+        loan = make_loan(self.customer)
+        now = timezone.now()
+        Payment.objects.bulk_create([
+            Payment(loan=loan, amount=Decimal("60.00"), payment_date=date(2026, 1, 5), processed_at=now,
+                    principal_component=Decimal("50.00"), interest_component=Decimal("10.00")),
+            Payment(loan=loan, amount=Decimal("61.00"), payment_date=date(2026, 1, 20), processed_at=now,
+                    principal_component=Decimal("52.00"), interest_component=Decimal("9.00")),
+            Payment(loan=loan, amount=Decimal("70.00"), payment_date=date(2026, 3, 2)),
+            Payment(loan=loan, amount=Decimal("1.00"), payment_date=date(2025, 12, 31)),
+        ])
+        url = "/api/reports/collections/"
+        with self.assertNumQueries(1):
+            data = self.client.get(url, {"from": "2026-01-01", "to": "2026-06-30"}).data
+        self.assertEqual([row["period"] for row in data["results"]], ["2026-01", "2026-03"])
+        self.assertEqual(data["results"][0]["principal_collected"], Decimal("102.00"))
+        self.assertEqual(data["results"][1]["interest_collected"], Decimal("0.00"))
+        self.assertEqual(data["totals"], {"payments_count": 3, "amount_collected": Decimal("191.00"),
+                                          "principal_collected": Decimal("102.00"),
+                                          "interest_collected": Decimal("19.00")})
+        daily = self.client.get(url, {"from": "2026-01-01", "to": "2026-01-31", "group_by": "day"}).data
+        self.assertEqual([row["period"] for row in daily["results"]], ["2026-01-05", "2026-01-20"])
+        for params in ({"group_by": "year"}, {"from": "2026-02-01", "to": "2026-01-01"}):
+            self.assertEqual(self.client.get(url, params).status_code, 400, params)
+
+
+class LoanCheckpointTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from django.utils import timezone
+        from rest_framework.test import APIClient
+        from .schedules import add_months
+
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("auditor"))
+        customer = Customer.objects.create(full_name="Audit", email="audit@example.com")
+        self.loans = [
+            make_loan(customer, "1200.00", "12.00", 12, start_date=date(2025, 1, 15)),
+            make_loan(customer, "5000.00", "7.00", 24, start_date=date(2025, 3, 3)),
+        ]
+        self.late = make_loan(customer, "900.00", "5.00", 6, start_date=date(2025, 9, 1))
+        for loan, months in ((self.loans[0], 10), (self.loans[1], 8)):
+            balance, interest_paid, payments = loan.principal_amount, Decimal("0.00"), []
+            for period in range(1, months + 1):
+                interest = amortization.interest_for(balance, loan.annual_interest_rate)
+                principal = min(loan.scheduled_monthly_payment - interest, balance)
+                payments.append(Payment(
+                    loan=loan, amount=principal + interest, payment_date=add_months(loan.start_date, period),
+                    processed_at=timezone.now(), principal_component=principal, interest_component=interest,
+                ))
+                balance -= principal
+                interest_paid += interest
+            Payment.objects.bulk_create(payments)
+            Loan.objects.filter(pk=loan.pk).update(outstanding_principal=balance, total_interest_paid=interest_paid)
+
+    def _replay(self, loan, day):
+        """Reference: every payment from origination."""
+        payments = Payment.objects.filter(loan=loan, payment_date__lte=day)
+        return (
+            loan.principal_amount - sum((p.principal_component for p in payments), Decimal("0.00")),
+            sum((p.interest_component for p in payments), Decimal("0.00")),
+        )
+
+    def _assert_matches_replay(self, day):
+        from . import checkpoints
+
+        with self.assertNumQueries(1):
+            states = checkpoints.as_of(Loan.objects.filter(pk__in=[loan.pk for loan in self.loans]), day)
+        for loan in self.loans:
+            state = states[loan.pk]
+            if loan.start_date > day:
+                self.assertIsNone(state)
+                continue
+            self.assertEqual((state["outstanding_principal"], state["total_interest_paid"]), self._replay(loan, day), day)
+        return states
+
+    def test_as_of_without_checkpoints_replays_from_origination(self):
+        states = self._assert_matches_replay(date(2025, 6, 20))
+        self.assertIsNone(states[self.loans[0].pk]["checkpoint_date"])
+        self.assertEqual(states[self.loans[0].pk]["payments_replayed"], 5)
+
+    def test_checkpoints_bound_the_replay(self):
+        from . import checkpoints
+
+        days = checkpoints.month_ends(date(2025, 1, 1), date(2025, 12, 31))
+        self.assertEqual((days[0], days[1], len(days)), (date(2025, 1, 31), date(2025, 2, 28), 12))
+        # loan 0: 12 month-ends, loan 1: from March, the late loan: from September
+        self.assertEqual(checkpoints.write(days), 12 + 10 + 4)
+        for day in (date(2025, 1, 31), date(2025, 3, 14), date(2025, 6, 20), date(2025, 11, 15), date(2026, 2, 1)):
+            states = self._assert_matches_replay(day)
+            for state in filter(None, states.values()):
+                self.assertLessEqual(state["payments_replayed"], 1)
+        state = checkpoints.as_of(Loan.objects.filter(pk=self.loans[0].pk), date(2025, 6, 20))[self.loans[0].pk]
+        self.assertEqual(state["checkpoint_date"], "2025-05-31")
+        self.assertEqual(state["status"], Loan.STATUS_ACTIVE)
+        with self.assertRaises(ValueError):
+            checkpoints.write([date.today()])
+
+    def test_processing_a_backdated_payment_moves_later_checkpoints(self):
+        from . import checkpoints
+
+        loan = self.loans[0]
+        checkpoints.write(checkpoints.month_ends(date(2025, 1, 1), date(2025, 12, 31)))
+        late = Payment.objects.create(loan=loan, amount=Decimal("300.00"), payment_date=date(2025, 3, 20))
+        result = allocation.process_payment(late.pk)
+        self.assertEqual(LoanCheckpoint.objects.get(loan=loan, date=date(2025, 2, 28)).outstanding_principal,
+                         self._replay(loan, date(2025, 2, 28))[0])
+        self._assert_matches_replay(date(2025, 3, 31))
+        state = checkpoints.as_of(Loan.objects.filter(pk=loan.pk), date.today())[loan.pk]
+        self.assertEqual(state["outstanding_principal"], result["loan"].outstanding_principal)
+        self.assertEqual(state["total_interest_paid"], result["loan"].total_interest_paid)
+
+    def test_overpayment_after_a_checkpoint(self):
+        from . import checkpoints
+
+        loan = make_loan(self.loans[0].customer, "10000.00", "6.50", 12, start_date=date(2025, 5, 2))
+        paid = Payment.objects.create(loan=loan, amount=Decimal("20000.00"), payment_date=date(2025, 6, 15))
+        allocation.process_payment(paid.pk)
+        checkpoints.write([date(2025, 5, 31), date(2025, 6, 30)])
+
+        before = LoanCheckpoint.objects.get(loan=loan, date=date(2025, 5, 31))
+        self.assertEqual((before.outstanding_principal, before.status), (Decimal("10000.00"), Loan.STATUS_ACTIVE))
+        after = LoanCheckpoint.objects.get(loan=loan, date=date(2025, 6, 30))
+        self.assertEqual((after.outstanding_principal, after.status), (Decimal("0.00"), Loan.STATUS_PAID_OFF))
+        for day, balance, status in ((date(2025, 6, 1), "10000.00", Loan.STATUS_ACTIVE),
+                                     (date(2025, 6, 20), "0.00", Loan.STATUS_PAID_OFF)):
+            state = self.client.get(f"/api/loans/{loan.pk}/as_of/", {"date": day.isoformat()}).data
+            self.assertEqual((state["outstanding_principal"], state["status"]), (Decimal(balance), status), day)
+
+        # a split recorded uncapped (before the cap existed) cannot push a checkpoint past the principal
+        Payment.objects.filter(pk=paid.pk).update(principal_component=Decimal("19945.83"))
+        checkpoints.write([date(2025, 5, 31)])
+        self.assertEqual(LoanCheckpoint.objects.get(loan=loan, date=date(2025, 5, 31)).outstanding_principal,
+                         Decimal("10000.00"))
+
+    def test_task_checkpoints_yesterday(self):
+        from datetime import timedelta
+        from .tasks import checkpoint_loans
+
+        checkpoint_loans()
+        yesterday = date.today() - timedelta(days=1)
+        self.assertEqual(LoanCheckpoint.objects.filter(date=yesterday).count(), 3)
+        checkpoint = LoanCheckpoint.objects.get(loan=self.loans[0], date=yesterday)
+        self.assertEqual(checkpoint.outstanding_principal, Loan.objects.get(pk=self.loans[0].pk).outstanding_principal)
+
+    def test_endpoints(self):
+        loan = self.loans[1]
+        response = self.client.get(f"/api/loans/{loan.pk}/as_of/", {"date": "2025-07-10"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["outstanding_principal"], self._replay(loan, date(2025, 7, 10))[0])
+        self.assertEqual(self.client.get(f"/api/loans/{self.late.pk}/as_of/", {"date": "2025-07-10"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/loans/999999/as_of/", {"date": "2025-07-10"}).status_code, 404)
+        self.assertEqual(self.client.get("/api/loans/abc/as_of/", {"date": "2025-07-10"}).status_code, 404)
+        for params in ({}, {"date": "last week"}, {"date": "2999-01-01"}):
+            self.assertEqual(self.client.get(f"/api/loans/{loan.pk}/as_of/", params).status_code, 400, params)
+
+        ids = f"{self.loans[0].pk},{loan.pk},{self.late.pk},999999"
+        with self.assertNumQueries(1):
+            data = self.client.get("/api/loans/as_of/", {"date": "2025-07-10", "ids": ids}).data
+        self.assertEqual([row["loan_id"] for row in data["results"]], [self.loans[0].pk, loan.pk])
+        self.assertEqual((data["not_started_ids"], data["missing_ids"]), ([self.late.pk], [999999]))
+        self.assertEqual(self.client.get("/api/loans/as_of/", {"date": "2025-07-10"}).status_code, 400)
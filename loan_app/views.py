@@ -1,115 +1,199 @@
 # loan_app/views.py
-from decimal import Decimal, ROUND_HALF_UP
-from django.db.models import Sum, Max, Q
+from datetime import date, timedelta
+from decimal import Decimal
+from django.db.models.functions import TruncDay, TruncMonth
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 
 from rest_framework import status, viewsets
 from rest_framework.decorators import action, api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, IsAuthenticatedOrReadOnly
 from rest_framework.response import Response
 
-from .models import Customer, Loan, Payment, EscrowAccount
+from . import allocation, amortization, checkpoints, exports, forecast, ingest, intents, loan_cache, metrics, schedules
+from . import snapshots
+from . import escrow as escrow_ops
+from .models import Customer, Loan, Payment, EscrowAccount, EscrowTransaction, PortfolioSnapshot
+from .intents import AI_EMPTY_ANSWER
 from .permissions import IsAdminOrReadOnly
+from .summaries import build_loan_summary, summary_queryset
 from .serializers import (
     CustomerSerializer,
     LoanSerializer,
     PaymentSerializer,
     EscrowSerializer,
+    EscrowPostingSerializer,
+    EscrowTransactionSerializer,
+    PortfolioSnapshotSerializer,
 )
 
 # ----------------------------
 # Helpers
 # ----------------------------
+# Upper bound on loans per full-schedule request (each is up to 360 rows).
+MAX_SCHEDULE_LOANS = 100
+# Snapshot trend reads: default window and widest range per request, in days.
+DEFAULT_SNAPSHOT_DAYS = 365
+MAX_SNAPSHOT_DAYS = 366 * 10
+# Collections report periods (?group_by=)
+COLLECTION_PERIODS = {"day": TruncDay, "month": TruncMonth}
+# Batch summaries: default/maximum loans per request.
+DEFAULT_SUMMARY_LIMIT = 100
+MAX_SUMMARY_LOANS = 500
+
+
 def calculate_emi(principal: Decimal, annual_rate: Decimal, term_months: int) -> Decimal:
-    principal = Decimal(principal)
-    annual_rate = Decimal(annual_rate)
-    n = max(1, int(term_months))
-    r = (annual_rate / Decimal("100")) / Decimal("12")
-    if r == 0:
-        return (principal / Decimal(n)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-    num = principal * r * (1 + r) ** n
-    den = (1 + r) ** n - 1
-    return (num / den).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    return amortization.emi(principal, annual_rate, term_months)
+
+
+class SparseFieldsetViewMixin:
+    """
+    With ?fields=a,b on list/retrieve, load only those columns (plus the cursor
+    columns); the serializer side of this is SparseFieldsetMixin.
+    """
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        requested = self.request.query_params.get("fields")
+        if requested and self.action in ("list", "retrieve"):
+            columns = {f.name for f in queryset.model._meta.concrete_fields}
+            wanted = {name.strip() for name in requested.split(",")} & columns
+            queryset = queryset.only("id", "created_at", *wanted)
+        return queryset
 
 
 # ----------------------------
 # ViewSets
 # ----------------------------
-class CustomerViewSet(viewsets.ModelViewSet):
+class CustomerViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     permission_classes = [IsAdminOrReadOnly]
     queryset = Customer.objects.all().order_by("-created_at")
     serializer_class = CustomerSerializer
 
 
-class LoanViewSet(viewsets.ModelViewSet):
+class LoanViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     permission_classes = [IsAdminOrReadOnly]
     queryset = Loan.objects.all().order_by("-created_at")
     serializer_class = LoanSerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ("summary", "summaries"):
+            queryset = queryset.select_related("escrow")
+        return queryset
+
+    def retrieve(self, request, *args, **kwargs):
+        """Loan detail, served from the versioned cache with ETag support (see loan_cache)."""
+        return loan_cache.versioned_response(
+            request, kwargs["pk"], "detail", lambda: self.get_serializer(self.get_object()).data
+        )
+
     @action(detail=True, methods=["get"], url_path="summary")
     def summary(self, request, pk=None):
+        """KPI summary for a single loan (see summaries.build_loan_summary)."""
+        return loan_cache.versioned_response(
+            request, pk, "summary", lambda: build_loan_summary(self.get_object())
+        )
+
+    @action(detail=False, methods=["get"], url_path="summaries")
+    def summaries(self, request):
         """
-        KPI summary for a single loan:
-        - totals (paid so far, interest paid, outstanding balance)
-        - last payment date, count of payments
-        - next payment preview (payment, interest, principal)
-        - escrow balance (if exists)
-        - status (ACTIVE/PAID_OFF/DEFAULTED)
+        GET /api/loans/summaries/?ids=1,2,3
+        GET /api/loans/summaries/?status=ACTIVE&customer=7&limit=200
+        Summaries for many loans in a single query (loan + escrow join).
         """
-        loan = self.get_object()
-
-        agg = Payment.objects.filter(loan=loan).aggregate(
-            total_paid=Sum("amount"),
-            last_payment_date=Max("payment_date"),
-        )
-        total_paid = agg["total_paid"] or Decimal("0.00")
-        last_payment_date = agg["last_payment_date"]
-
-        balance = (loan.outstanding_principal or loan.principal_amount) or Decimal("0.00")
-        balance = Decimal(balance).quantize(Decimal("0.01"))
-
-        payment_per_period = calculate_emi(balance, loan.annual_interest_rate, loan.term_months)
-        r = (Decimal(loan.annual_interest_rate) / Decimal("100")) / Decimal("12")
-        interest_next = (balance * r).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-        principal_next = (payment_per_period - interest_next).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-        if principal_next < 0:
-            principal_next = Decimal("0.00")
-
-        escrow_balance = None
-        if hasattr(loan, "escrow") and loan.escrow is not None:
-            escrow_balance = float(loan.escrow.balance)
-
-        status_val = "PAID_OFF" if balance <= 0 else (loan.status or "ACTIVE")
-
-        data = {
-            "loan_id": loan.id,
-            "customer_id": loan.customer_id,
-            "principal_amount": float(loan.principal_amount),
-            "annual_interest_rate_percent": float(loan.annual_interest_rate),
-            "term_months": int(loan.term_months),
-            "status": status_val,
-            "totals": {
-                "paid_so_far": float(total_paid),
-                "interest_paid": float(loan.total_interest_paid or 0),
-                "outstanding_principal": float(balance),
-            },
-            "payments": {
-                "count": Payment.objects.filter(loan=loan).count(),
-                "last_payment_date": last_payment_date,
-            },
-            "next_payment_preview": {
-                "payment": float(payment_per_period),
-                "interest": float(interest_next),
-                "principal": float(principal_next),
-                "projected_balance_after": float((balance - principal_next) if balance > 0 else 0),
-            },
-            "escrow": {"balance": escrow_balance},
-        }
+        params = request.query_params
+        queryset = self.get_queryset().order_by("id")
+        ids = None
+        if params.get("ids"):
+            try:
+                ids = [int(x) for x in params["ids"].split(",") if x.strip()]
+            except ValueError:
+                return Response({"detail": "ids must be a comma-separated list of loan ids"}, status=400)
+            if len(ids) > MAX_SUMMARY_LOANS:
+                return Response({"detail": f"At most {MAX_SUMMARY_LOANS} loans per request"}, status=400)
+            queryset = queryset.filter(pk__in=ids)
+        else:
+            if params.get("status"):
+                queryset = queryset.filter(status__in=params["status"].upper().split(","))
+            try:
+                if params.get("customer"):
+                    queryset = queryset.filter(customer_id=int(params["customer"]))
+                limit = int(params.get("limit", DEFAULT_SUMMARY_LIMIT))
+            except ValueError:
+                return Response({"detail": "customer and limit must be integers"}, status=400)
+            queryset = queryset[: max(1, min(MAX_SUMMARY_LOANS, limit))]
+
+        results = [build_loan_summary(loan) for loan in queryset]
+        data = {"results": results}
+        if ids is not None:
+            data["missing_ids"] = sorted(set(ids) - {row["loan_id"] for row in results})
         return Response(data)
 
+    @action(detail=True, methods=["get"], url_path="as_of")
+    def as_of(self, request, pk=None):
+        """
+        GET /api/loans/<id>/as_of/?date=2025-06-30
+        Balance, interest paid and status at the end of that day: the nearest earlier
+        checkpoint plus the payments after it, in one query (see loan_app.checkpoints).
+        """
+        try:
+            day = _as_of_date(request.query_params)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=400)
+        try:
+            pk = int(pk)
+        except ValueError:
+            states = {}
+        else:
+            states = checkpoints.as_of(Loan.objects.filter(pk=pk), day)
+        if not states:
+            return Response({"detail": "No Loan matches the given query."}, status=404)
+        [state] = states.values()
+        if state is None:
+            return Response({"detail": f"Loan #{pk} starts after {day.isoformat()}"}, status=400)
+        return Response(state)
+
+    @action(detail=False, methods=["get"], url_path="as_of")
+    def as_of_batch(self, request):
+        """
+        GET /api/loans/as_of/?date=2025-06-30&ids=1,2,3
+        as_of for many loans at one date, still one query.
+        """
+        try:
+            day = _as_of_date(request.query_params)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=400)
+        try:
+            ids = [int(x) for x in request.query_params.get("ids", "").split(",") if x.strip()]
+        except ValueError:
+            return Response({"detail": "ids must be a comma-separated list of loan ids"}, status=400)
+        if not ids:
+            return Response({"detail": "Pass ?ids=1,2,3"}, status=400)
+        if len(ids) > MAX_SUMMARY_LOANS:
+            return Response({"detail": f"At most {MAX_SUMMARY_LOANS} loans per request"}, status=400)
+
+        states = checkpoints.as_of(Loan.objects.filter(pk__in=ids), day)
+        return Response({
+            "date": day.isoformat(),
+            "results": [state for state in states.values() if state is not None],
+            "not_started_ids": sorted(loan_id for loan_id, state in states.items() if state is None),
+            "missing_ids": sorted(set(ids) - set(states)),
+        })
+
+
+def _as_of_date(params) -> date:
+    """The required ?date= of a point-in-time lookup; raises ValueError."""
+    try:
+        day = date.fromisoformat(params.get("date", ""))
+    except ValueError:
+        raise ValueError("date must be an ISO date (YYYY-MM-DD)")
+    if day > date.today():
+        raise ValueError("date must not be in the future")
+    return day
+
 
-class EscrowViewSet(viewsets.ModelViewSet):
+class EscrowViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     permission_classes = [IsAdminOrReadOnly]
     queryset = EscrowAccount.objects.all().order_by("-created_at")
     serializer_class = EscrowSerializer
@@ -126,12 +210,41 @@ class EscrowViewSet(viewsets.ModelViewSet):
         if amount <= 0:
             return Response({"detail": "Amount must be > 0"}, status=400)
 
-        escrow.balance += amount
-        escrow.save()
+        escrow_ops.post(escrow.pk, EscrowTransaction.KIND_DEPOSIT, amount, note=str(request.data.get("note", ""))[:200])
+        escrow.refresh_from_db(fields=["balance"])
         return Response(EscrowSerializer(escrow).data, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=["post"], url_path="postings")
+    def postings(self, request):
+        """
+        Post many deposits/disbursements across accounts in one transaction.
+        Body: [{"escrow", "kind": "DEPOSIT"|"DISBURSEMENT", "amount", "note"?}, ...]
+        (or {"postings": [...]}). All-or-nothing.
+        """
+        data = request.data.get("postings") if isinstance(request.data, dict) else request.data
+        serializer = EscrowPostingSerializer(data=data, many=True, allow_empty=False)
+        serializer.is_valid(raise_exception=True)
+        try:
+            entries = escrow_ops.post_batch(serializer.validated_data)
+        except escrow_ops.EscrowPostingError as exc:
+            return Response({"errors": exc.errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {"posted": len(entries), "transactions": EscrowTransactionSerializer(entries, many=True).data},
+            status=status.HTTP_201_CREATED,
+        )
+
+    @action(detail=True, methods=["get"])
+    def transactions(self, request, pk=None):
+        """The account's ledger, newest first."""
+        escrow = self.get_object()
+        entries = escrow.transactions.all()
+        page = self.paginate_queryset(entries)
+        if page is not None:
+            return self.get_paginated_response(EscrowTransactionSerializer(page, many=True).data)
+        return Response(EscrowTransactionSerializer(entries, many=True).data)
+
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     permission_classes = [IsAdminOrReadOnly]
     queryset = Payment.objects.all().order_by("-created_at")
     serializer_class = PaymentSerializer
@@ -144,38 +257,38 @@ class PaymentViewSet(viewsets.ModelViewSet):
             raise ValidationError("This loan is already PAID_OFF. No further payments allowed.")
         serializer.save()
 
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk(self, request):
+        """
+        Ingest a bank file: NDJSON (default) or CSV (Content-Type: text/csv) with columns
+        loan, amount, payment_date[, note, idempotency_key]. Streamed and inserted in chunks;
+        rows that fail validation are reported by line and skipped.
+        """
+        if request.stream is None:
+            return Response({"detail": "Empty request body."}, status=status.HTTP_400_BAD_REQUEST)
+        report = ingest.ingest_payments(request.stream, request.content_type)
+        code = status.HTTP_201_CREATED if report["created"] else status.HTTP_400_BAD_REQUEST
+        return Response(report, status=code)
+
     @action(detail=True, methods=["post"])
     def mark_processed(self, request, pk=None):
-        """Process payment - split into interest and principal allocation"""
+        """Process payment - split into interest and principal allocation (at most once)"""
         payment = self.get_object()
-        loan = payment.loan
-
-        monthly_rate = loan.annual_interest_rate / Decimal("12.0") / Decimal("100.0")
-        interest_component = (loan.outstanding_principal * monthly_rate).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-
-        principal_component = Decimal(payment.amount) - interest_component
-        if principal_component < 0:
-            principal_component = Decimal("0.00")
-
-        loan.total_interest_paid = (loan.total_interest_paid or Decimal("0.00")) + interest_component
-        loan.outstanding_principal = (loan.outstanding_principal or Decimal("0.00")) - principal_component
+        result = allocation.process_payment(payment.pk)
 
-        # Auto flip to PAID_OFF if cleared
-        if loan.outstanding_principal <= 0:
-            loan.outstanding_principal = Decimal("0.00")
-            if hasattr(Loan, "STATUS_PAID_OFF"):
-                loan.status = Loan.STATUS_PAID_OFF
-            else:
-                loan.status = "PAID_OFF"
-
-        payment.note = f"Processed | Principal: {principal_component:.2f}, Interest: {interest_component:.2f}"
-        payment.save()
-        loan.save()
+        if result is None:
+            loan = Loan.objects.only("id", "outstanding_principal", "total_interest_paid").get(pk=payment.loan_id)
+            return Response({
+                "message": "Payment already processed",
+                "new_outstanding_balance": float(loan.outstanding_principal),
+                "total_interest_paid": float(loan.total_interest_paid),
+            })
 
+        loan = result["loan"]
         return Response({
             "message": "Payment processed successfully",
-            "principal_applied": float(principal_component),
-            "interest_applied": float(interest_component),
+            "principal_applied": float(result["principal_applied"]),
+            "interest_applied": float(result["interest_applied"]),
             "new_outstanding_balance": float(loan.outstanding_principal),
             "total_interest_paid": float(loan.total_interest_paid)
         })
@@ -208,67 +321,11 @@ def ai_query(request):
     """
     Simple NL → analytics over your DB.
     """
-    from .models import Customer, Loan, Payment
-
     text = (request.data.get("question") or "").strip().lower()
     if not text:
-        return Response({"answer": "Please ask a question, e.g. 'total customers'."})
-
-    # Safe Aggregations
-    total_customers = Customer.objects.count()
-    active_loans = Loan.objects.filter(status="ACTIVE").count()
-    paid_loans = Loan.objects.filter(status="PAID_OFF").count()
-    default_loans = Loan.objects.filter(status="DEFAULTED").count()
-
-    outstanding = Loan.objects.aggregate(
-        s=Sum("outstanding_principal")
-    )["s"] or Decimal("0.00")
-
-    # ✅ Use EMI field if exists, else 0
-    monthly_emi_total = 0
-    try:
-        monthly_emi_total = Loan.objects.aggregate(
-            s=Sum("scheduled_monthly_payment")
-        )["s"] or Decimal("0.00")
-    except:
-        monthly_emi_total = 0
-
-    # Recent payments
-    recent = list(
-        Payment.objects.order_by("-payment_date", "-id").values(
-            "id", "loan_id", "amount", "payment_date", "note"
-        )[:5]
-    )
-
-    # Simple intent
-    if "total customers" in text:
-        ans = f"Total customers: {total_customers}."
-    elif "active loans" in text:
-        ans = f"Active loans: {active_loans}."
-    elif "paid loans" in text or "paid off" in text:
-        ans = f"Paid-off loans: {paid_loans}."
-    elif "outstanding" in text:
-        ans = f"Total outstanding principal: ${outstanding}."
-    elif "emi" in text:
-        ans = f"Monthly EMI total (approx): ${monthly_emi_total}."
-    else:
-        ans = (
-            "I can answer: 'total customers', 'active loans', "
-            "'outstanding principal', 'monthly emi total', 'recent payments'."
-        )
-
-    return Response({
-        "answer": ans,
-        "facts": {
-            "customers": total_customers,
-            "active_loans": active_loans,
-            "paid_off_loans": paid_loans,
-            "defaulted_loans": default_loans,
-            "outstanding_principal": str(outstanding),
-            "monthly_emi_total": str(monthly_emi_total),
-            "recent_payments": recent,
-        }
-    })
+        return Response({"answer": AI_EMPTY_ANSWER})
+    # only the facts / filtered aggregates the question's intents need (see intents.py)
+    return Response(intents.answer(text))
 
 
 # ----------------------------
@@ -280,10 +337,28 @@ def amortization_preview(request, loan_id: int):
     """
     GET /api/loans/<loan_id>/amortization_preview/?n=6
     Returns next N payment rows using current outstanding balance.
+
+    GET /api/loans/<loan_id>/amortization_preview/?schedule=full
+    Returns every period from origination (see amortization_schedules).
+
+    Cached per loan version, with ETag / 304 support (see loan_cache).
     """
-    loan = get_object_or_404(Loan, pk=loan_id)
+    return loan_cache.versioned_response(
+        request, loan_id, "preview", lambda: _amortization_preview_data(request, loan_id)
+    )
+
+
+def _amortization_preview_data(request, loan_id):
+    return amortization_preview_data(get_object_or_404(Loan, pk=loan_id), request.query_params)
+
+
+def amortization_preview_data(loan: Loan, params) -> dict:
+    """The amortization_preview body for `loan` and query params `params` (no queries)."""
+    if params.get("schedule") == "full":
+        return {"loan_id": loan.id, **schedules.full_schedules([loan])[loan.id]}
+
     try:
-        n = int(request.query_params.get("n", 6))
+        n = int(params.get("n", 6))
     except Exception:
         n = 6
     n = max(1, min(360, n))
@@ -293,21 +368,21 @@ def amortization_preview(request, loan_id: int):
     balance = Decimal(balance).quantize(Decimal("0.01"))
 
     if balance <= 0:
-        return Response({"loan_id": loan.id, "rows": [], "remaining_balance": 0.0})
+        return {"loan_id": loan.id, "rows": [], "remaining_balance": 0.0}
 
     payment = calculate_emi(balance, loan.annual_interest_rate, loan.term_months)
-    r = (Decimal(loan.annual_interest_rate) / Decimal("100")) / Decimal("12")
+    r = amortization.monthly_rate(loan.annual_interest_rate)
 
     for i in range(1, n + 1):
-        interest = (balance * r).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-        principal = (payment - interest).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        interest = amortization.to_cents(balance * r)
+        principal = amortization.to_cents(payment - interest)
         if principal > balance:
             principal = balance
             payment_row = principal + interest
         else:
             payment_row = payment
 
-        new_balance = (balance - principal).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        new_balance = amortization.to_cents(balance - principal)
 
         schedule.append({
             "period": i,
@@ -321,10 +396,38 @@ def amortization_preview(request, loan_id: int):
         if balance <= 0:
             break
 
-    return Response({
+    return {
         "loan_id": loan.id,
         "rows": schedule,
         "remaining_balance": float(balance),
+    }
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def amortization_schedules(request):
+    """
+    GET /api/loans/amortization/?ids=1,2,3
+    Full schedules from origination for many loans in one request: every period with
+    payment date, payment/interest/principal split, balance and cumulative columns.
+    All loans are amortized together on integer-cent arrays (see loan_app.schedules).
+    """
+    try:
+        ids = [int(x) for x in request.query_params.get("ids", "").split(",") if x.strip()]
+    except ValueError:
+        return Response({"detail": "ids must be a comma-separated list of loan ids"}, status=400)
+    if not ids:
+        return Response({"detail": "Pass ?ids=1,2,3"}, status=400)
+    if len(ids) > MAX_SCHEDULE_LOANS:
+        return Response({"detail": f"At most {MAX_SCHEDULE_LOANS} loans per request"}, status=400)
+
+    loans = Loan.objects.filter(pk__in=ids).only(
+        "id", "principal_amount", "annual_interest_rate", "term_months", "start_date"
+    ).order_by("id")
+    results = schedules.full_schedules(loans)
+    return Response({
+        "loans": [{"loan_id": loan_id, **schedule} for loan_id, schedule in results.items()],
+        "missing_ids": sorted(set(ids) - set(results)),
     })
 
 
@@ -335,52 +438,129 @@ def loan_summary(request, loan_id: int):
     GET /api/loans/<loan_id>/summary/
     Function-based twin of LoanViewSet.summary (to match backend/urls.py).
     """
-    loan = get_object_or_404(Loan, pk=loan_id)
-
-    agg = Payment.objects.filter(loan=loan).aggregate(
-        total_paid=Sum("amount"),
-        last_payment_date=Max("payment_date"),
+    return loan_cache.versioned_response(
+        request, loan_id, "summary", lambda: build_loan_summary(get_object_or_404(summary_queryset(), pk=loan_id))
     )
-    total_paid = agg["total_paid"] or Decimal("0.00")
-    last_payment_date = agg["last_payment_date"]
 
-    balance = (loan.outstanding_principal or loan.principal_amount) or Decimal("0.00")
-    balance = Decimal(balance).quantize(Decimal("0.01"))
 
-    payment_per_period = calculate_emi(balance, loan.annual_interest_rate, loan.term_months)
-    r = (Decimal(loan.annual_interest_rate) / Decimal("100")) / Decimal("12")
-    interest_next = (balance * r).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-    principal_next = (payment_per_period - interest_next).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-    if principal_next < 0:
-        principal_next = Decimal("0.00")
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def portfolio_forecast(request):
+    """
+    GET /api/portfolio/forecast/?months=24&group_by=origination_month
+    Expected monthly collections (payment, interest, principal) and month-end balances
+    for the whole book, vectorized across all loans (see loan_app.forecast).
+    Query params: ?months=1..360 (default 12), ?group_by=portfolio|status|origination_month,
+    ?status=ACTIVE[,DEFAULTED] (default ACTIVE), ?as_of=YYYY-MM-DD (default today).
+    """
+    params = request.query_params
+    try:
+        options = forecast.parse_params(
+            params.get("months"), params.get("group_by"), params.get("status"), params.get("as_of")
+        )
+    except ValueError as exc:
+        return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(forecast.forecast(**options))
+
 
-    escrow_balance = None
-    if hasattr(loan, "escrow") and loan.escrow is not None:
-        escrow_balance = float(loan.escrow.balance)
+def _date_range(params, default_days=DEFAULT_SNAPSHOT_DAYS, max_days=MAX_SNAPSHOT_DAYS):
+    """(from, to) dates of a report request (default: the last `default_days` days); raises ValueError."""
+    try:
+        end = date.fromisoformat(params["to"]) if params.get("to") else date.today()
+        start = date.fromisoformat(params["from"]) if params.get("from") else end - timedelta(days=default_days - 1)
+    except ValueError:
+        raise ValueError("from and to must be ISO dates (YYYY-MM-DD)")
+    if start > end:
+        raise ValueError("from must not be after to")
+    if (end - start).days >= max_days:
+        raise ValueError(f"At most {max_days} days per request")
+    return start, end
 
-    status_val = "PAID_OFF" if balance <= 0 else (loan.status or "ACTIVE")
 
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def portfolio_snapshots(request):
+    """
+    GET /api/portfolio/snapshots/?from=2025-11-01&to=2026-10-31
+    Daily book totals for trend charts, one precomputed PortfolioSnapshot row per day
+    (see loan_app.snapshots). Defaults to the last 365 days.
+    """
+    try:
+        start, end = _date_range(request.query_params)
+    except ValueError as exc:
+        return Response({"detail": str(exc)}, status=400)
+
+    rows = PortfolioSnapshot.objects.filter(date__gte=start, date__lte=end).order_by("date")
     return Response({
-        "loan_id": loan.id,
-        "customer_id": loan.customer_id,
-        "principal_amount": float(loan.principal_amount),
-        "annual_interest_rate_percent": float(loan.annual_interest_rate),
-        "term_months": int(loan.term_months),
-        "status": status_val,
-        "totals": {
-            "paid_so_far": float(total_paid),
-            "interest_paid": float(loan.total_interest_paid or 0),
-            "outstanding_principal": float(balance),
-        },
-        "payments": {
-            "count": Payment.objects.filter(loan=loan).count(),
-            "last_payment_date": last_payment_date,
-        },
-        "next_payment_preview": {
-            "payment": float(payment_per_period),
-            "interest": float(interest_next),
-            "principal": float(principal_next),
-            "projected_balance_after": float((balance - principal_next) if balance > 0 else 0),
-        },
-        "escrow": {"balance": escrow_balance},
-    })
\ No newline at end of file
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "results": PortfolioSnapshotSerializer(rows, many=True).data,
+    })
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def collections_report(request):
+    """
+    GET /api/reports/collections/?from=2026-01-01&to=2026-06-30&group_by=month
+    Payments received, with the principal and interest they were split into, per day or
+    month (default: month, last 365 days). One aggregate over payment_date_idx's range.
+    Payments not processed yet count towards amount_collected only.
+    """
+    try:
+        start, end = _date_range(request.query_params)
+    except ValueError as exc:
+        return Response({"detail": str(exc)}, status=400)
+    group_by = request.query_params.get("group_by") or "month"
+    if group_by not in COLLECTION_PERIODS:
+        return Response({"detail": f"group_by must be one of: {', '.join(COLLECTION_PERIODS)}"}, status=400)
+
+    rows = (
+        Payment.objects.filter(payment_date__gte=start, payment_date__lte=end)
+        .annotate(period=COLLECTION_PERIODS[group_by]("payment_date"))
+        .values("period")
+        .annotate(**snapshots.collection_aggregates())
+        .order_by("period")
+    )
+    results = [snapshots.money(row) for row in rows]
+    totals = {name: sum((row[name] for row in results), 0) for name in snapshots.FLOW_FIELDS}
+    for row in results:
+        row["period"] = row["period"].strftime("%Y-%m" if group_by == "month" else "%Y-%m-%d")
+    return Response({
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "group_by": group_by,
+        "totals": totals,
+        "results": results,
+    })
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def export_data(request, resource: str):
+    """
+    Stream a full dump of loans or payments.
+    Query params: ?fmt=csv|ndjson (default csv), ?from=&to= (start_date / payment_date range),
+    ?status=ACTIVE|PAID_OFF|DEFAULTED (the loan's status).
+    """
+    if resource not in exports.EXPORTS:
+        return Response({"detail": f"Unknown export '{resource}'."}, status=status.HTTP_404_NOT_FOUND)
+    params = request.query_params
+    try:
+        filters = exports.parse_filters(params.get("fmt"), params.get("from"), params.get("to"), params.get("status"))
+    except ValueError as exc:
+        return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    response = StreamingHttpResponse(
+        exports.stream_export(resource, **filters), content_type=exports.FORMATS[filters["fmt"]]
+    )
+    extension = "csv" if filters["fmt"] == "csv" else "ndjson"
+    response["Content-Disposition"] = f'attachment; filename="{resource}.{extension}"'
+    return response
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def metrics_view(request):
+    """GET /api/metrics/ -- this process's request metrics in Prometheus text format."""
+    return HttpResponse(metrics.render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")